@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from backend.database import connection
+
+# PyMongo is synchronous, so every call made from an `async def` route is
+# handed to this pool instead of running on the event loop. The pool is
+# bounded so a burst of slow queries cannot spawn unbounded threads; excess
+# calls wait in the executor queue while other requests keep being served.
+_executor = ThreadPoolExecutor(
+    max_workers=connection.DB_EXECUTOR_WORKERS,
+    thread_name_prefix="mongo",
+)
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    call = loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+    return await asyncio.wait_for(call, timeout=connection.DB_OPERATION_TIMEOUT)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=True)
+
+
+class AsyncCollection:
+    """Awaitable facade over a PyMongo collection.
+
+    The underlying collection is looked up on every call so the database
+    handle in `backend.database.connection` can be replaced (tests, config
+    reloads) without re-importing the routes. Handles made with
+    `listing=True` read with MONGO_LIST_READ_PREFERENCE; use them only for
+    list-style reads that tolerate replication lag, never before a write.
+    """
+
+    def __init__(self, name: str, listing: bool = False):
+        self.name = name
+        self.listing = listing
+
+    @property
+    def sync(self):
+        collection = connection.db[self.name]
+        if self.listing and connection.LIST_READ_PREFERENCE is not None:
+            collection = collection.with_options(read_preference=connection.LIST_READ_PREFERENCE)
+        return collection
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(collection, *args, **kwargs)` on the database pool."""
+        return await run_db(fn, self.sync, *args, **kwargs)
+
+    async def find(self, *args, limit: int = 0, sort=None, **kwargs) -> list:
+        def _find(coll):
+            cursor = coll.find(*args, **kwargs)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await self.run(_find)
+
+    async def iter_batches(self, *args, batch_size: int = 1000, sort=None, **kwargs):
+        """Yield lists of at most `batch_size` documents straight from a cursor.
+
+        Only one batch is held in memory at a time, so callers can stream
+        collections of any size.
+        """
+        def _open(coll):
+            cursor = coll.find(*args, **kwargs).batch_size(batch_size)
+            return cursor.sort(sort) if sort else cursor
+
+        cursor = await self.run(_open)
+        try:
+            while True:
+                batch = await run_db(lambda: list(islice(cursor, batch_size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            await run_db(cursor.close)
+
+    async def find_one(self, *args, **kwargs):
+        return await run_db(self.sync.find_one, *args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return await run_db(self.sync.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await run_db(self.sync.insert_many, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await run_db(self.sync.update_one, *args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        return await run_db(self.sync.update_many, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await run_db(self.sync.find_one_and_update, *args, **kwargs)
+
+    async def find_one_and_delete(self, *args, **kwargs):
+        return await run_db(self.sync.find_one_and_delete, *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs):
+        return await run_db(self.sync.delete_one, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await run_db(self.sync.delete_many, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return await run_db(self.sync.count_documents, *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs):
+        return await run_db(self.sync.bulk_write, *args, **kwargs)
+
+    async def aggregate(self, *args, **kwargs) -> list:
+        return await self.run(lambda coll: list(coll.aggregate(*args, **kwargs)))
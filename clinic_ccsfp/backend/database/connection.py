@@ -1,10 +1,155 @@
+import logging
+import os
+
 from pymongo import MongoClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from backend.database.monitoring import command_metrics
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "clinic_db")
+MONGO_APP_NAME = os.getenv("MONGO_APP_NAME", "clinic-ccsfp")
+
+# Pool and timeout settings. The async data layer runs every query on a
+# bounded thread pool, so DB_EXECUTOR_WORKERS should not exceed the pool size.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+# Write concern; unset values keep the server's default (w: "majority" on
+# MongoDB 5.0+ replica sets).
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "")
+MONGO_JOURNAL = os.getenv("MONGO_JOURNAL", "")
+MONGO_WRITE_TIMEOUT_MS = int(os.getenv("MONGO_WRITE_TIMEOUT_MS", "0"))
+
+# Read preference for the list, export, history and analytics endpoints.
+# Everything else, including every read that backs a write, stays on the
+# primary. Secondaries can lag, so a list may briefly miss a new write.
+MONGO_LIST_READ_PREFERENCE = os.getenv("MONGO_LIST_READ_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(MONGO_MAX_POOL_SIZE)))
+DB_OPERATION_TIMEOUT = float(os.getenv("DB_OPERATION_TIMEOUT", "30"))
+
+READ_PREFERENCES = {
+    "primary": lambda max_staleness: None,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _list_read_preference():
+    if MONGO_LIST_READ_PREFERENCE not in READ_PREFERENCES:
+        raise ValueError(f"MONGO_LIST_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+    return READ_PREFERENCES[MONGO_LIST_READ_PREFERENCE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+
+# None (the client's primary default) or the ReadPreference list reads use.
+LIST_READ_PREFERENCE = _list_read_preference()
+
+
+def client_options() -> dict:
+    options = {
+        "appname": MONGO_APP_NAME,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "read_preference": Primary(),
+        "event_listeners": [command_metrics],
+    }
+    if MONGO_WRITE_CONCERN:
+        options["w"] = int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+    if MONGO_JOURNAL:
+        options["journal"] = MONGO_JOURNAL.lower() in ("1", "true", "yes")
+    if MONGO_WRITE_TIMEOUT_MS:
+        options["wTimeoutMS"] = MONGO_WRITE_TIMEOUT_MS
+    return options
+
+
+class MongoConnection:
+    """The process's one MongoClient, opened by the app lifespan.
+
+    Importing the app no longer connects: the client is created by `open()`
+    (or on first use, for scripts that never run the lifespan) and closed by
+    `close()`. Each worker process therefore holds at most
+    MONGO_MAX_POOL_SIZE connections per server, plus PyMongo's two
+    monitoring connections.
+    """
+
+    def __init__(self, uri: str = MONGO_URI, db_name: str = MONGO_DB):
+        self.uri = uri
+        self.db_name = db_name
+        self._client = None
+        self._db = None
+        self._owned = False
+
+    def open(self) -> "MongoConnection":
+        if self._db is None:
+            self._client = MongoClient(self.uri, **client_options())
+            self._db = self._client[self.db_name]
+            self._owned = True
+        return self
+
+    def connect(self):
+        """Open the client and wait for a server, so a bad URI fails startup rather than the first request."""
+        self.open()
+        self._db.command("ping")
+        if DB_EXECUTOR_WORKERS > MONGO_MAX_POOL_SIZE:
+            logger.warning(f"DB_EXECUTOR_WORKERS ({DB_EXECUTOR_WORKERS}) exceeds MONGO_MAX_POOL_SIZE "
+                           f"({MONGO_MAX_POOL_SIZE}); extra queries will wait for a pooled connection")
+        logger.info(f"Connected to MongoDB database {self._db.name}: pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE}, "
+                    f"list reads {MONGO_LIST_READ_PREFERENCE}")
+
+    def use(self, database):
+        """Serve `database` (a benchmark or mongomock database) instead of opening MONGO_URI."""
+        self.close()
+        self._db = database
+        self._client = getattr(database, "client", None)
+
+    def close(self):
+        # A database handed to `use()` belongs to the caller, who closes it.
+        if self._owned:
+            self._client.close()
+        self._client = None
+        self._db = None
+        self._owned = False
+
+    @property
+    def client(self):
+        return self.open()._client
+
+    @property
+    def db(self):
+        return self.open()._db
+
+
+mongo = MongoConnection()
+
+
+def __getattr__(name):
+    # `connection.db` and `connection.client` resolve through the manager,
+    # so nothing connects until they are first used.
+    if name == "db":
+        return mongo.db
+    if name == "client":
+        return mongo.client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-MONGO_URI = "mongodb://localhost:27017"
-client = MongoClient(MONGO_URI)
-db = client["clinic_db"]
 
-users = db["admin_users"]
-appointments = db["student_appointments"]
-consultations = db["student_consultations"]
-records = db["student_records"]
+def supports_transactions() -> bool:
+    """Multi-document transactions need a replica set or sharded cluster."""
+    try:
+        topology = mongo.client.topology_description.topology_type_name
+    except Exception:
+        return False
+    return topology in ("ReplicaSetWithPrimary", "Sharded")
@@ -0,0 +1,44 @@
+from datetime import date, datetime, time, timedelta
+
+# `dateTime` is stored as a BSON datetime (naive, clinic local time) so range
+# queries, sorting and per-day grouping run on the index. On the wire it is
+# always the "YYYY-MM-DDTHH:MM" string the frontend has always used.
+WIRE_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def parse_date_time(value) -> datetime:
+    """Parse "YYYY-MM-DDTHH:MM", the booking page's "YYYY-MM-DD_HH:MM" or full ISO strings.
+
+    Raises ValueError for anything else.
+    """
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None, second=0, microsecond=0)
+    text = (value or "").strip()
+    if len(text) > 10 and text[10] in "_ ":
+        text = f"{text[:10]}T{text[11:]}"
+    parsed = datetime.fromisoformat(text)
+    return parsed.replace(tzinfo=None, second=0, microsecond=0)
+
+
+def format_date_time(value) -> str:
+    """Render a stored `dateTime` for API responses; legacy strings pass through."""
+    if isinstance(value, datetime):
+        return value.strftime(WIRE_FORMAT)
+    return value or ""
+
+
+def split_date_time(value):
+    """Return ("YYYY-MM-DD", "HH:MM") for a stored or submitted `dateTime`."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d"), value.strftime("%H:%M")
+    value = value or ""
+    return value[:10], value[11:16]
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def day_range(start: date, end: date):
+    """Half-open [start 00:00, day after end 00:00) bounds for a `dateTime` query."""
+    return {"$gte": day_start(start), "$lt": day_start(end + timedelta(days=1))}
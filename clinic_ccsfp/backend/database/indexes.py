@@ -0,0 +1,82 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from backend.database import connection
+from backend.services.search import SEARCH_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+# collection name -> list of (keys, options) passed to create_index.
+# Keep the keys in the same order as the equality/sort/range fields of the
+# queries that depend on them.
+INDEXES = {
+    "student_appointments": [
+        ([("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "dateTime_id"}),
+        ([("status", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "status_dateTime_id"}),
+        ([("nurse", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "nurse_dateTime_id"}),
+        ([("nameTokens", ASCENDING), ("dateTime", DESCENDING)], {"name": "nameTokens_dateTime"}),
+        ([("studentId", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "studentId_dateTime_id"}),
+        # Booking rules: one active appointment per nurse slot and per student per day.
+        ([("nurse", ASCENDING), ("dateTime", ASCENDING)],
+         {"name": "nurse_slot_unique", "unique": True, "partialFilterExpression": {"slotHeld": True}}),
+        ([("studentId", ASCENDING), ("dayKey", ASCENDING)],
+         {"name": "student_day_unique", "unique": True, "partialFilterExpression": {"slotHeld": True}}),
+        # Lets a resumed bulk import find the rows it already wrote.
+        ([("importJob", ASCENDING), ("importRow", ASCENDING)],
+         {"name": "importJob_importRow", "partialFilterExpression": {"importJob": {"$exists": True}}}),
+    ],
+    "student_consultations": [
+        ([("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "dateTime_id"}),
+        ([("nurse", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "nurse_dateTime_id"}),
+        ([("nameTokens", ASCENDING), ("dateTime", DESCENDING)], {"name": "nameTokens_dateTime"}),
+        ([("studentId", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "studentId_dateTime_id"}),
+        ([(field, TEXT) for field in SEARCH_WEIGHTS], {"name": "consultation_text", "weights": SEARCH_WEIGHTS}),
+        # Lets a resumed bulk import find the rows it already wrote.
+        ([("importJob", ASCENDING), ("importRow", ASCENDING)],
+         {"name": "importJob_importRow", "partialFilterExpression": {"importJob": {"$exists": True}}}),
+    ],
+    "student_records": [
+        ([("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "dateTime_id"}),
+        # An accepted appointment is copied into records at most once.
+        ([("appointmentId", ASCENDING)],
+         {"name": "appointmentId_unique", "unique": True, "partialFilterExpression": {"appointmentId": {"$exists": True}}}),
+        ([("nurse", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "nurse_dateTime_id"}),
+        ([("nameTokens", ASCENDING), ("dateTime", DESCENDING)], {"name": "nameTokens_dateTime"}),
+        ([("studentId", ASCENDING), ("dateTime", ASCENDING), ("_id", ASCENDING)], {"name": "studentId_dateTime_id"}),
+    ],
+    "daily_rollups": [
+        ([("day", ASCENDING), ("nurse", ASCENDING)], {"name": "day_nurse"}),
+    ],
+    "revoked_sessions": [
+        # Entries are only needed until the token would have expired anyway.
+        ([("expiresAt", ASCENDING)], {"name": "expiresAt_ttl", "expireAfterSeconds": 0}),
+    ],
+    "idempotency_keys": [
+        # Stored responses are replayable for IDEMPOTENCY_TTL_SECONDS.
+        ([("expiresAt", ASCENDING)], {"name": "expiresAt_ttl", "expireAfterSeconds": 0}),
+    ],
+}
+
+
+def ensure_indexes(database=None):
+    """Create every index the routes rely on. Safe to run on each startup.
+
+    One createIndexes command per collection; indexes that already exist
+    are a no-op on the server. If a collection's batch fails (say one index
+    conflicts with an older definition), its indexes are retried one at a
+    time so the rest still get built, and the failures are logged.
+    """
+    database = database if database is not None else connection.db
+    for collection, indexes in INDEXES.items():
+        models = [IndexModel(keys, **options) for keys, options in indexes]
+        try:
+            database[collection].create_indexes(models)
+            continue
+        except Exception:
+            pass
+        for keys, options in indexes:
+            try:
+                database[collection].create_index(keys, **options)
+            except Exception as e:
+                logger.warning(f"Could not create index {options.get('name')} on {collection}: {e}")
@@ -0,0 +1,137 @@
+"""One-shot data migrations.
+
+Run from the `clinic_ccsfp` directory:
+
+    python -m backend.database.migrate name-tokens
+    python -m backend.database.migrate booking-keys
+    python -m backend.database.migrate datetimes
+    python -m backend.database.migrate rollups
+"""
+import argparse
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from backend.database import connection
+from backend.database.datetimes import parse_date_time, split_date_time
+from backend.database.pagination import name_tokens
+from backend.services.appointments import RELEASED_STATUSES
+from backend.services.rollups import ROLLUP_COLLECTION, rebuild_rollups
+
+BATCH_SIZE = 1000
+
+
+def _flush(collection, ops, done, label, total=None):
+    if ops:
+        try:
+            collection.bulk_write(ops, ordered=False)
+            done += len(ops)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            done += len(ops) - len(errors)
+            for error in errors:
+                print(f"{label}: skipped {error.get('op', {}).get('q')}: {error.get('errmsg')}")
+        progress = f"{done}/{total}" if total is not None else f"{done}"
+        print(f"{label}: {progress} documents updated")
+    return done
+
+
+def backfill_name_tokens(database, batch_size=BATCH_SIZE):
+    """Add `nameTokens` to documents written before name search existed."""
+    for name in ("student_appointments", "student_consultations", "student_records"):
+        collection = database[name]
+        missing = collection.find(
+            {"nameTokens": {"$exists": False}},
+            {"firstName": 1, "lastName": 1},
+        ).batch_size(batch_size)
+        ops, done = [], 0
+        for doc in missing:
+            tokens = name_tokens(doc.get("firstName"), doc.get("lastName"))
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"nameTokens": tokens}}))
+            if len(ops) >= batch_size:
+                done = _flush(collection, ops, done, name)
+                ops = []
+        done = _flush(collection, ops, done, name)
+        print(f"{name}: done, {done} documents updated")
+
+
+def backfill_booking_keys(database, batch_size=BATCH_SIZE):
+    """Add the fields the booking unique indexes use to appointments created before them.
+
+    Documents that would break a uniqueness rule (double bookings made by the
+    old check-then-insert code) are reported and left for staff to resolve.
+    """
+    collection = database["student_appointments"]
+    missing = collection.find(
+        {"dayKey": {"$exists": False}},
+        {"dateTime": 1, "status": 1},
+    ).batch_size(batch_size)
+    ops, done = [], 0
+    for doc in missing:
+        try:
+            date_time = parse_date_time(doc.get("dateTime"))
+        except ValueError:
+            print(f"student_appointments: skipped {doc['_id']}: unparseable dateTime {doc.get('dateTime')!r}")
+            continue
+        fields = {"dateTime": date_time, "dayKey": split_date_time(date_time)[0]}
+        if doc.get("status") not in RELEASED_STATUSES:
+            fields["slotHeld"] = True
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            done = _flush(collection, ops, done, "student_appointments")
+            ops = []
+    done = _flush(collection, ops, done, "student_appointments")
+    print(f"student_appointments: done, {done} documents updated")
+
+
+def convert_datetimes(database, batch_size=BATCH_SIZE):
+    """Rewrite string `dateTime` values as BSON datetimes in every collection that has one."""
+    for name in ("student_appointments", "student_consultations", "student_records"):
+        collection = database[name]
+        pending = collection.count_documents({"dateTime": {"$type": "string"}})
+        print(f"{name}: {pending} documents to convert")
+        legacy = collection.find({"dateTime": {"$type": "string"}}, {"dateTime": 1}).batch_size(batch_size)
+        ops, done, skipped = [], 0, 0
+        for doc in legacy:
+            raw = doc["dateTime"]
+            if not raw.strip():
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"dateTime": None}}))
+            else:
+                try:
+                    ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"dateTime": parse_date_time(raw)}}))
+                except ValueError:
+                    skipped += 1
+                    print(f"{name}: skipped {doc['_id']}: unparseable dateTime {raw!r}")
+                    continue
+            if len(ops) >= batch_size:
+                done = _flush(collection, ops, done, name, pending)
+                ops = []
+        done = _flush(collection, ops, done, name, pending)
+        print(f"{name}: done, {done} converted, {skipped} skipped")
+
+
+def refresh_rollups(database, batch_size=BATCH_SIZE):
+    scanned, rebuilt = rebuild_rollups(database, batch_size=batch_size)
+    for name, count in scanned.items():
+        print(f"{name}: {count} documents scanned")
+    print(f"{ROLLUP_COLLECTION}: rebuilt {rebuilt} day/nurse rollups")
+
+
+MIGRATIONS = {
+    "name-tokens": backfill_name_tokens,
+    "booking-keys": backfill_booking_keys,
+    "datetimes": convert_datetimes,
+    "rollups": refresh_rollups,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a data migration.")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    MIGRATIONS[args.migration](connection.db, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import logging
+import os
+import threading
+
+from pymongo import monitoring
+
+from backend.services.metrics import mongo_commands, mongo_latency, mongo_slow_commands
+
+logger = logging.getLogger(__name__)
+
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+
+# Commands whose first value is not a collection name.
+_COLLECTION_KEYS = {"getMore": "collection"}
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+                     "buildInfo", "endSessions", "killCursors"}
+
+
+def _collection_of(command_name, command) -> str:
+    key = _COLLECTION_KEYS.get(command_name, command_name)
+    value = command.get(key)
+    return value if isinstance(value, str) else "-"
+
+
+def _shape(command_name, command) -> str:
+    """Field names of the filter, without values, for slow-query logs."""
+    spec = command.get("filter") or command.get("query") or {}
+    if command_name == "aggregate":
+        stages = command.get("pipeline") or []
+        return "[" + ",".join(next(iter(stage), "?") for stage in stages) + "]"
+    if isinstance(spec, dict):
+        return "{" + ",".join(spec) + "}"
+    return "?"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command per collection and operation.
+
+    Commands slower than MONGO_SLOW_QUERY_MS are logged with the filter's
+    field names only; values are left out because they hold student data.
+    """
+
+    def __init__(self, slow_ms: float = MONGO_SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _key(self, event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        collection = _collection_of(event.command_name, event.command)
+        shape = _shape(event.command_name, event.command)
+        with self._lock:
+            self._pending[self._key(event)] = (collection, shape)
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            pending = self._pending.pop(self._key(event), None)
+        if pending is None:
+            return
+        collection, shape = pending
+        operation = event.command_name
+        seconds = event.duration_micros / 1_000_000
+        mongo_commands.inc(collection, operation, outcome)
+        mongo_latency.observe(collection, operation, value=seconds)
+        if seconds * 1000 >= self.slow_ms:
+            mongo_slow_commands.inc(collection, operation)
+            logger.warning("Slow MongoDB %s on %s %s took %.0fms (%s)",
+                           operation, collection, shape, seconds * 1000, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+command_metrics = CommandMetrics()
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import json
+import re
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from backend.database.datetimes import day_start
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def name_tokens(*names) -> list:
+    """Lower-cased name words stored alongside a document for prefix search."""
+    tokens = []
+    for name in names:
+        for token in (name or "").lower().split():
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    value = doc.get(sort_field)
+    payload = {"v": value, "id": str(doc["_id"])}
+    if isinstance(value, datetime):
+        payload = {"v": value.isoformat(), "dt": True, "id": str(doc["_id"])}
+    raw = json.dumps(payload, default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(payload["v"]) if payload.get("dt") else payload["v"]
+        return value, ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_day(value: str, field: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field}, expected YYYY-MM-DD")
+
+
+def list_filter(name=None, status=None, nurse=None, date_from=None, date_to=None) -> dict:
+    """Build the Mongo filter shared by the paginated list endpoints."""
+    query = {}
+    if name:
+        prefixes = name_tokens(name)
+        if prefixes:
+            query["$and"] = [
+                {"nameTokens": {"$regex": f"^{re.escape(prefix)}"}} for prefix in prefixes
+            ]
+    if status:
+        query["status"] = {"$in": status}
+    if nurse:
+        query["nurse"] = nurse
+    if date_from or date_to:
+        bounds = {}
+        if date_from:
+            bounds["$gte"] = day_start(parse_day(date_from, "date_from"))
+        if date_to:
+            bounds["$lt"] = day_start(parse_day(date_to, "date_to") + timedelta(days=1))
+        query["dateTime"] = bounds
+    return query
+
+
+def keyset_page(query: dict, cursor, sort_field: str, descending: bool, nullable: bool = False):
+    """Return (filter, sort) for the page after `cursor` in (sort_field, _id) order.
+
+    With `nullable`, documents whose sort_field is missing or null are paged
+    too; MongoDB sorts them before every date, so after the last dated
+    document when descending.
+    """
+    direction = -1 if descending else 1
+    sort = [(sort_field, direction), ("_id", direction)]
+    if not cursor:
+        return query, sort
+
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    after = {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}},
+    ]}
+    if nullable:
+        if value is None and not descending:
+            after["$or"].append({sort_field: {"$ne": None}})
+        elif value is not None and descending:
+            after["$or"].append({sort_field: None})
+    return ({"$and": [query, after]} if query else after), sort
+
+
+def _merge_key(doc: dict, sort_field: str):
+    # MongoDB's order across types: missing or null, then strings, then dates.
+    value = doc.get(sort_field)
+    if value is None:
+        return 0, "", doc["_id"]
+    if isinstance(value, datetime):
+        return 2, value, doc["_id"]
+    return 1, str(value), doc["_id"]
+
+
+async def paginate(collection, query: dict, serialize, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                   sort_field="dateTime", descending=False, projection=None, nullable=None) -> dict:
+    """Fetch one keyset page plus the total match count from an AsyncCollection.
+
+    `nullable` is passed to `keyset_page`; it defaults to True for the
+    `dateTime` sort, since legacy rows may have no date.
+
+    `collection` may also be a list of AsyncCollections holding disjoint
+    documents (a hot collection and its archives). Each is read with the
+    same keyset, at most `limit + 1` documents, and the pages are merged
+    here, so a cursor works across all of them.
+    """
+    collections = collection if isinstance(collection, list) else [collection]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if nullable is None:
+        nullable = sort_field == "dateTime"
+    page_filter, sort = keyset_page(query, cursor, sort_field, descending, nullable)
+    results = await asyncio.gather(
+        *[c.find(page_filter, projection, sort=sort, limit=limit + 1) for c in collections],
+        *[c.count_documents(query) for c in collections],
+    )
+    pages, totals = results[:len(collections)], results[len(collections):]
+    docs = pages[0]
+    if len(pages) > 1:
+        docs = sorted((doc for page in pages for doc in page),
+                      key=lambda doc: _merge_key(doc, sort_field), reverse=descending)
+    total = sum(totals)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return {
+        "items": [serialize(d) for d in docs],
+        "total": total,
+        "nextCursor": next_cursor,
+    }
@@ -0,0 +1,49 @@
+import os
+import time
+
+from pymongo import ReturnDocument
+
+from backend.database.async_db import AsyncCollection, run_db
+
+# How long a worker trusts its last read of a version before asking Mongo
+# again. Writes made by this worker are seen immediately; writes made by
+# other workers are seen within this window.
+VERSION_POLL_SECONDS = float(os.getenv("VERSION_POLL_SECONDS", "1"))
+
+
+class CollectionVersions:
+    """A counter per collection, bumped by every write route that changes it.
+
+    Stored in the `collection_versions` collection ({_id: name, version: n})
+    so all uvicorn workers share it. Anything derived from a collection
+    (cached lookups, ETags) records the version it was built from and is
+    stale as soon as the counter moves.
+    """
+
+    def __init__(self, poll_seconds: float = VERSION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._store = AsyncCollection("collection_versions")
+        self._local = {}
+
+    async def current(self, name: str) -> int:
+        cached = self._local.get(name)
+        if cached and time.monotonic() - cached[1] < self.poll_seconds:
+            return cached[0]
+        doc = await self._store.find_one({"_id": name})
+        version = doc["version"] if doc else 0
+        self._local[name] = (version, time.monotonic())
+        return version
+
+    def bump_sync(self, name: str) -> int:
+        """`bump` for code already running on a database thread, such as bulk imports."""
+        doc = self._store.sync.find_one_and_update(
+            {"_id": name}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        self._local[name] = (doc["version"], time.monotonic())
+        return doc["version"]
+
+    async def bump(self, name: str) -> int:
+        return await run_db(self.bump_sync, name)
+
+
+collection_versions = CollectionVersions()
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import day_range, split_date_time
+from backend.database.pagination import parse_day
+from backend.services.rollups import ACTION_FLAGS, ROLLUP_COLLECTION, UNSPECIFIED
+from backend.services.sessions import current_session
+
+# Every endpoint reads `daily_rollups` (one document per source, day and
+# nurse) rather than the consultations and appointments themselves, so the
+# cost depends on the range asked for, not on how much history exists.
+router = APIRouter(prefix="/analytics", dependencies=[Depends(current_session)])
+# Read with MONGO_LIST_READ_PREFERENCE, like the other list endpoints.
+rollups = AsyncCollection(ROLLUP_COLLECTION, listing=True)
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+
+def _rollup_query(date_from, date_to, nurse=None, source=None) -> dict:
+    end = parse_day(date_to, "date_to") if date_to else date.today()
+    start = parse_day(date_from, "date_from") if date_from else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if end < start:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RANGE_DAYS} days per request")
+    query = {"day": day_range(start, end)}
+    if nurse:
+        query["nurse"] = nurse
+    if source:
+        query["source"] = source
+    return query
+
+
+def _top(docs, field: str, limit: int) -> list:
+    totals = {}
+    for doc in docs:
+        for label, count in (doc.get(field) or {}).items():
+            totals[label] = totals.get(label, 0) + count
+    ranked = sorted(((count, label) for label, count in totals.items() if count > 0 and label != UNSPECIFIED),
+                    key=lambda item: (-item[0], item[1]))
+    return [{"label": label, "count": count} for count, label in ranked[:limit]]
+
+
+@router.get("/visits")
+async def visits_per_day(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    nurse: Optional[str] = None,
+):
+    """Consultations and appointments per day and nurse, with appointment statuses."""
+    query = _rollup_query(date_from, date_to, nurse)
+    docs = await rollups.find(query, {"_id": 0, "source": 1, "day": 1, "nurse": 1, "visits": 1, "statuses": 1})
+    rows = {}
+    for doc in docs:
+        day = split_date_time(doc["day"])[0]
+        row = rows.setdefault((day, doc["nurse"]), {
+            "date": day, "nurse": doc["nurse"], "consultations": 0, "appointments": 0, "statuses": {},
+        })
+        row[doc["source"]] += doc.get("visits", 0)
+        for status, count in (doc.get("statuses") or {}).items():
+            if count:
+                row["statuses"][status] = row["statuses"].get(status, 0) + count
+    return [rows[key] for key in sorted(rows)]
+
+
+@router.get("/diagnoses")
+async def top_diagnoses(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    nurse: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+):
+    query = _rollup_query(date_from, date_to, nurse, source="consultations")
+    return _top(await rollups.find(query, {"diagnoses": 1}), "diagnoses", limit)
+
+
+@router.get("/concerns")
+async def top_concerns(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    nurse: Optional[str] = None,
+    source: str = Query("consultations", pattern="^(consultations|appointments)$"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Top reasons for visit, from consultations (default) or appointment requests."""
+    query = _rollup_query(date_from, date_to, nurse, source=source)
+    return _top(await rollups.find(query, {"concerns": 1}), "concerns", limit)
+
+
+@router.get("/actions")
+async def actions_taken(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    nurse: Optional[str] = None,
+):
+    """How many consultations ended in each `actionsTaken` outcome."""
+    query = _rollup_query(date_from, date_to, nurse, source="consultations")
+    docs = await rollups.find(query, {"visits": 1, "actions": 1})
+    totals = {flag: 0 for flag in ACTION_FLAGS}
+    for doc in docs:
+        for flag, count in (doc.get("actions") or {}).items():
+            totals[flag] = totals.get(flag, 0) + count
+    return {"consultations": sum(doc.get("visits", 0) for doc in docs), "actions": totals}
@@ -1,14 +1,39 @@
-import logging
-logging.basicConfig(level=logging.DEBUG)
-
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List
-from backend.database.connection import db
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Literal, Optional
+from backend.database import connection
+from backend.database.async_db import AsyncCollection, run_db
+from backend.database.pagination import DEFAULT_PAGE_SIZE, list_filter, name_tokens, paginate, parse_day
+from backend.database.versions import collection_versions
+from backend.database.datetimes import parse_date_time
+from backend.services.appointments import (
+    ACCEPTED, REJECTED, RELEASED_STATUSES, appointment_table, booking_keys,
+)
+from backend.services.conditional import etag_headers, list_etag, not_modified
+from backend.services.events import appointment_events, sse_stream
+from backend.services.idempotency import idempotent
+from backend.services.occupancy import SLOT_TIMES, occupancy
+from backend.services.rollups import ROLLUP_PROJECTION, update_rollups
+from backend.services.schedules import precompute_schedule, schedule_table
+from backend.services.responses import FastJSONResponse
+from backend.services.sessions import current_session, stream_session
+from backend.services.streaming import compact as compact_rows
+from backend.routes.record_routes import record_from_appointment, records
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson import ObjectId
+from datetime import datetime, timedelta
 
 router = APIRouter()
-appointments = db["student_appointments"]
+appointments = AsyncCollection("student_appointments")
+# List reads, which may go to a secondary (MONGO_LIST_READ_PREFERENCE).
+appointment_lists = AsyncCollection("student_appointments", listing=True)
+
+class AppointmentBatch(BaseModel):
+    ids: List[str]
+    action: Literal["accept", "reject", "delete"]
 
 class Appointment(BaseModel):
     id: str = None
@@ -21,99 +46,395 @@ class Appointment(BaseModel):
     dateTime: str
     status: str
 
-import datetime
-from bson import ObjectId
+def deleted_event(a) -> dict:
+    """Payload of a `deleted` event published by a write route, which still knows the slot."""
+    row = appointment_table(a)
+    return {"id": row["id"], "nurse": row["nurse"], "dateTime": row["dateTime"]}
 
-def appointment_table(a) -> dict:
-    student_id = a.get("studentId", "")
-    if isinstance(student_id, ObjectId):
-        student_id = str(student_id)
-    nurse = a.get("nurse", "")
-    if isinstance(nurse, ObjectId):
-        nurse = str(nurse)
-    date_time = a.get("dateTime", "")
-    if isinstance(date_time, datetime.datetime):
-        date_time = date_time.isoformat()
-    return {
-        "id": str(a["_id"]),
-        "studentId": student_id,
-        "lastName": a.get("lastName", ""),
-        "firstName": a.get("firstName", ""),
-        "email": a.get("email", "N/A"),
-        "concern": a.get("concern", ""),
-        "nurse": nurse,
-        "dateTime": date_time,
-        "status": a.get("status", "")
-    }
+def appointment_change_event(change):
+    """Map a change stream document on student_appointments to an SSE (kind, data) pair."""
+    operation = change.get("operationType")
+    if operation == "delete":
+        return "deleted", {"id": str(change["documentKey"]["_id"])}
+    document = change.get("fullDocument")
+    if document is None:
+        return None
+    if operation == "insert":
+        return "created", appointment_table(document)
+    if operation in ("update", "replace"):
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        kind = "accepted" if updated.get("status") == ACCEPTED else "updated"
+        return kind, appointment_table(document)
+    return None
 
 import logging
 from fastapi import status
 
 logger = logging.getLogger(__name__)
 
-@router.get("/appointments")
-async def get_appointments():
+@router.get("/appointments", dependencies=[Depends(current_session)])
+async def get_appointments(
+    request: Request,
+    name: Optional[str] = None,
+    status_filter: Optional[List[str]] = Query(None, alias="status"),
+    nurse: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    compact: bool = False,
+):
+    etag = await list_etag(request, appointments.name)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    query = list_filter(name, status_filter, nurse, date_from, date_to)
     try:
-        raw_appointments = list(appointments.find())
-        logger.debug(f"Raw appointments from DB: {raw_appointments}")
-        return [appointment_table(a) for a in raw_appointments]
+        serialize = compact_rows(appointment_table) if compact else appointment_table
+        page = await paginate(appointment_lists, query, serialize, cursor=cursor,
+                              limit=limit, descending=sort == "desc")
+        return FastJSONResponse(page, headers=etag_headers(etag))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching appointments: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal Server Error")
 
+MAX_AVAILABILITY_DAYS = 62
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.get("/appointments/events", dependencies=[Depends(stream_session)])
+async def appointment_event_stream(
+    last_event_id: Optional[str] = Header(None),
+    lastEventId: Optional[str] = None,
+):
+    """Server-Sent Events of appointment deltas: created, accepted, updated, deleted.
+
+    A `reset` event means the client missed events and should reload.
+    """
+    return StreamingResponse(
+        sse_stream(appointment_events, last_event_id or lastEventId),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@router.get("/availability/events")
+async def slot_event_stream(
+    last_event_id: Optional[str] = Header(None),
+    lastEventId: Optional[str] = None,
+):
+    """Server-Sent Events for the booking page: which slot was taken or freed.
+
+    Carries only the nurse, date and time of each slot, never who booked it.
+    """
+    return StreamingResponse(
+        sse_stream(appointment_events, last_event_id or lastEventId, view=slot_event),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@router.get("/availability")
+async def get_availability(nurse: str, date_from: str = Query(..., alias="from"), date_to: Optional[str] = Query(None, alias="to")):
+    start = parse_day(date_from, "from")
+    end = parse_day(date_to, "to") if date_to else start
+    if end < start or (end - start).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must cover 1 to {MAX_AVAILABILITY_DAYS} days")
+
+    taken = await occupancy.taken(nurse, start, end)
+    return {
+        "nurse": nurse,
+        "days": [
+            {
+                "date": day,
+                "taken": sorted(slots),
+                "free": [t for t in dict.fromkeys(SLOT_TIMES) if t not in slots],
+            }
+            for day, slots in taken.items()
+        ],
+    }
+
+@router.get("/appointments/schedule", dependencies=[Depends(current_session)])
+async def get_schedule(date: Optional[str] = None):
+    """Each nurse's pending and accepted appointments for one day (default tomorrow).
+
+    Served from `daily_schedules`, which the precompute-schedule job fills
+    ahead of time; rebuilt here when appointments changed since.
+    """
+    day = parse_day(date, "date") if date else datetime.now().date() + timedelta(days=1)
+    return schedule_table(await precompute_schedule(day))
+
+SLOT_TAKEN = "Time slot already booked for this nurse."
+STUDENT_BOOKED = "Student already has an appointment on this date."
+
+def slot_event(kind: str, data: dict):
+    """The public view of an appointment event: `taken` or `freed` with nurse, date and time.
+
+    Deletes reported by a change stream only carry the id, so their `freed`
+    event has no slot and clients refetch whatever they show.
+    """
+    if kind == "deleted" or data.get("status") in RELEASED_STATUSES:
+        kind = "freed"
+    else:
+        kind = "taken"
+    if not data.get("nurse") or not data.get("dateTime"):
+        return kind, {}
+    day, _, time = data["dateTime"].partition("T")
+    return kind, {"nurse": data["nurse"], "date": day, "time": time}
+
+async def _duplicate_detail(details: dict, data: dict) -> str:
+    """Which booking rule a duplicate key error (`error.details` or a bulk write error) broke."""
+    key_pattern = (details or {}).get("keyPattern") or {}
+    if "nurse" in key_pattern:
+        return SLOT_TAKEN
+    if "studentId" in key_pattern:
+        return STUDENT_BOOKED
+    # Servers that do not report the key pattern: look up which rule failed.
+    clash = await appointments.find_one({"nurse": data["nurse"], "dateTime": data["dateTime"], "slotHeld": True})
+    return SLOT_TAKEN if clash else STUDENT_BOOKED
+
 @router.post("/appointments")
-async def create_appointment(appointment: Appointment):
-    appointment_date = appointment.dateTime.split("T")[0]
-    start_of_day = f"{appointment_date}T00:00"
-    end_of_day = f"{appointment_date}T23:59"
-
-    if appointments.find_one({
-        "nurse": appointment.nurse,
-        "dateTime": appointment.dateTime,
-        "status": {"$ne": "Rejected"}
-    }):
-        raise HTTPException(status_code=400, detail="Time slot already booked for this nurse.")
-
-    if appointments.find_one({
-        "studentId": appointment.studentId,
-        "dateTime": {
-            "$gte": start_of_day,
-            "$lte": end_of_day
-        },
-        "status": {"$ne": "Rejected"}
-    }):
-        raise HTTPException(status_code=400, detail="Student already has an appointment on this date.")
+async def create_appointment(request: Request, idempotency_key: Optional[str] = Header(None)):
+    # Parsed here rather than as a body parameter so a replayed request
+    # skips validation too.
+    body = await request.body()
+    return await idempotent(idempotency_key, "POST /appointments", body, lambda save: _create_appointment(body, save))
+
+async def _create_appointment(body: bytes, save) -> dict:
+    try:
+        appointment = Appointment.parse_obj(orjson.loads(body))
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    try:
+        date_time = parse_date_time(appointment.dateTime)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid dateTime, expected YYYY-MM-DDTHH:MM")
 
     data = appointment.dict(exclude_unset=True)
-    result = appointments.insert_one(data)
-    return {"message": "Appointment created successfully.", "id": str(result.inserted_id)}
+    data["dateTime"] = date_time
+    data["nameTokens"] = name_tokens(appointment.firstName, appointment.lastName)
+    data.update(booking_keys(appointment.status, date_time))
+
+    # Both booking rules are enforced by unique indexes, so concurrent
+    # requests for the same slot cannot both succeed.
+    try:
+        result = await appointments.insert_one(data)
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=400, detail=await _duplicate_detail(e.details, data))
+    response = {"message": "Appointment created successfully.", "id": str(result.inserted_id)}
+    await save(response)
 
-@router.patch("/appointments/{id}/accept")
+    await collection_versions.bump(appointments.name)
+    await update_rollups("appointments", added=[data])
+    if "slotHeld" in data:
+        occupancy.book(appointment.nurse, date_time, str(result.inserted_id))
+    appointment_events.publish_local("created", appointment_table({**data, "_id": result.inserted_id}))
+    return response
+
+@router.patch("/appointments/{id}/accept", dependencies=[Depends(current_session)])
 async def accept_appointment(id: str):
     try:
         obj_id = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid appointment ID")
 
-    result = appointments.update_one(
-        {"_id": obj_id},
-        {"$set": {"status": "Accepted"}}
-    )
+    # A rejected or expired appointment gave up its slot; taking it back is
+    # checked by the booking indexes like a new booking.
+    try:
+        previous = await appointments.find_one_and_update(
+            {"_id": obj_id},
+            {"$set": {"status": ACCEPTED, "slotHeld": True}},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError as e:
+        current = await appointments.find_one({"_id": obj_id})
+        raise HTTPException(status_code=409, detail=await _duplicate_detail(e.details, current))
 
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
+    updated = {**previous, "status": ACCEPTED, "slotHeld": True}
+    await collection_versions.bump(appointments.name)
+    await update_rollups("appointments", removed=[previous], added=[updated])
+    occupancy.book(updated.get("nurse"), updated.get("dateTime"), id)
+    appointment_events.publish_local("accepted", appointment_table(updated))
+
     return {"message": "Appointment accepted successfully"}
 
-@router.delete("/appointments/{id}")
+@router.delete("/appointments/{id}", dependencies=[Depends(current_session)])
 async def delete_appointment(id: str):
     try:
         obj_id = ObjectId(id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid appointment ID")
 
-    result = appointments.delete_one({"_id": obj_id})
-    if result.deleted_count == 0:
+    deleted = await appointments.find_one_and_delete({"_id": obj_id}, projection=ROLLUP_PROJECTION)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
+    await collection_versions.bump(appointments.name)
+    await update_rollups("appointments", removed=[deleted])
+    occupancy.release(deleted.get("nurse"), deleted.get("dateTime"))
+    appointment_events.publish_local("deleted", deleted_event(deleted))
+
     return {"message": "Appointment deleted successfully"}
+
+MAX_BATCH_SIZE = 500
+
+# status an action moves an appointment to; delete removes it instead
+BATCH_TARGET_STATUS = {"accept": ACCEPTED, "reject": REJECTED}
+BATCH_DONE = {"accept": "accepted", "reject": "rejected", "delete": "deleted"}
+
+def _batch_operations(action: str, docs: list):
+    if action == "delete":
+        return [DeleteOne({"_id": d["_id"]}) for d in docs], []
+    if action == "reject":
+        # Rejected appointments release their slot for the booking indexes.
+        return [UpdateOne({"_id": d["_id"]}, {"$set": {"status": REJECTED}, "$unset": {"slotHeld": ""}})
+                for d in docs], []
+    # Accepting takes the slot back if a reject or expiry released it.
+    return ([UpdateOne({"_id": d["_id"]}, {"$set": {"status": ACCEPTED, "slotHeld": True}}) for d in docs],
+            [record_from_appointment(d) for d in docs])
+
+class _FailedWrites(Exception):
+    """Raised inside a batch transaction to abort it; `failed` holds the write errors by index."""
+
+    def __init__(self, failed: dict):
+        super().__init__(f"{len(failed)} batch writes failed")
+        self.failed = failed
+
+def _write_errors(error: BulkWriteError, indexes: list) -> dict:
+    """A bulk write's errors keyed by batch index; `indexes` maps its operations to the batch."""
+    errors = error.details.get("writeErrors", [])
+    if not errors:
+        # Nothing failed per item (e.g. a write concern error).
+        raise error
+    return {indexes[err["index"]]: err for err in errors}
+
+def _write_batch(operations, new_records):
+    """Apply the appointment updates and record copies, atomically when the server allows.
+
+    An unordered bulk write carries on past a failed operation, and only
+    that operation is left undone. Returns (failed, uncopied), both
+    {batch index: write error}: `failed` appointments were not changed,
+    `uncopied` ones were but their record copy failed. In a transaction,
+    failed items are left out and the transaction is run again, so there
+    is nothing uncopied.
+    """
+    def write(indexes, session=None):
+        failed, uncopied = {}, {}
+        if indexes:
+            try:
+                appointments.sync.bulk_write([operations[i] for i in indexes], ordered=False, session=session)
+            except BulkWriteError as e:
+                failed = _write_errors(e, indexes)
+                if session is not None:
+                    raise _FailedWrites(failed)
+        copied = [i for i in indexes if i not in failed] if new_records else []
+        if copied:
+            try:
+                records.sync.insert_many([new_records[i] for i in copied], ordered=False, session=session)
+            except BulkWriteError as e:
+                # Records that already exist (appointmentId is unique) are fine.
+                uncopied = {i: err for i, err in _write_errors(e, copied).items() if err.get("code") != 11000}
+                if uncopied and session is not None:
+                    raise _FailedWrites(uncopied)
+        return failed, uncopied
+
+    indexes = list(range(len(operations)))
+    if not connection.supports_transactions():
+        return write(indexes)
+    failed = {}
+    with connection.client.start_session() as session:
+        while True:
+            remaining = [i for i in indexes if i not in failed]
+            try:
+                session.with_transaction(lambda s: write(remaining, s))
+                return failed, {}
+            except _FailedWrites as e:
+                failed.update(e.failed)
+
+@router.post("/appointments/batch", dependencies=[Depends(current_session)])
+async def batch_appointments(batch: AppointmentBatch):
+    """Accept, reject or delete many appointments with one bulk write.
+
+    Accepting also copies the appointments into student_records in the
+    same transaction (on deployments that support transactions).
+    """
+    if len(batch.ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} appointments per batch")
+
+    results = {}
+    obj_ids = {}
+    for id in dict.fromkeys(batch.ids):
+        try:
+            obj_ids[id] = ObjectId(id)
+        except Exception:
+            results[id] = {"id": id, "ok": False, "status": 400, "detail": "Invalid appointment ID"}
+
+    found = {str(d["_id"]): d for d in await appointments.find({"_id": {"$in": list(obj_ids.values())}})}
+    target_status = BATCH_TARGET_STATUS.get(batch.action)
+    docs = []
+    for id in obj_ids:
+        doc = found.get(id)
+        if doc is None:
+            results[id] = {"id": id, "ok": False, "status": 404, "detail": "Appointment not found"}
+        elif target_status and doc.get("status") == target_status:
+            results[id] = {"id": id, "ok": False, "status": 409, "detail": f"Appointment already {target_status.lower()}"}
+        else:
+            docs.append(doc)
+
+    operations, new_records = _batch_operations(batch.action, docs)
+    try:
+        failed, uncopied = await run_db(_write_batch, operations, new_records)
+    except Exception as e:
+        logger.error(f"Batch {batch.action} failed: {e}")
+        for doc in docs:
+            id = str(doc["_id"])
+            results[id] = {"id": id, "ok": False, "status": 500, "detail": "Batch write failed"}
+        # Without a transaction part of the batch may have been written;
+        # have cached lists fetch it again.
+        await collection_versions.bump(appointments.name)
+        docs, failed, uncopied = [], {}, {}
+    for index, error in failed.items():
+        id = str(docs[index]["_id"])
+        if error.get("code") == 11000:
+            results[id] = {"id": id, "ok": False, "status": 409, "detail": await _duplicate_detail(error, docs[index])}
+        else:
+            logger.error(f"Batch {batch.action} of {id} failed: {error.get('errmsg')}")
+            results[id] = {"id": id, "ok": False, "status": 500, "detail": "Batch write failed"}
+    for index, error in uncopied.items():
+        logger.error(f"Record copy of accepted appointment {docs[index]['_id']} failed: {error.get('errmsg')}")
+    uncopied = {str(docs[index]["_id"]) for index in uncopied}
+    docs = [doc for index, doc in enumerate(docs) if index not in failed]
+
+    if docs:
+        await collection_versions.bump(appointments.name)
+        if batch.action == "accept":
+            await collection_versions.bump(records.name)
+        changed = [] if batch.action == "delete" else [{**d, "status": target_status} for d in docs]
+        await update_rollups("appointments", removed=docs, added=changed)
+    for doc in docs:
+        id = str(doc["_id"])
+        if id in uncopied:
+            results[id] = {"id": id, "ok": False, "status": 500,
+                           "detail": "Appointment accepted, but its record could not be saved"}
+        else:
+            results[id] = {"id": id, "ok": True, "status": 200, "detail": f"Appointment {BATCH_DONE[batch.action]}"}
+        if batch.action == "accept":
+            occupancy.book(doc.get("nurse"), doc.get("dateTime"), id)
+            appointment_events.publish_local("accepted", appointment_table({**doc, "status": ACCEPTED}))
+        elif batch.action == "reject":
+            occupancy.release(doc.get("nurse"), doc.get("dateTime"))
+            appointment_events.publish_local("updated", appointment_table({**doc, "status": REJECTED}))
+        else:
+            occupancy.release(doc.get("nurse"), doc.get("dateTime"))
+            appointment_events.publish_local("deleted", deleted_event(doc))
+
+    ordered = [results[id] for id in dict.fromkeys(batch.ids)]
+    succeeded = sum(1 for r in ordered if r["ok"])
+    return {"action": batch.action, "succeeded": succeeded, "failed": len(ordered) - succeeded, "results": ordered}
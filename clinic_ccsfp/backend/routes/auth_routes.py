@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
 from typing import List
-from passlib.context import CryptContext
-from backend.database.connection import users as admin_users, db
+from backend.database.async_db import AsyncCollection
+from backend.services.cache import admin_user_cache
+from backend.services.passwords import hash_password, verify_password
+from backend.services.sessions import current_session, issue_token, require_admin, revocations
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-records = db["student_records"]
+admin_users = AsyncCollection("admin_users")
 
 PERMANENT_ADMIN = {
     "username": "admin",
@@ -36,15 +36,6 @@ class UserOut(BaseModel):
     email: EmailStr
     status: str
 
-class Record(BaseModel):
-    studentId: str
-    lastName: str
-    firstName: str
-    concern: str
-    nurse: str
-    dateTime: str
-    email: str
-
 def admin_user_table(user) -> dict:
     return {
         "full_name": user["full_name"],
@@ -53,72 +44,82 @@ def admin_user_table(user) -> dict:
         "status": user["status"]
     }
 
-def get_user_by_username(username: str):
-    return admin_users.find_one({"username": username})
+def _find_user(username: str):
+    return admin_users.sync.find_one({"username": username})
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
+def _find_users(query: dict) -> list:
+    return list(admin_users.sync.find(query, {"password_hash": 0}))
 
-def verify_password(plain: str, hashed: str):
-    return pwd_context.verify(plain, hashed)
+# Admin users change only on register/approve/create/delete, so lookups go
+# through a read-through cache that those routes invalidate.
+async def get_user_by_username(username: str):
+    return await admin_user_cache.get(("user", username), _find_user, username)
+
+async def find_admin_users(status: str = None) -> list:
+    query = {"status": status} if status else {}
+    return await admin_user_cache.get(("list", status), _find_users, query)
 
 @router.post("/register")
-def register(user: UserRegister):
-    if get_user_by_username(user.username):
+async def register(user: UserRegister):
+    if await get_user_by_username(user.username):
         raise HTTPException(400, "Username already exists")
 
     data = {
         "full_name": user.full_name,
         "username": user.username,
         "email": user.email,
-        "password_hash": hash_password(user.password),
+        "password_hash": await hash_password(user.password),
         "status": "Pending"
     }
 
-    admin_users.insert_one(data)
+    await admin_users.insert_one(data)
+    await admin_user_cache.invalidate()
     return {"message": "Registration successful. Please wait for approval."}
 
 @router.post("/login")
-def login(user: UserLogin):
+async def login(user: UserLogin):
     if user.username == PERMANENT_ADMIN["username"] and user.password == PERMANENT_ADMIN["password"]:
-        return {"message": "Login successful", "role": "admin"}
+        return {"message": "Login successful", "role": "admin", **issue_token(user.username, "admin")}
 
-    db_user = get_user_by_username(user.username)
-    if not db_user or not verify_password(user.password, db_user["password_hash"]):
+    db_user = await get_user_by_username(user.username)
+    if not db_user or not await verify_password(user.password, db_user["password_hash"]):
         raise HTTPException(400, "Invalid username or password")
     if db_user["status"] != "Active":
         raise HTTPException(403, "User not approved yet")
 
-    return {"message": "Login successful", "role": "staff"}
+    return {"message": "Login successful", "role": "staff", **issue_token(user.username, "staff")}
+
+@router.get("/session")
+async def get_session(session: dict = Depends(current_session)):
+    return {"username": session["sub"], "role": session["role"], "expiresAt": session["exp"]}
 
-@router.get("/pending-users", response_model=List[UserOut])
-def get_pending_users():
-    users = admin_users.find({"status": "Pending"}, {"_id": 0, "password_hash": 0})
-    return [admin_user_table(u) for u in users]
+@router.post("/logout")
+async def logout(session: dict = Depends(current_session)):
+    await revocations.revoke(session)
+    return {"message": "Logged out"}
 
-@router.post("/approve-user")
-def approve_user(user: UserApprove):
-    result = admin_users.update_one(
+@router.get("/pending-users", response_model=List[UserOut], dependencies=[Depends(require_admin)])
+async def get_pending_users():
+    return [admin_user_table(u) for u in await find_admin_users("Pending")]
+
+@router.post("/approve-user", dependencies=[Depends(require_admin)])
+async def approve_user(user: UserApprove):
+    result = await admin_users.update_one(
         {"username": user.username, "status": "Pending"},
         {"$set": {"status": "Active"}}
     )
     if result.matched_count == 0:
         raise HTTPException(404, "User not found or already approved")
 
+    await admin_user_cache.invalidate()
     return {"message": "User approved successfully"}
 
-@router.delete("/clear-admin-users")
-def clear_admin_users():
-    result = admin_users.delete_many({})
+@router.delete("/clear-admin-users", dependencies=[Depends(require_admin)])
+async def clear_admin_users():
+    result = await admin_users.delete_many({})
+    await admin_user_cache.invalidate()
     return {"message": f"Deleted {result.deleted_count} admin users."}
 
-@router.post("/records")
-def add_record(record: Record):
-    records.insert_one(record.dict())
-    return {"message": "Record saved"}
-
-@router.get("/records")
-def get_all_records():
-    return list(records.find({}, {"_id": 0}))
-
-
+@router.get("/cache-stats", dependencies=[Depends(require_admin)])
+async def get_cache_stats():
+    return {"adminUsers": admin_user_cache.stats()}
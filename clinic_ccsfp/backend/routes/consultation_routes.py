@@ -1,11 +1,27 @@
-from fastapi import APIRouter, HTTPException, Request
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ValidationError
 from typing import List, Optional
-from backend.database.connection import db
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import format_date_time, parse_date_time
+from backend.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, list_filter, name_tokens
+from backend.database.versions import collection_versions
+from backend.services.archive import chain_batches, list_collections, list_versions
+from backend.services.conditional import etag_headers, list_etag, not_modified
+from backend.services.idempotency import idempotent
+from backend.services.rollups import ROLLUP_PROJECTION, update_rollups
+from backend.services.search import ConsultationSearch
+from backend.services.streaming import compact as compact_rows, export_stream, flatten, json_array
+from backend.services.sessions import current_session
 from bson import ObjectId
+from pymongo import ReturnDocument
 
-router = APIRouter()
-consultations = db["student_consultations"]
+router = APIRouter(dependencies=[Depends(current_session)])
+consultations = AsyncCollection("student_consultations")
+# List reads, which may go to a secondary (MONGO_LIST_READ_PREFERENCE).
+consultation_lists = AsyncCollection("student_consultations", listing=True)
+consultation_search = ConsultationSearch(consultations)
 
 class ActionsTaken(BaseModel):
     restedInClinic: bool = False
@@ -45,117 +61,342 @@ class Consultation(BaseModel):
     nurseName: Optional[str] = ""
     nurseSignature: Optional[str] = ""
     nurseDate: Optional[str] = ""
+    # Bumped on every write. Send back the version you read to have the
+    # write rejected with 409 if someone else saved in between.
+    version: Optional[int] = None
 
-from datetime import datetime
+class ActionsTakenPatch(BaseModel):
+    restedInClinic: Optional[bool] = None
+    givenFirstAid: Optional[bool] = None
+    administeredMedication: Optional[bool] = None
+    medicationDetails: Optional[str] = None
+    sentHome: Optional[bool] = None
+    referred: Optional[bool] = None
+    referredTo: Optional[str] = None
+    others: Optional[bool] = None
+    othersDetails: Optional[str] = None
+
+class ConsultationPatch(BaseModel):
+    studentId: Optional[str] = None
+    firstName: Optional[str] = None
+    middleInitial: Optional[str] = None
+    lastName: Optional[str] = None
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    gradeSection: Optional[str] = None
+    dateOfBirth: Optional[str] = None
+    address: Optional[str] = None
+    parentGuardian: Optional[str] = None
+    contactNumber: Optional[str] = None
+    concern: Optional[str] = None
+    nurse: Optional[str] = None
+    dateTime: Optional[str] = None
+    temperature: Optional[str] = None
+    pulseRate: Optional[str] = None
+    bloodPressure: Optional[str] = None
+    respiratoryRate: Optional[str] = None
+    assessment: Optional[str] = None
+    diagnosis: Optional[str] = None
+    actionsTaken: Optional[ActionsTakenPatch] = None
+    recommendations: Optional[str] = None
+    nurseName: Optional[str] = None
+    nurseSignature: Optional[str] = None
+    nurseDate: Optional[str] = None
+    version: Optional[int] = None
+
+def stored_date_time(consultation):
+    if not consultation.dateTime:
+        return None
+    try:
+        return parse_date_time(consultation.dateTime)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid dateTime, expected YYYY-MM-DDTHH:MM")
+
+DEFAULT_ACTIONS_TAKEN = ActionsTaken().dict()
+
+# Text fields returned by consultation_table, in response order around the
+# non-text fields (id, age, dateTime, actionsTaken) that it fills in itself.
+PERSON_FIELDS = ["studentId", "firstName", "middleInitial", "lastName"]
+PROFILE_FIELDS = ["gender", "gradeSection", "dateOfBirth", "address", "parentGuardian",
+                  "contactNumber", "concern", "nurse"]
+VITALS_FIELDS = ["temperature", "pulseRate", "bloodPressure", "respiratoryRate", "assessment", "diagnosis"]
+NURSE_FIELDS = ["recommendations", "nurseName", "nurseSignature", "nurseDate"]
+
+CONSULTATION_PROJECTION = dict.fromkeys(
+    PERSON_FIELDS + ["age"] + PROFILE_FIELDS + ["dateTime"] + VITALS_FIELDS + ["actionsTaken"] + NURSE_FIELDS
+    + ["version"], 1
+)
+STREAM_BATCH_SIZE = 1000
+
+def _text_fields(c, fields) -> dict:
+    out = {}
+    for field in fields:
+        value = c.get(field, "")
+        out[field] = value if value is None or value.__class__ is str else str(value)
+    return out
+
+def _age(value):
+    if value is None or value.__class__ is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 def consultation_table(c) -> dict:
-    c = dict(c)
-    student_id = c.get("studentId", "")
-    if hasattr(student_id, "binary"):  # check if ObjectId
-        student_id = str(student_id)
-    date_time = c.get("dateTime", "")
-    if isinstance(date_time, datetime):
-        date_time = date_time.isoformat()
-    actions_taken = c.get("actionsTaken", {
-        "restedInClinic": False,
-        "givenFirstAid": False,
-        "administeredMedication": False,
-        "medicationDetails": "",
-        "sentHome": False,
-        "referred": False,
-        "referredTo": "",
-        "others": False,
-        "othersDetails": ""
-    })
-    if not isinstance(actions_taken, dict) or isinstance(actions_taken, str):
-        actions_taken = {
-            "restedInClinic": False,
-            "givenFirstAid": False,
-            "administeredMedication": False,
-            "medicationDetails": "",
-            "sentHome": False,
-            "referred": False,
-            "referredTo": "",
-            "others": False,
-            "othersDetails": ""
-        }
+    """Serialize a stored consultation into the `Consultation` response shape.
+
+    Output already satisfies the model (text fields are strings, `age` an
+    int, `actionsTaken` complete), so list endpoints can encode it directly
+    instead of validating every row again.
+    """
+    actions_taken = c.get("actionsTaken")
+    if isinstance(actions_taken, dict):
+        actions_taken = {k: actions_taken.get(k, d) for k, d in DEFAULT_ACTIONS_TAKEN.items()}
+    else:
+        actions_taken = dict(DEFAULT_ACTIONS_TAKEN)
+
+    row = {"id": str(c.get("_id", ""))}
+    row.update(_text_fields(c, PERSON_FIELDS))
+    row["age"] = _age(c.get("age", 0))
+    row.update(_text_fields(c, PROFILE_FIELDS))
+    row["dateTime"] = format_date_time(c.get("dateTime", ""))
+    row.update(_text_fields(c, VITALS_FIELDS))
+    row["actionsTaken"] = actions_taken
+    row.update(_text_fields(c, NURSE_FIELDS))
+    row["version"] = c.get("version", 0)
+    return row
+
+CONSULTATION_COLUMNS = list(flatten(consultation_table({})))
+
+@router.get("/consultations", response_model=List[Consultation])
+async def get_consultations(
+    request: Request,
+    name: Optional[str] = None,
+    nurse: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    compact: bool = False,
+    include_archived: bool = False,
+):
+    etag = await list_etag(request, *list_versions(consultations, include_archived))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    query = list_filter(name=name, nurse=nurse, date_from=date_from, date_to=date_to)
+    sources = await list_collections(consultation_lists, include_archived, query.get("dateTime"))
+    batches = chain_batches(sources, query, CONSULTATION_PROJECTION, batch_size=STREAM_BATCH_SIZE)
+    serialize = compact_rows(consultation_table) if compact else consultation_table
+    return StreamingResponse(json_array(batches, serialize), media_type="application/json",
+                             headers=etag_headers(etag))
+
+@router.get("/consultations/search")
+async def search_consultations(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+):
+    """Ranked search over names, concern, assessment, diagnosis and recommendations."""
+    etag = await list_etag(request, consultations.name)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    hits = await consultation_search.search(q)
+    page = hits[offset:offset + limit]
+    found = await consultations.find({"_id": {"$in": [doc_id for _, _, doc_id in page]}}, CONSULTATION_PROJECTION)
+    docs = {doc["_id"]: doc for doc in found}
+    items = [{**consultation_table(docs[doc_id]), "score": round(score, 2)}
+             for score, _, doc_id in page if doc_id in docs]
+    next_offset = offset + limit
+    response.headers.update(etag_headers(etag))
     return {
-        "id": str(c.get("_id", "")),
-        "studentId": student_id,
-        "firstName": c.get("firstName", ""),
-        "middleInitial": c.get("middleInitial", ""),
-        "lastName": c.get("lastName", ""),
-        "age": c.get("age", 0),
-        "gender": c.get("gender", ""),
-        "gradeSection": c.get("gradeSection", ""),
-        "dateOfBirth": c.get("dateOfBirth", ""),
-        "address": c.get("address", ""),
-        "parentGuardian": c.get("parentGuardian", ""),
-        "contactNumber": c.get("contactNumber", ""),
-        "concern": c.get("concern", ""),
-        "nurse": c.get("nurse", ""),
-        "dateTime": date_time,
-        "temperature": c.get("temperature", ""),
-        "pulseRate": c.get("pulseRate", ""),
-        "bloodPressure": c.get("bloodPressure", ""),
-        "respiratoryRate": c.get("respiratoryRate", ""),
-        "assessment": c.get("assessment", ""),
-        "diagnosis": c.get("diagnosis", ""),
-        "actionsTaken": actions_taken,
-        "recommendations": c.get("recommendations", ""),
-        "nurseName": c.get("nurseName", ""),
-        "nurseSignature": c.get("nurseSignature", ""),
-        "nurseDate": c.get("nurseDate", "")
+        "items": items,
+        "total": len(hits),
+        "nextCursor": str(next_offset) if next_offset < len(hits) else None,
     }
 
-@router.get("/consultations", response_model=List[Consultation])
-async def get_consultations():
-    consultations_list = []
-    for c in consultations.find():
-        data = consultation_table(c)
-        consultation_obj = Consultation.parse_obj(data)
-        consultations_list.append(consultation_obj)
-    return consultations_list
+@router.get("/consultations/export")
+async def export_consultations(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    name: Optional[str] = None,
+    nurse: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    include_archived: bool = False,
+):
+    query = list_filter(name=name, nurse=nurse, date_from=date_from, date_to=date_to)
+    # Archived terms come first, oldest term first, so rows stay in date order.
+    sources = await list_collections(consultation_lists, include_archived, query.get("dateTime"))
+    batches = chain_batches(sources, query, CONSULTATION_PROJECTION, batch_size=STREAM_BATCH_SIZE,
+                            sort=[("dateTime", 1), ("_id", 1)])
+    body, media_type, extension = export_stream(batches, consultation_table, format, CONSULTATION_COLUMNS, gzip)
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="consultations.{extension}"'
+    })
 
 @router.post("/consultations")
-async def create_consultation(request: Request):
+async def create_consultation(request: Request, idempotency_key: Optional[str] = Header(None)):
+    body = await request.body()
+    return await idempotent(idempotency_key, "POST /consultations", body, lambda save: _create_consultation(body, save))
+
+async def _create_consultation(body: bytes, save) -> dict:
     try:
-        consultation = Consultation.parse_obj(await request.json())
+        consultation = Consultation.parse_obj(orjson.loads(body))
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
-    data = consultation.dict()
+    data = consultation.dict(exclude={"version"})
     data["actionsTaken"] = consultation.actionsTaken.dict()
+    data["dateTime"] = stored_date_time(consultation)
+    data["nameTokens"] = name_tokens(consultation.firstName, consultation.lastName)
+    data["version"] = 1
 
-    result = consultations.insert_one(data)
-    return {"message": "Consultation created successfully.", "id": str(result.inserted_id)}
+    result = await consultations.insert_one(data)
+    response = {"message": "Consultation created successfully.", "id": str(result.inserted_id)}
+    await save(response)
+    version = await collection_versions.bump(consultations.name)
+    await consultation_search.on_write(version, doc={**data, "_id": result.inserted_id})
+    await update_rollups("consultations", added=[data])
+    return response
 
-@router.put("/consultations/{consultation_id}")
-async def update_consultation(consultation_id: str, consultation: Consultation):
+def _consultation_id(consultation_id: str) -> ObjectId:
     try:
-        obj_id = ObjectId(consultation_id)
+        return ObjectId(consultation_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid consultation ID format")
 
-    existing = consultations.find_one({"_id": obj_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail=f"Consultation with ID {consultation_id} not found")
+def _version_filter(version: int) -> dict:
+    # Consultations saved before versioning have no field; they count as 0.
+    return {"version": version} if version else {"version": {"$in": [0, None]}}
+
+async def _missing_or_conflict(obj_id, consultation_id: str, version):
+    if version is not None and await consultations.count_documents({"_id": obj_id}, limit=1):
+        return HTTPException(status_code=409, detail="Consultation was changed by someone else; reload it and retry")
+    return HTTPException(status_code=404, detail=f"Consultation with ID {consultation_id} not found")
+
+@router.put("/consultations/{consultation_id}")
+async def update_consultation(consultation_id: str, consultation: Consultation):
+    obj_id = _consultation_id(consultation_id)
 
-    update_data = consultation.dict()
+    update_data = consultation.dict(exclude={"version"})
     update_data["actionsTaken"] = consultation.actionsTaken.dict()
+    update_data["dateTime"] = stored_date_time(consultation)
+    update_data["nameTokens"] = name_tokens(consultation.firstName, consultation.lastName)
 
-    result = consultations.update_one({"_id": obj_id}, {"$set": update_data})
+    query = {"_id": obj_id}
+    if consultation.version is not None:
+        query.update(_version_filter(consultation.version))
+    # The previous version is needed to move its rollup counts.
+    existing = await consultations.find_one_and_update(
+        query, {"$set": update_data, "$inc": {"version": 1}},
+        projection=ROLLUP_PROJECTION, return_document=ReturnDocument.BEFORE,
+    )
+    if not existing:
+        raise await _missing_or_conflict(obj_id, consultation_id, consultation.version)
+
+    version = await collection_versions.bump(consultations.name)
+    await consultation_search.on_write(version, doc={**update_data, "_id": obj_id})
+    await update_rollups("consultations", removed=[existing], added=[{**existing, **update_data}])
     return {"message": "Consultation updated successfully."}
 
+def _stored_name(field: str) -> dict:
+    return {"$ifNull": [f"${field}", ""]}
+
+# nameTokens recomputed from the stored names, as `name_tokens` does (the
+# order of the tokens aside).
+NAME_TOKENS_EXPRESSION = {"$setUnion": [{"$filter": {
+    "input": {"$split": [{"$toLower": {"$concat": [_stored_name("firstName"), " ", _stored_name("lastName")]}}, " "]},
+    "cond": {"$ne": ["$$this", ""]},
+}}]}
+
+def _patch_pipeline(changes: dict, patch: ConsultationPatch) -> list:
+    """An update pipeline applying `changes`, so the server works out what depends on the stored document.
+
+    - `actionsTaken` is rebuilt flag by flag: sent flags take the new
+      value, the rest keep the stored one or their default. Legacy
+      documents whose `actionsTaken` is not an object get a complete one.
+    - A name change recomputes `nameTokens` from both stored names.
+    - When a field the analytics count changes, its previous values are
+      kept in `rollupPrevious`, so the rollups can be moved from the one
+      document the write returns.
+    """
+    fields = {}
+    for field, value in changes.items():
+        if field == "actionsTaken":
+            fields["actionsTaken"] = {
+                flag: {"$literal": value[flag]} if flag in (value or {})
+                else {"$ifNull": [f"$actionsTaken.{flag}", default]}
+                for flag, default in DEFAULT_ACTIONS_TAKEN.items()
+            }
+        elif field == "dateTime":
+            fields["dateTime"] = {"$literal": stored_date_time(patch)}
+        else:
+            fields[field] = {"$literal": value}
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    if ROLLUP_PROJECTION.keys() & fields.keys():
+        fields["rollupPrevious"] = {field: {"$ifNull": [f"${field}", None]} for field in ROLLUP_PROJECTION}
+    fields["version"] = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+
+    pipeline = [{"$set": fields}]
+    if "firstName" in changes or "lastName" in changes:
+        pipeline.append({"$set": {"nameTokens": NAME_TOKENS_EXPRESSION}})
+    return pipeline
+
+@router.patch("/consultations/{consultation_id}")
+async def patch_consultation(consultation_id: str, patch: ConsultationPatch):
+    """Set only the fields the client sent and return the updated consultation.
+
+    One `find_one_and_update` with an update pipeline, returning the new
+    document. Pass the `version` you read to get a 409 instead of
+    overwriting a concurrent edit.
+    """
+    obj_id = _consultation_id(consultation_id)
+    changes = patch.dict(exclude_unset=True)
+    expected_version = changes.pop("version", None)
+
+    query = {"_id": obj_id}
+    if expected_version is not None:
+        query.update(_version_filter(expected_version))
+    updated = await consultations.find_one_and_update(
+        query, _patch_pipeline(changes, patch),
+        projection={**CONSULTATION_PROJECTION, "nameTokens": 1, "rollupPrevious": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        raise await _missing_or_conflict(obj_id, consultation_id, expected_version)
+
+    # Left over from an earlier patch unless this one changed a counted field.
+    rollup_previous = updated.pop("rollupPrevious", None)
+
+    version = await collection_versions.bump(consultations.name)
+    await consultation_search.on_write(version, doc=updated)
+    if ROLLUP_PROJECTION.keys() & changes.keys():
+        await update_rollups("consultations", removed=[{**updated, **rollup_previous}], added=[updated])
+    return consultation_table(updated)
+
 @router.delete("/consultations/{consultation_id}")
 async def delete_consultation(consultation_id: str):
-    try:
-        obj_id = ObjectId(consultation_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid consultation ID format")
+    obj_id = _consultation_id(consultation_id)
 
-    result = consultations.delete_one({"_id": obj_id})
-    if result.deleted_count == 0:
+    deleted = await consultations.find_one_and_delete({"_id": obj_id}, projection=ROLLUP_PROJECTION)
+    if deleted is None:
         raise HTTPException(status_code=404, detail=f"Consultation with ID {consultation_id} not found")
 
+    version = await collection_versions.bump(consultations.name)
+    await consultation_search.on_write(version, removed_id=obj_id)
+    await update_rollups("consultations", removed=[deleted])
     return {"message": f"Consultation with ID {consultation_id} deleted successfully."}
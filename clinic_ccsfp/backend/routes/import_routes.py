@@ -0,0 +1,80 @@
+import io
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from backend.database import connection
+from backend.database.async_db import AsyncCollection, run_db
+from backend.services.imports import (
+    IMPORT_BATCH_SIZE, IMPORT_JOBS, IMPORT_KINDS, ImportFormatError, Importer, job_summary, read_rows,
+)
+from backend.services.sessions import require_admin
+
+router = APIRouter(prefix="/imports", dependencies=[Depends(require_admin)])
+import_jobs = AsyncCollection(IMPORT_JOBS)
+
+CONTENT_TYPE_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+
+@router.post("/{kind}")
+async def import_rows(
+    kind: str,
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|csv)$"),
+    job: Optional[str] = None,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10_000),
+):
+    """Bulk-load appointments or consultations from the request body.
+
+    The format comes from `format` or the Content-Type. The body is spooled
+    to a temporary file, then read, validated and inserted a batch at a time
+    on the database executor. Pass the returned `job` back to resume an
+    import that stopped part way; rows it already wrote are skipped.
+    """
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown import kind {kind!r}")
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip()
+    fmt = format or CONTENT_TYPE_FORMATS.get(content_type)
+    if not fmt:
+        raise HTTPException(status_code=400, detail="Pass format=json|ndjson|csv or a matching Content-Type")
+
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+
+        importer = Importer(connection.db, kind, job_id=job, source=f"upload ({fmt})", batch_size=batch_size)
+        try:
+            await run_db(importer.start)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+        batches = importer.batches(read_rows(stream, fmt))
+        try:
+            while True:
+                batch = await run_db(next, batches, None)
+                if batch is None:
+                    break
+                await run_db(importer.write, batch)
+        except ImportFormatError as e:
+            await run_db(importer.finish, "failed")
+            raise HTTPException(status_code=400, detail=f"{e} (after row {importer.checkpoint}; job {importer.job_id})")
+        except BaseException:
+            await run_db(importer.finish, "failed")
+            raise
+        return job_summary(await run_db(importer.finish))
+
+
+@router.get("/{job_id}")
+async def get_import(job_id: str):
+    job = await import_jobs.find_one({"_id": job_id})
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Import job {job_id} not found")
+    return job_summary(job)
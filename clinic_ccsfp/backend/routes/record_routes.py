@@ -1,9 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from backend.database.connection import db
+from typing import Optional
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import format_date_time, parse_date_time
+from backend.database.pagination import DEFAULT_PAGE_SIZE, list_filter, name_tokens, paginate
+from backend.database.versions import collection_versions
+from backend.services.archive import chain_batches, list_collections, list_versions
+from backend.services.conditional import etag_headers, list_etag, not_modified
+from backend.services.streaming import compact as compact_rows, export_stream
+from backend.services.responses import FastJSONResponse
+from backend.services.sessions import current_session
 
-router = APIRouter()
-records = db["student_records"]
+router = APIRouter(dependencies=[Depends(current_session)])
+records = AsyncCollection("student_records")
+# List reads, which may go to a secondary (MONGO_LIST_READ_PREFERENCE).
+record_lists = AsyncCollection("student_records", listing=True)
+
+EXPORT_BATCH_SIZE = 1000
 
 class Record(BaseModel):
     studentId: str
@@ -14,13 +28,86 @@ class Record(BaseModel):
     dateTime: str
     email: str
 
+def record_table(r) -> dict:
+    return {
+        "id": str(r["_id"]),
+        "studentId": r.get("studentId", ""),
+        "lastName": r.get("lastName", ""),
+        "firstName": r.get("firstName", ""),
+        "concern": r.get("concern", ""),
+        "nurse": r.get("nurse", ""),
+        "dateTime": format_date_time(r.get("dateTime", "")),
+        "email": r.get("email", "")
+    }
+
+def record_from_appointment(a) -> dict:
+    """The student_records copy of an accepted appointment."""
+    return {
+        "appointmentId": a["_id"],
+        "studentId": a.get("studentId", ""),
+        "lastName": a.get("lastName", ""),
+        "firstName": a.get("firstName", ""),
+        "concern": a.get("concern", ""),
+        "nurse": a.get("nurse", ""),
+        "dateTime": a.get("dateTime"),
+        "email": a.get("email", ""),
+        "nameTokens": name_tokens(a.get("firstName"), a.get("lastName"))
+    }
+
 @router.post("/records")
-def add_record(record: Record):
-    records.insert_one(record.dict())
+async def add_record(record: Record):
+    data = record.dict()
+    try:
+        data["dateTime"] = parse_date_time(record.dateTime)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid dateTime, expected YYYY-MM-DDTHH:MM")
+    data["nameTokens"] = name_tokens(record.firstName, record.lastName)
+    await records.insert_one(data)
+    await collection_versions.bump(records.name)
     return {"message": "Record saved"}
 
 @router.get("/records")
-def get_all_records():
-    return list(records.find({}, {"_id": 0}))
+async def get_all_records(
+    request: Request,
+    name: Optional[str] = None,
+    nurse: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    compact: bool = False,
+    include_archived: bool = False,
+):
+    etag = await list_etag(request, *list_versions(records, include_archived))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    query = list_filter(name=name, nurse=nurse, date_from=date_from, date_to=date_to)
+    sources = await list_collections(record_lists, include_archived, query.get("dateTime"))
+    serialize = compact_rows(record_table) if compact else record_table
+    page = await paginate(sources, query, serialize, cursor=cursor,
+                          limit=limit, descending=sort == "desc")
+    return FastJSONResponse(page, headers=etag_headers(etag))
 
+RECORD_COLUMNS = ["id", "studentId", "lastName", "firstName", "concern", "nurse", "dateTime", "email"]
 
+@router.get("/records/export")
+async def export_records(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    name: Optional[str] = None,
+    nurse: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    include_archived: bool = False,
+):
+    query = list_filter(name=name, nurse=nurse, date_from=date_from, date_to=date_to)
+    # Archived terms come first, oldest term first, so rows stay in date order.
+    sources = await list_collections(record_lists, include_archived, query.get("dateTime"))
+    batches = chain_batches(sources, query, batch_size=EXPORT_BATCH_SIZE, sort=[("dateTime", 1), ("_id", 1)])
+    body, media_type, extension = export_stream(batches, record_table, format, RECORD_COLUMNS, gzip)
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="records.{extension}"'
+    })
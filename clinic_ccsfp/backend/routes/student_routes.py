@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Request, Response
+
+from backend.database.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, keyset_page
+from backend.routes.appointment_routes import appointment_lists, appointment_table
+from backend.routes.consultation_routes import CONSULTATION_PROJECTION, consultation_lists, consultation_table
+from backend.routes.record_routes import record_lists, record_table
+from backend.services.archive import ARCHIVE_REGISTRY, list_collections
+from backend.services.conditional import etag_headers, list_etag, not_modified
+from backend.services.sessions import current_session
+
+router = APIRouter(dependencies=[Depends(current_session)])
+
+# entry type -> (collection, serializer, projection)
+HISTORY_SOURCES = {
+    "consultation": (consultation_lists, consultation_table, CONSULTATION_PROJECTION),
+    "appointment": (appointment_lists, appointment_table, None),
+    "record": (record_lists, record_table, None),
+}
+
+
+def _timeline_key(doc):
+    # Newest first, entries without a date last, as MongoDB sorts them.
+    date_time = doc.get("dateTime")
+    dated = isinstance(date_time, datetime)
+    return dated, date_time if dated else datetime.min, doc["_id"]
+
+
+@router.get("/students/{studentId}/history")
+async def get_student_history(
+    studentId: str,
+    request: Request,
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    include_archived: bool = False,
+):
+    """A student's consultations, appointments and records as one timeline, newest first.
+
+    Each collection is read with the same (studentId, dateTime, _id) keyset
+    on its studentId_dateTime_id index, at most `limit + 1` documents each,
+    and the pages are merged here. With `include_archived`, the archived
+    terms of consultations and records are read the same way.
+    """
+    names = [source[0].name for source in HISTORY_SOURCES.values()]
+    etag = await list_etag(request, *names, *([ARCHIVE_REGISTRY] if include_archived else []))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = {"studentId": studentId}
+    page_filter, sort = keyset_page(query, cursor, "dateTime", descending=True, nullable=True)
+
+    # (entry type, collection, projection) for every collection read
+    sources = [
+        (kind, collection, projection)
+        for kind, (hot, _, projection) in HISTORY_SOURCES.items()
+        for collection in await list_collections(hot, include_archived)
+    ]
+    pages = await asyncio.gather(*[
+        collection.find(page_filter, projection, sort=sort, limit=limit + 1)
+        for _, collection, projection in sources
+    ])
+    totals = await asyncio.gather(*[
+        collection.count_documents(query) for _, collection, _ in sources
+    ])
+
+    merged = sorted(
+        ((doc, kind) for (kind, _, _), docs in zip(sources, pages) for doc in docs),
+        key=lambda entry: _timeline_key(entry[0]),
+        reverse=True,
+    )
+    next_cursor = None
+    if len(merged) > limit:
+        merged = merged[:limit]
+        next_cursor = encode_cursor(merged[-1][0], "dateTime")
+
+    counts = dict.fromkeys(HISTORY_SOURCES, 0)
+    for (kind, _, _), total in zip(sources, totals):
+        counts[kind] += total
+
+    response.headers.update(etag_headers(etag))
+    return {
+        "studentId": studentId,
+        "items": [{"type": kind, **HISTORY_SOURCES[kind][1](doc)} for doc, kind in merged],
+        "total": sum(totals),
+        "counts": counts,
+        "nextCursor": next_cursor,
+    }
@@ -0,0 +1,349 @@
+"""Admission control for the booking and login routes.
+
+`AdmissionMiddleware` checks every request to a route from
+`appointment_routes` or `auth_routes` before any work is done on it:
+
+1. Lane. A request with a valid staff or admin session token uses the
+   staff lane. Everything else, such as students booking or logging in,
+   uses the public lane.
+2. Rate. A token bucket per client and route, plus one per route shared by
+   all public clients. On booking and login a client is the address plus
+   the student id or username in the body, so students behind one NAT do
+   not share a bucket; a looser bucket per address still caps them
+   together. An empty bucket gets an immediate 429 whose Retry-After says
+   when the next token is due.
+3. Concurrency. Each lane caps its requests in flight. A request over the
+   cap waits up to ADMISSION_QUEUE_SECONDS for a slot, then gets a 429 too.
+
+The public lane's cap defaults to half of DB_EXECUTOR_WORKERS. A booking
+burst therefore cannot take every database thread, and staff requests
+always find one free. Buckets and lanes are per worker process.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+
+import orjson
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from backend.database import connection
+from backend.services.metrics import Counter, Gauge, Histogram, registry
+from backend.services.sessions import bearer_token, read_token
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") not in ("0", "false", "no")
+ADMISSION_PUBLIC_CONCURRENCY = int(os.getenv(
+    "ADMISSION_PUBLIC_CONCURRENCY", str(max(1, connection.DB_EXECUTOR_WORKERS // 2))))
+ADMISSION_STAFF_CONCURRENCY = int(os.getenv("ADMISSION_STAFF_CONCURRENCY", str(connection.DB_EXECUTOR_WORKERS)))
+ADMISSION_QUEUE_SECONDS = float(os.getenv("ADMISSION_QUEUE_SECONDS", "0.5"))
+# Requests waiting for a slot beyond this are turned away at once.
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+# Key public clients by the first X-Forwarded-For address. Turn this on
+# behind a reverse proxy, or every student shares the proxy's address.
+# Only do so if the proxy sets the header; otherwise clients choose it.
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "0") in ("1", "true", "yes")
+# Bookings per second accepted from all public clients together.
+BOOKING_RATE_LIMIT = float(os.getenv("BOOKING_RATE_LIMIT", "50"))
+BUCKET_MAX_ENTRIES = 10_000
+
+STAFF_ROLES = ("staff", "admin")
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+admission_rejected = registry.register(Counter(
+    "admission_rejected_total", "Requests turned away with 429 by lane, route and reason "
+    "(client_rate, address_rate, route_rate, concurrency).", ("lane", "route", "reason")))
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Admitted requests being served, by lane.", ("lane",)))
+admission_wait = registry.register(Histogram(
+    "admission_wait_seconds", "Time admitted requests waited for a lane slot.", ("lane",), buckets=WAIT_BUCKETS))
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # tokens added per second
+    burst: float  # bucket size
+
+
+# "METHOD /path" -> (limit per public client, limit per route across public
+# clients or None). Routes not listed get DEFAULT_LIMITS.
+ROUTE_LIMITS = {
+    "POST /appointments": (Limit(0.1, 5), Limit(BOOKING_RATE_LIMIT, BOOKING_RATE_LIMIT * 2)),
+    "GET /availability": (Limit(1, 10), Limit(200, 400)),
+    "GET /appointments/events": (Limit(0.1, 5), None),
+    "GET /availability/events": (Limit(0.1, 5), None),
+    "POST /login": (Limit(0.1, 10), Limit(20, 50)),
+    "POST /register": (Limit(1 / 60, 3), Limit(2, 10)),
+}
+DEFAULT_LIMITS = (Limit(5, 20), None)
+# Routes whose public clients are told apart by a body field as well as
+# their address, and the per-address limit that still applies to them:
+# high enough for a school behind one NAT address.
+BODY_KEYS = {"POST /appointments": "studentId", "POST /login": "username"}
+ADDRESS_LIMIT = Limit(1, 60)
+BODY_KEY_MAX_BYTES = 64 * 1024
+# One bucket per staff user, shared by all of that user's routes.
+STAFF_LIMIT = Limit(20, 100)
+# Long-lived responses take no concurrency slot; they are only rate limited.
+STREAMING_ROUTES = {"GET /appointments/events", "GET /availability/events"}
+
+
+class TokenBucket:
+    __slots__ = ("limit", "tokens", "updated")
+
+    def __init__(self, limit: Limit, now: float):
+        self.limit = limit
+        self.tokens = limit.burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.updated) * self.limit.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.limit.rate
+
+    def give_back(self):
+        self.tokens = min(self.limit.burst, self.tokens + 1)
+
+
+class BucketTable:
+    """Token buckets by key, least recently used dropped past `max_entries`.
+
+    A dropped bucket comes back full, which only ever errs towards letting
+    an idle client in.
+    """
+
+    def __init__(self, max_entries: int = BUCKET_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+
+    def get(self, key, limit: Limit, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limit, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class Lane:
+    """At most `limit` requests in flight; others queue for up to `queue_seconds`, first come first served."""
+
+    def __init__(self, name: str, limit: int, queue_seconds: float = ADMISSION_QUEUE_SECONDS,
+                 max_queue: int = ADMISSION_MAX_QUEUE):
+        self.name = name
+        self.limit = limit
+        self.queue_seconds = queue_seconds
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        if self.queue_seconds <= 0 or len(self._waiters) >= self.max_queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_seconds)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # The client went away; pass on a slot handed over meanwhile.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # `release` hands its slot straight to a waiter, so in_flight
+        # already counts this request.
+        return waiter.done() and not waiter.cancelled()
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionControl:
+    """Lanes, buckets and settings shared by every `AdmissionMiddleware` in the process."""
+
+    def __init__(self):
+        self.enabled = ADMISSION_ENABLED
+        self.trust_proxy = ADMISSION_TRUST_PROXY
+        self.lanes = {
+            "public": Lane("public", ADMISSION_PUBLIC_CONCURRENCY),
+            "staff": Lane("staff", ADMISSION_STAFF_CONCURRENCY),
+        }
+        self.client_buckets = BucketTable()
+        self.route_buckets = BucketTable()
+
+    def reset(self):
+        self.client_buckets.clear()
+        self.route_buckets.clear()
+
+    def identify(self, scope):
+        """(lane name, client key) for a request."""
+        authorization = forwarded = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+            elif name == b"x-forwarded-for":
+                forwarded = value.decode("latin-1")
+        token = bearer_token(authorization)
+        if token is None:
+            # EventSource streams pass the token in the query string instead.
+            token = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("access_token", [None])[0]
+        if token:
+            # Signature and expiry only; revocation is left to the route.
+            claims = read_token(token)
+            if claims and claims.get("role") in STAFF_ROLES:
+                return "staff", f"user:{claims['sub']}"
+        if self.trust_proxy and forwarded:
+            return "public", f"ip:{forwarded.split(',')[0].strip()}"
+        client = scope.get("client")
+        return "public", f"ip:{client[0] if client else 'unknown'}"
+
+    def take(self, lane: str, route: str, client: str, identity: str = None):
+        """(reason, retry seconds) if a bucket is empty, else None.
+
+        `identity` is the BODY_KEYS field of a public request; it narrows
+        the client bucket, and the address gets an ADDRESS_LIMIT bucket.
+        """
+        now = time.monotonic()
+        if lane == "staff":
+            wait = self.client_buckets.get(client, STAFF_LIMIT, now).take(now)
+            return ("client_rate", wait) if wait else None
+
+        client_limit, route_limit = ROUTE_LIMITS.get(route, DEFAULT_LIMITS)
+        taken = []
+        buckets = [("client_rate", self.client_buckets.get((route, client, identity), client_limit, now))]
+        if identity is not None:
+            buckets.append(("address_rate", self.client_buckets.get((route, client), ADDRESS_LIMIT, now)))
+        if route_limit is not None:
+            buckets.append(("route_rate", self.route_buckets.get(route, route_limit, now)))
+        for reason, bucket in buckets:
+            wait = bucket.take(now)
+            if wait:
+                # Earlier buckets are not to blame for a later one running dry.
+                for earlier in taken:
+                    earlier.give_back()
+                return reason, wait
+            taken.append(bucket)
+        return None
+
+
+admission = AdmissionControl()
+
+
+async def _buffer_body(receive):
+    """Read a request body, returning it and a `receive` that replays it to the app."""
+    messages, body = [], b""
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+    return body, replay
+
+
+def _body_key(body: bytes, field: str):
+    """`field` of a JSON object body as a string, or None."""
+    if len(body) > BODY_KEY_MAX_BYTES:
+        return None
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    value = data.get(field) if isinstance(data, dict) else None
+    return str(value)[:200] if value not in (None, "") else None
+
+
+def _too_many(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"detail": detail},
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying `admission` to the requests that match `routes`.
+
+    Add it inside CORSMiddleware so browsers can read the 429s. Rejected
+    requests still get `scope["route"]`, so MetricsMiddleware labels them
+    with their route.
+    """
+
+    def __init__(self, app, routes, control: AdmissionControl = admission):
+        self.app = app
+        self.routes = list(routes)
+        self.control = control
+
+    def _match(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.control.enabled:
+            await self.app(scope, receive, send)
+            return
+        route = self._match(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{scope['method']} {route.path}"
+        lane_name, client = self.control.identify(scope)
+        identity = None
+        if lane_name == "public" and key in BODY_KEYS:
+            body, receive = await _buffer_body(receive)
+            identity = _body_key(body, BODY_KEYS[key])
+        limited = self.control.take(lane_name, key, client, identity)
+        if limited:
+            reason, retry_after = limited
+            admission_rejected.inc(lane_name, key, reason)
+            scope["route"] = route
+            await _too_many("Too many requests; try again shortly", retry_after)(scope, receive, send)
+            return
+        if key in STREAMING_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        lane = self.control.lanes[lane_name]
+        start = time.perf_counter()
+        if not await lane.acquire():
+            admission_rejected.inc(lane_name, key, "concurrency")
+            scope["route"] = route
+            await _too_many("The server is busy; try again shortly", 1)(scope, receive, send)
+            return
+        admission_wait.observe(lane_name, value=time.perf_counter() - start)
+        admission_in_flight.inc(lane_name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_in_flight.dec(lane_name)
+            lane.release()
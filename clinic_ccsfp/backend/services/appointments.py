@@ -0,0 +1,51 @@
+"""Appointment statuses, booking keys and the response shape, shared by
+the routes, the maintenance jobs and bulk imports.
+"""
+from datetime import datetime
+
+from bson import ObjectId
+
+from backend.database.datetimes import format_date_time, split_date_time
+
+PENDING = "Pending"
+ACCEPTED = "Accepted"
+REJECTED = "Rejected"
+# Set by the expire-appointments job (backend/services/maintenance.py) on
+# pending appointments whose day has passed.
+EXPIRED = "Expired"
+# Statuses that no longer occupy a slot.
+RELEASED_STATUSES = (REJECTED, EXPIRED)
+
+
+def appointment_table(a) -> dict:
+    student_id = a.get("studentId", "")
+    if isinstance(student_id, ObjectId):
+        student_id = str(student_id)
+    nurse = a.get("nurse", "")
+    if isinstance(nurse, ObjectId):
+        nurse = str(nurse)
+    date_time = format_date_time(a.get("dateTime", ""))
+    return {
+        "id": str(a["_id"]),
+        "studentId": student_id,
+        "lastName": a.get("lastName", ""),
+        "firstName": a.get("firstName", ""),
+        "email": a.get("email", "N/A"),
+        "concern": a.get("concern", ""),
+        "nurse": nurse,
+        "dateTime": date_time,
+        "status": a.get("status", "")
+    }
+
+
+def booking_keys(status: str, date_time: datetime) -> dict:
+    """Fields the partial unique indexes in backend/database/indexes.py are built on.
+
+    `slotHeld` is only present while an appointment occupies its slot, so
+    rejected and expired bookings drop out of both uniqueness rules.
+    """
+    day, _ = split_date_time(date_time)
+    keys = {"dayKey": day}
+    if status not in RELEASED_STATUSES:
+        keys["slotHeld"] = True
+    return keys
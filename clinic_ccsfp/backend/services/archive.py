@@ -0,0 +1,296 @@
+"""Hot/cold archiving of consultations and records by school term.
+
+Documents dated before the term that was current ARCHIVE_AFTER_DAYS ago
+move, a batch at a time, out of `student_consultations` and
+`student_records` into one archive collection per term
+(`student_consultations_archive_2024_06`). List, export and history
+endpoints read only the hot collections unless asked for
+`include_archived=true`. The `archive_terms` registry lists every term that
+was archived or restored; a restored term stays hot until it is archived
+again by hand.
+
+Run from the `clinic_ccsfp` directory:
+
+    python -m backend.services.archive archive
+    python -m backend.services.archive archive --term 2024-06
+    python -m backend.services.archive restore 2024-06 --source consultations
+    python -m backend.services.archive terms
+"""
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from pymongo import DeleteOne, IndexModel, ReplaceOne
+
+from backend.database import connection
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import day_start
+from backend.database.indexes import INDEXES
+from backend.database.versions import collection_versions
+from backend.services.cache import ReadThroughCache
+
+# Terms start on the first of these months; "6" is one school year from
+# June, "6,11" two semesters.
+TERM_START_MONTHS = sorted({int(month) for month in os.getenv("TERM_START_MONTHS", "6").split(",")})
+if not all(1 <= month <= 12 for month in TERM_START_MONTHS):
+    raise ValueError("TERM_START_MONTHS must be months from 1 to 12")
+# A term is archived once it ended at least this many days ago.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = 1000
+
+ARCHIVE_REGISTRY = "archive_terms"
+ARCHIVED = "archived"
+RESTORED = "restored"
+
+# source name -> hot collection that is archived by term
+SOURCES = {
+    "consultations": "student_consultations",
+    "records": "student_records",
+}
+# Archive collections get their hot collection's indexes except these:
+# search and bulk import only work on the hot set.
+SKIPPED_INDEXES = {"consultation_text", "importJob_importRow"}
+
+registry = AsyncCollection(ARCHIVE_REGISTRY)
+# Bumping the registry's version (invalidate) also changes the ETag of
+# every include_archived list.
+archived_term_cache = ReadThroughCache(ARCHIVE_REGISTRY)
+
+
+def term_start(day: date) -> date:
+    """First day of the term `day` falls in."""
+    return max(date(year, month, 1) for year in (day.year - 1, day.year) for month in TERM_START_MONTHS
+               if date(year, month, 1) <= day)
+
+
+def next_term_start(start: date) -> date:
+    return min(date(year, month, 1) for year in (start.year, start.year + 1) for month in TERM_START_MONTHS
+               if date(year, month, 1) > start)
+
+
+def term_name(start: date) -> str:
+    return start.strftime("%Y-%m")
+
+
+def parse_term(term: str) -> date:
+    """The start date of a term given as "YYYY-MM"; raises ValueError if no term starts then."""
+    try:
+        start = date.fromisoformat(f"{term}-01")
+    except ValueError:
+        raise ValueError(f"Invalid term {term!r}, expected YYYY-MM")
+    if start.month not in TERM_START_MONTHS:
+        raise ValueError(f"No term starts in {term}; TERM_START_MONTHS is {TERM_START_MONTHS}")
+    return start
+
+
+def archive_name(collection: str, term: str) -> str:
+    return f"{collection}_archive_{term.replace('-', '_')}"
+
+
+def archive_cutoff(today: date = None) -> date:
+    """Documents dated before this day belong to archivable terms."""
+    return term_start((today or date.today()) - timedelta(days=ARCHIVE_AFTER_DAYS))
+
+
+def _load_archived_terms():
+    return list(connection.db[ARCHIVE_REGISTRY].find({"state": ARCHIVED}).sort("start", 1))
+
+
+async def archived_lists(collection: str, bounds: dict = None) -> list:
+    """Listing handles on `collection`'s archived terms, oldest first.
+
+    `bounds` is a list filter's `dateTime` condition; terms entirely
+    outside it are left out, so a date-filtered list only reads the
+    archives it can match.
+    """
+    lower, upper = (bounds or {}).get("$gte"), (bounds or {}).get("$lt")
+    return [
+        AsyncCollection(term["archive"], listing=True)
+        for term in await archived_term_cache.get("archived", _load_archived_terms)
+        if term["collection"] == collection
+        and (upper is None or term["start"] < upper) and (lower is None or term["end"] > lower)
+    ]
+
+
+async def list_collections(hot: AsyncCollection, include_archived: bool, bounds: dict = None) -> list:
+    """The collections a list reads: `hot`, after its archived terms when `include_archived`."""
+    if not include_archived:
+        return [hot]
+    return [*await archived_lists(hot.name, bounds), hot]
+
+
+def list_versions(hot: AsyncCollection, include_archived: bool) -> list:
+    """Collection names whose versions make up the list's ETag."""
+    return [hot.name, ARCHIVE_REGISTRY] if include_archived else [hot.name]
+
+
+async def chain_batches(collections, *args, **kwargs):
+    """`iter_batches` over each collection in turn."""
+    for collection in collections:
+        async for batch in collection.iter_batches(*args, **kwargs):
+            yield batch
+
+
+def archive_names(database, collection: str) -> list:
+    """Archive collections holding `collection`'s archived terms, for jobs that scan the whole history."""
+    return [term["archive"] for term in database[ARCHIVE_REGISTRY].find(
+        {"collection": collection, "state": ARCHIVED}, {"archive": 1})]
+
+
+def _create_indexes(archive, collection: str):
+    models = [IndexModel(keys, **options) for keys, options in INDEXES[collection]
+              if options["name"] not in SKIPPED_INDEXES]
+    archive.create_indexes(models)
+
+
+async def _move(source: AsyncCollection, target: AsyncCollection, query: dict, batch_size: int) -> int:
+    """Copy matching documents into `target`, then delete them from `source`, a batch at a time.
+
+    The copy is an upsert by _id, so a run cut short between the two steps
+    is finished by the next one. A document is only deleted if its version
+    did not change since it was read; an edited one is copied again with
+    the next batch.
+    """
+    moved = 0
+    while True:
+        docs = await source.find(query, limit=batch_size)
+        if not docs:
+            break
+        await target.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+        result = await source.bulk_write(
+            [DeleteOne({"_id": doc["_id"], "version": doc.get("version")}) for doc in docs], ordered=False,
+        )
+        if not result.deleted_count:
+            # Every document changed under us; leave the rest for the next run.
+            break
+        moved += result.deleted_count
+    return moved
+
+
+async def archive_term(collection: str, start: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move `collection`'s documents dated in the term starting `start` into its archive."""
+    term = term_name(start)
+    hot = AsyncCollection(collection)
+    query = {"dateTime": {"$gte": day_start(start), "$lt": day_start(next_term_start(start))}}
+    if not await hot.count_documents(query, limit=1):
+        return 0
+
+    archive = AsyncCollection(archive_name(collection, term))
+    await archive.run(_create_indexes, collection)
+    # Registered before the first batch moves, so include_archived reads
+    # see every document while the term is in transit.
+    await registry.update_one({"_id": f"{collection}:{term}"}, {"$set": {
+        "collection": collection,
+        "term": term,
+        "archive": archive.name,
+        "start": query["dateTime"]["$gte"],
+        "end": query["dateTime"]["$lt"],
+        "state": ARCHIVED,
+        "updatedAt": datetime.now(timezone.utc),
+    }}, upsert=True)
+    await archived_term_cache.invalidate()
+
+    moved = await _move(hot, archive, query, batch_size)
+    await registry.update_one({"_id": f"{collection}:{term}"},
+                              {"$set": {"documents": await archive.count_documents({})}})
+    await collection_versions.bump(collection)
+    return moved
+
+
+async def archive_old_terms() -> int:
+    """Archive every term before `archive_cutoff()`, skipping restored ones. Returns documents moved."""
+    cutoff = archive_cutoff()
+    restored = {term["_id"] for term in await registry.find({"state": RESTORED}, {"_id": 1})}
+    moved = 0
+    for collection in SOURCES.values():
+        oldest = await AsyncCollection(collection).find(
+            {"dateTime": {"$lt": day_start(cutoff), "$type": "date"}}, {"dateTime": 1},
+            sort=[("dateTime", 1)], limit=1,
+        )
+        if not oldest:
+            continue
+        start = term_start(oldest[0]["dateTime"].date())
+        while start < cutoff:
+            if f"{collection}:{term_name(start)}" not in restored:
+                moved += await archive_term(collection, start)
+            start = next_term_start(start)
+    return moved
+
+
+async def restore_term(collection: str, term: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move an archived term back into `collection` and drop its archive. Returns documents moved.
+
+    The term is marked restored, so the scheduled job leaves it hot until
+    it is archived again with `archive --term`.
+    """
+    entry = await registry.find_one({"_id": f"{collection}:{term}"})
+    if entry is None or entry["state"] != ARCHIVED:
+        raise ValueError(f"{collection} has no archived term {term}")
+
+    archive = AsyncCollection(entry["archive"])
+    moved = await _move(archive, AsyncCollection(collection), {}, batch_size)
+    if await archive.count_documents({}, limit=1):
+        raise RuntimeError(f"{archive.name} still holds documents; run the restore again")
+
+    await registry.update_one({"_id": entry["_id"]}, {"$set": {
+        "state": RESTORED, "documents": 0, "updatedAt": datetime.now(timezone.utc),
+    }})
+    await archive.run(lambda coll: coll.drop())
+    await collection_versions.bump(collection)
+    await archived_term_cache.invalidate()
+    return moved
+
+
+async def _archive(args) -> int:
+    if not args.term:
+        return await archive_old_terms()
+    start = parse_term(args.term)
+    if start >= archive_cutoff():
+        raise ValueError(f"Term {args.term} is not over yet; the archive cutoff is {archive_cutoff()}")
+    moved = 0
+    for source in args.sources:
+        moved += await archive_term(SOURCES[source], start, args.batch_size)
+    return moved
+
+
+async def _restore(args) -> int:
+    parse_term(args.term)
+    moved = 0
+    for source in args.sources:
+        moved += await restore_term(SOURCES[source], args.term, args.batch_size)
+    return moved
+
+
+async def _terms(args):
+    for term in await registry.find({}, sort=[("collection", 1), ("start", 1)]):
+        print(f"{term['collection']:<24}{term['term']:<10}{term['state']:<10}{term.get('documents', 0):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive or restore consultations and records by term.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive = commands.add_parser("archive", help="move terms before the cutoff into their archives")
+    archive.add_argument("--term", help="archive only this term (YYYY-MM), even if it was restored")
+    restore = commands.add_parser("restore", help="move an archived term back into the hot collections")
+    restore.add_argument("term", help="term start as YYYY-MM")
+    commands.add_parser("terms", help="list archived and restored terms")
+    for command in (archive, restore):
+        command.add_argument("--source", dest="sources", action="append", choices=sorted(SOURCES),
+                             help="repeatable; default: consultations and records")
+        command.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "terms":
+        asyncio.run(_terms(args))
+        return
+    args.sources = args.sources or list(SOURCES)
+    try:
+        moved = asyncio.run(_archive(args) if args.command == "archive" else _restore(args))
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{args.command}: {moved} documents moved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import time
+from collections import OrderedDict
+
+from backend.database.async_db import run_db
+from backend.database.versions import collection_versions
+from backend.services.metrics import Counter, registry
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+cache_lookups = registry.register(Counter(
+    "cache_lookups_total", "Read-through cache lookups by cache and result.", ("cache", "result")))
+
+
+class ReadThroughCache:
+    """In-process LRU cache for lookups on one collection.
+
+    Every entry remembers the collection version it was loaded at (see
+    `backend.database.versions`). Write routes call `invalidate()`, which
+    bumps the shared version, so this worker drops its entries at once and
+    other workers see the new version within VERSION_POLL_SECONDS. The TTL
+    is a backstop for writes made outside the API.
+    """
+
+    def __init__(self, collection: str, ttl: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key, loader, *args):
+        """Return the cached value for `key`, or run `loader(*args)` on the database pool."""
+        version = await collection_versions.current(self.collection)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            cache_lookups.inc(self.collection, "hit")
+            return entry[2]
+
+        self.misses += 1
+        cache_lookups.inc(self.collection, "miss")
+        value = await run_db(loader, *args)
+        # Stored under the version read before loading: if a write lands
+        # meanwhile, the next lookup sees a newer version and reloads.
+        self._entries[key] = (version, time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    async def invalidate(self):
+        self._entries.clear()
+        await collection_versions.bump(self.collection)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "collection": self.collection,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+admin_user_cache = ReadThroughCache("admin_users")
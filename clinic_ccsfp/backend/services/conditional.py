@@ -0,0 +1,34 @@
+import hashlib
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from backend.database.versions import collection_versions
+
+
+async def list_etag(request: Request, *collections: str) -> str:
+    """Weak ETag for a list response: the collections' versions plus the query string.
+
+    Needs one cached counter read per collection and no document reads, so
+    an unchanged poll can be answered before the list query runs.
+    """
+    versions = [str(await collection_versions.current(name)) for name in collections]
+    query = urlencode(sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(query.encode()).hexdigest()[:16]
+    return f'W/"{"-".join(versions)}-{digest}"'
+
+
+def etag_headers(etag: str) -> dict:
+    # no-cache: browsers may keep the body but must revalidate every poll.
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(request: Request, etag: str):
+    """A 304 response if the client's If-None-Match already has `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
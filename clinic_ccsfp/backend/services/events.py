@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import secrets
+import threading
+from collections import deque
+
+import orjson
+from pymongo.errors import OperationFailure, PyMongoError
+
+from backend.database import connection
+
+logger = logging.getLogger(__name__)
+
+REPLAY_BUFFER_SIZE = 1000
+SUBSCRIBER_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+
+
+class EventBroker:
+    """Fan-out of appointment deltas to Server-Sent Event subscribers.
+
+    Events come from a MongoDB change stream when the deployment supports
+    one (replica set or sharded cluster), so every worker sees every write.
+    On a standalone mongod the write routes publish directly instead and
+    each worker only sees its own writes.
+
+    The last REPLAY_BUFFER_SIZE events are kept so a reconnecting client can
+    resume from its Last-Event-ID; if that id has fallen out of the buffer
+    the client is sent a `reset` event and should refetch.
+    """
+
+    def __init__(self, buffer_size=REPLAY_BUFFER_SIZE):
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._counter = itertools.count(1)
+        # Distinguishes this process's local ids from a previous run's.
+        self._epoch = secrets.token_hex(4)
+        self._loop = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self.change_stream_active = False
+
+    def publish(self, kind: str, data: dict, event_id: str = None):
+        if event_id is None:
+            event_id = f"{self._epoch}-{next(self._counter)}"
+        event = (event_id, kind, data)
+        self._buffer.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client that cannot keep up is told to resync rather than
+                # letting its queue grow without bound.
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def publish_local(self, kind: str, data: dict):
+        """Publish from a write route unless the change stream will report the write."""
+        if not self.change_stream_active:
+            self.publish(kind, data)
+
+    def _replay_after(self, last_event_id):
+        if not last_event_id:
+            return []
+        ids = [event[0] for event in self._buffer]
+        if last_event_id not in ids:
+            return None
+        return list(self._buffer)[ids.index(last_event_id) + 1:]
+
+    async def subscribe(self, last_event_id: str = None):
+        """Yield buffered events after `last_event_id`, then live ones.
+
+        Yields None when the subscriber must refetch (unknown id or overflow).
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        backlog = self._replay_after(last_event_id)
+        self._subscribers.add(queue)
+        try:
+            if backlog is None:
+                yield None
+            else:
+                for event in backlog:
+                    yield event
+            while True:
+                event = await queue.get()
+                yield event
+                if event is None:
+                    return
+        finally:
+            self._subscribers.discard(queue)
+
+    # Change stream feed ------------------------------------------------
+
+    def start(self, collection_name: str, to_event):
+        """Start following `collection_name`'s change stream if the server has one."""
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(collection_name, to_event), name="appointment-change-stream", daemon=True
+        )
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self.change_stream_active = False
+
+    def _watch(self, collection_name, to_event):
+        collection = connection.db[collection_name]
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with collection.watch(full_document="updateLookup", resume_after=resume_token,
+                                      max_await_time_ms=1000) as stream:
+                    self.change_stream_active = True
+                    logger.info(f"Following change stream on {collection_name}")
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        event = to_event(change)
+                        if event:
+                            kind, data = event
+                            self._loop.call_soon_threadsafe(self.publish, kind, data, resume_token["_data"])
+            except OperationFailure as e:
+                # Standalone mongod: change streams need a replica set.
+                logger.info(f"Change streams unavailable ({e}); publishing appointment events in-process")
+                self.change_stream_active = False
+                return
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted: {e}; retrying")
+                self.change_stream_active = False
+                self._stop.wait(1)
+            except Exception as e:
+                logger.info(f"Change stream feed stopped ({e}); publishing appointment events in-process")
+                self.change_stream_active = False
+                return
+
+
+def format_sse(event) -> bytes:
+    if event is None:
+        return b"event: reset\ndata: {}\n\n"
+    event_id, kind, data = event
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), kind.encode(), orjson.dumps(data))
+
+
+async def sse_stream(broker: EventBroker, last_event_id: str = None, heartbeat=HEARTBEAT_SECONDS, view=None):
+    """Render a subscription as an SSE byte stream with periodic keep-alive comments.
+
+    `view` maps each event's (kind, data) to the (kind, data) sent instead,
+    or to None to skip it. Event ids are kept, so a view resumes from
+    Last-Event-ID like the full stream.
+    """
+    events = broker.subscribe(last_event_id)
+    next_event = asyncio.ensure_future(events.__anext__())
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=heartbeat)
+            if not done:
+                yield b": keep-alive\n\n"
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            if event is None:
+                yield format_sse(None)
+                return
+            event_id, kind, data = event
+            shown = view(kind, data) if view else (kind, data)
+            if shown is not None:
+                yield format_sse((event_id, *shown))
+            next_event = asyncio.ensure_future(events.__anext__())
+    finally:
+        next_event.cancel()
+        with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+            await next_event
+        await events.aclose()
+
+
+appointment_events = EventBroker()
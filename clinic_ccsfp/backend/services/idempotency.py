@@ -0,0 +1,123 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException, Response
+from pymongo.errors import DuplicateKeyError
+
+from backend.database.async_db import AsyncCollection
+
+# How long a completed request can be replayed. Retries come within
+# seconds; a day also covers a phone that comes back online the next morning.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# How long a claimed key waits for its first request to finish before a
+# retry may take it over (the first worker may have died mid-request).
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+MAX_KEY_LENGTH = 255
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+idempotency_keys = AsyncCollection("idempotency_keys")
+
+
+def fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def _replay(stored: dict) -> Response:
+    return Response(content=stored["body"], status_code=stored["status"], media_type="application/json",
+                    headers={REPLAYED_HEADER: "true"})
+
+
+async def _claim(doc_id: str, digest: str) -> Optional[dict]:
+    """Claim `doc_id` for this request; return the stored record if it was already claimed."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    claim = {
+        "_id": doc_id,
+        "fingerprint": digest,
+        "state": "pending",
+        "lockedUntil": time.time() + IDEMPOTENCY_LOCK_SECONDS,
+        "expiresAt": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+    }
+    try:
+        await idempotency_keys.insert_one(claim)
+        return None
+    except DuplicateKeyError:
+        pass
+
+    stored = await idempotency_keys.find_one({"_id": doc_id})
+    if stored is None:
+        # Expired between the insert and the read; the key is free again.
+        return await _claim(doc_id, digest)
+    if stored["fingerprint"] != digest:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if stored["state"] == "done":
+        return stored
+    if stored["lockedUntil"] > time.time():
+        raise HTTPException(status_code=409, headers={"Retry-After": "1"},
+                            detail="A request with this Idempotency-Key is still in progress")
+    # The first attempt never finished; take its claim over.
+    taken = await idempotency_keys.update_one(
+        {"_id": doc_id, "state": "pending", "lockedUntil": stored["lockedUntil"]},
+        {"$set": {"lockedUntil": claim["lockedUntil"]}},
+    )
+    if not taken.modified_count:
+        raise HTTPException(status_code=409, headers={"Retry-After": "1"},
+                            detail="A request with this Idempotency-Key is still in progress")
+    return None
+
+
+async def _not_stored(response: dict):
+    pass
+
+
+async def idempotent(key: Optional[str], scope: str, body: bytes,
+                     handler: Callable[[Callable[[dict], Awaitable[None]]], Awaitable[dict]]):
+    """Run `handler` at most once per `Idempotency-Key`.
+
+    Without a key the handler just runs. With one, the first request claims
+    `scope` + key in `idempotency_keys`; a retry with the same key and body
+    gets the stored response back (with an `Idempotent-Replayed` header)
+    without running the handler, so none of its validation, conflict checks
+    or writes happen twice. Records expire through a TTL index on
+    `expiresAt`.
+
+    `handler` is called with a `save(response)` coroutine and must await it
+    as soon as its write has gone through, before any follow-up work, so a
+    request that fails after writing is replayed rather than run again. An
+    HTTPException raised before `save` (validation or a conflict) releases
+    the key, since nothing was written. Any other failure before `save`
+    keeps the claim until IDEMPOTENCY_LOCK_SECONDS pass, as the write may
+    have gone through; only then may a retry take the key over.
+    """
+    if key is None:
+        return await handler(_not_stored)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    doc_id = f"{scope} {key}"
+    stored = await _claim(doc_id, fingerprint(body))
+    if stored is not None:
+        return _replay(stored)
+
+    saved = False
+
+    async def save(response: dict):
+        nonlocal saved
+        await idempotency_keys.update_one(
+            {"_id": doc_id}, {"$set": {"state": "done", "status": 200, "body": orjson.dumps(response)}},
+        )
+        saved = True
+
+    try:
+        result = await handler(save)
+    except HTTPException:
+        if not saved:
+            await idempotency_keys.delete_one({"_id": doc_id, "state": "pending"})
+        raise
+    if not saved:
+        await save(result)
+    return result
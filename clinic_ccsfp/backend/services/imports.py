@@ -0,0 +1,364 @@
+"""Bulk import of historical appointments and consultations.
+
+Rows are read from JSON (one array), NDJSON or CSV without loading the
+whole input, validated against the route models in batches, normalised
+the way the create routes store them, and written with unordered
+`insert_many` a batch at a time. Rows that fail validation or a unique
+index are reported by row number; the rest still land.
+
+Progress is kept in `import_jobs`. Every imported document records its
+job and row number, so re-running a crashed job with the same `--job`
+skips rows that were already written.
+
+Run from the `clinic_ccsfp` directory:
+
+    python -m backend.services.imports appointments appointments.json
+    python -m backend.services.imports consultations history.csv --job 2025-spring
+"""
+import argparse
+import csv
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from backend.database import connection
+from backend.database.datetimes import parse_date_time
+from backend.database.pagination import name_tokens
+from backend.database.versions import collection_versions
+from backend.routes.appointment_routes import SLOT_TAKEN, STUDENT_BOOKED, Appointment
+from backend.routes.consultation_routes import Consultation
+from backend.services.appointments import booking_keys
+from backend.services.rollups import ROLLUP_COLLECTION, rollup_operations
+
+IMPORT_JOBS = "import_jobs"
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ("json", "ndjson", "csv")
+# Errors kept on the job document; later ones are only counted.
+MAX_REPORTED_ERRORS = 1000
+READ_CHUNK_CHARS = 1 << 16
+
+
+class ImportFormatError(ValueError):
+    """The input as a whole cannot be read (not per-row problems)."""
+
+
+# Readers ---------------------------------------------------------------------
+
+def _json_array(stream):
+    """Yield the items of a top-level JSON array, reading `stream` in chunks."""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ImportFormatError("Unexpected end of input: the JSON array is not closed")
+            more = stream.read(READ_CHUNK_CHARS)
+            buffer, pos, eof = more, 0, not more
+            continue
+        if not started:
+            if buffer[pos] != "[":
+                raise ImportFormatError("Expected a JSON array of rows")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ImportFormatError(f"Invalid JSON: {e.msg}")
+            more = stream.read(READ_CHUNK_CHARS)
+            buffer, pos, eof = buffer[pos:] + more, 0, not more
+            continue
+        yield item
+
+
+@dataclass
+class _Unreadable:
+    reason: str
+
+
+def _ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            # A bad line is that row's problem, not the whole file's.
+            yield _Unreadable(f"Invalid JSON: {e.msg}")
+
+
+def _unflatten(row: dict) -> dict:
+    """Nest dotted CSV columns (actionsTaken.sentHome), dropping empty cells."""
+    nested = {}
+    for column, value in row.items():
+        if column is None or value in ("", None):
+            continue
+        target = nested
+        *parents, leaf = column.strip().split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return nested
+
+
+def _csv(stream):
+    for row in csv.DictReader(stream):
+        yield _unflatten(row)
+
+
+READERS = {"json": _json_array, "ndjson": _ndjson, "csv": _csv}
+
+
+def read_rows(stream, fmt: str):
+    """Yield the raw rows of a text `stream` in `fmt`."""
+    if fmt not in READERS:
+        raise ImportFormatError(f"Unknown format {fmt!r}; expected one of {', '.join(IMPORT_FORMATS)}")
+    return READERS[fmt](stream)
+
+
+def guess_format(filename: str) -> str:
+    suffix = filename.rsplit(".", 1)[-1].lower()
+    return {"jsonl": "ndjson"}.get(suffix, suffix)
+
+
+# Kinds -----------------------------------------------------------------------
+
+class HistoricalAppointment(Appointment):
+    # Requests made before the booking form asked for an email have none.
+    email: Optional[str] = None
+
+
+def _source_id(row: dict) -> dict:
+    """Keep the exported id as `_id`, so importing the same file twice is harmless."""
+    source_id = row.get("id") or row.get("_id")
+    return {"_id": ObjectId(source_id)} if source_id and ObjectId.is_valid(source_id) else {}
+
+
+def appointment_document(row: dict) -> dict:
+    appointment = HistoricalAppointment.parse_obj(row)
+    data = appointment.dict(exclude_unset=True, exclude={"id"})
+    if data.get("email") is None:
+        data.pop("email", None)
+    data["dateTime"] = parse_date_time(appointment.dateTime)
+    data["nameTokens"] = name_tokens(appointment.firstName, appointment.lastName)
+    data.update(booking_keys(appointment.status, data["dateTime"]))
+    data.update(_source_id(row))
+    return data
+
+
+def consultation_document(row: dict) -> dict:
+    consultation = Consultation.parse_obj(row)
+    data = consultation.dict(exclude={"id", "version"})
+    data["actionsTaken"] = consultation.actionsTaken.dict()
+    data["dateTime"] = parse_date_time(consultation.dateTime) if consultation.dateTime else None
+    data["nameTokens"] = name_tokens(consultation.firstName, consultation.lastName)
+    data["version"] = 1
+    data.update(_source_id(row))
+    return data
+
+
+@dataclass
+class ImportKind:
+    collection: str
+    # Raw row -> stored document; raises ValidationError or ValueError.
+    to_document: Callable[[dict], dict]
+    rollup_source: Optional[str] = None
+
+
+IMPORT_KINDS = {
+    "appointments": ImportKind("student_appointments", appointment_document, "appointments"),
+    "consultations": ImportKind("student_consultations", consultation_document, "consultations"),
+}
+
+
+def _row_error(row_number: int, detail) -> dict:
+    return {"row": row_number, "detail": detail}
+
+
+def _validation_detail(error: ValidationError) -> list:
+    return [{"loc": list(e["loc"]), "msg": e["msg"]} for e in error.errors()]
+
+
+def _duplicate_detail(error: dict) -> str:
+    key_pattern = error.get("keyPattern") or {}
+    if "nurse" in key_pattern:
+        return SLOT_TAKEN
+    if "studentId" in key_pattern:
+        return STUDENT_BOOKED
+    if "_id" in key_pattern or "_id_" in str(error.get("errmsg", "")):
+        return "Already imported (same id)"
+    return error.get("errmsg", "Duplicate key")
+
+
+# Jobs ------------------------------------------------------------------------
+
+class Importer:
+    """One import job: validates batches of rows and writes them.
+
+    Synchronous on purpose: the CLI calls it directly and the endpoint hands
+    each batch to the database executor, so parsing and validation never
+    run on the event loop.
+    """
+
+    def __init__(self, database, kind: str, job_id: str = None, source: str = "",
+                 batch_size: int = IMPORT_BATCH_SIZE):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind {kind!r}")
+        self.database = database
+        self.kind = kind
+        self.spec = IMPORT_KINDS[kind]
+        self.collection = database[self.spec.collection]
+        self.jobs = database[IMPORT_JOBS]
+        self.job_id = job_id or uuid.uuid4().hex
+        self.source = source
+        self.batch_size = batch_size
+        self.checkpoint = 0
+        self.landed = set()
+
+    def start(self) -> dict:
+        """Create the job, or pick up where a previous run of it stopped."""
+        now = datetime.now(timezone.utc)
+        job = self.jobs.find_one_and_update(
+            {"_id": self.job_id},
+            {
+                "$setOnInsert": {"kind": self.kind, "source": self.source, "createdAt": now,
+                                 "checkpoint": 0, "inserted": 0, "failed": 0, "errors": []},
+                "$set": {"status": "running", "updatedAt": now},
+            },
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        if job["kind"] != self.kind:
+            raise ValueError(f"Job {self.job_id} imports {job['kind']}, not {self.kind}")
+        self.checkpoint = job.get("checkpoint", 0)
+        if self.checkpoint:
+            # Rows of the batch that was being written when the last run
+            # stopped may already be in; they are skipped, not duplicated.
+            self.landed = {doc["importRow"] for doc in self.collection.find(
+                {"importJob": self.job_id, "importRow": {"$gt": self.checkpoint}}, {"importRow": 1},
+            )}
+        return job
+
+    def batches(self, rows):
+        """Yield (last row number, documents, row errors) per `batch_size` rows."""
+        docs, errors, row_number = [], [], 0
+        for row_number, row in enumerate(rows, start=1):
+            if row_number <= self.checkpoint or row_number in self.landed:
+                continue
+            if isinstance(row, _Unreadable):
+                errors.append(_row_error(row_number, row.reason))
+            elif not isinstance(row, dict):
+                errors.append(_row_error(row_number, "Row is not an object"))
+            else:
+                try:
+                    doc = self.spec.to_document(row)
+                except ValidationError as e:
+                    errors.append(_row_error(row_number, _validation_detail(e)))
+                except ValueError as e:
+                    errors.append(_row_error(row_number, f"Invalid dateTime: {e}"))
+                else:
+                    doc["importJob"] = self.job_id
+                    doc["importRow"] = row_number
+                    docs.append(doc)
+            if len(docs) + len(errors) >= self.batch_size:
+                yield row_number, docs, errors
+                docs, errors = [], []
+        if docs or errors or row_number > self.checkpoint:
+            yield row_number, docs, errors
+
+    def write(self, batch) -> dict:
+        """Insert one batch, update rollups and versions, and advance the checkpoint."""
+        last_row, docs, errors = batch
+        inserted = docs
+        if docs:
+            try:
+                self.collection.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+            except BulkWriteError as e:
+                failed = {}
+                for error in e.details.get("writeErrors", []):
+                    failed[error["index"]] = error
+                inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+                errors = errors + [
+                    _row_error(docs[i]["importRow"], _duplicate_detail(error) if error.get("code") == 11000
+                               else error.get("errmsg", "Write failed"))
+                    for i, error in sorted(failed.items())
+                ]
+        if inserted:
+            if self.spec.rollup_source:
+                operations = rollup_operations(self.spec.rollup_source, added=inserted)
+                if operations:
+                    self.database[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+            collection_versions.bump_sync(self.spec.collection)
+        errors.sort(key=lambda error: error["row"])
+        self.jobs.update_one({"_id": self.job_id}, {
+            "$set": {"checkpoint": last_row, "updatedAt": datetime.now(timezone.utc)},
+            "$inc": {"inserted": len(inserted), "failed": len(errors)},
+            "$push": {"errors": {"$each": errors, "$slice": MAX_REPORTED_ERRORS}},
+        })
+        self.checkpoint = last_row
+        return {"rows": last_row, "inserted": len(inserted), "failed": len(errors)}
+
+    def finish(self, status: str = "done") -> dict:
+        return self.jobs.find_one_and_update(
+            {"_id": self.job_id},
+            {"$set": {"status": status, "updatedAt": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+def job_summary(job: dict) -> dict:
+    return {
+        "job": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "rows": job.get("checkpoint", 0),
+        "inserted": job.get("inserted", 0),
+        "failed": job.get("failed", 0),
+        "errors": job.get("errors", []),
+        "errorsTruncated": job.get("failed", 0) > len(job.get("errors", [])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import appointments or consultations.")
+    parser.add_argument("kind", choices=sorted(IMPORT_KINDS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, default=None,
+                        help="Defaults to the file extension (.json, .ndjson/.jsonl, .csv).")
+    parser.add_argument("--job", default=None, help="Resume this job instead of starting a new one.")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or guess_format(args.path)
+    importer = Importer(connection.db, args.kind, job_id=args.job, source=args.path, batch_size=args.batch_size)
+    print(f"job {importer.job_id} (pass --job {importer.job_id} to resume)")
+    with open(args.path, encoding="utf-8-sig", newline="") as stream:
+        importer.start()
+        try:
+            for batch in importer.batches(read_rows(stream, fmt)):
+                progress = importer.write(batch)
+                print(f"{args.kind}: {progress['rows']} rows read, {progress['inserted']} inserted, "
+                      f"{progress['failed']} failed in this batch")
+        except BaseException:
+            importer.finish("failed")
+            raise
+    summary = job_summary(importer.finish())
+    for error in summary["errors"]:
+        print(f"row {error['row']}: {error['detail']}")
+    print(f"{args.kind}: done, {summary['inserted']} inserted, {summary['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
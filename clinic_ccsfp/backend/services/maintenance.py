@@ -0,0 +1,117 @@
+"""Maintenance jobs run by `backend.services.scheduler` inside the API process.
+
+- expire-appointments: `Pending` appointments from past days become
+  `Expired` and release their slot, a batch per `update_many`.
+- precompute-schedule: stores tomorrow's per-nurse schedule in
+  `daily_schedules` for `GET /appointments/schedule`.
+- refresh-rollups: nightly `rebuild_rollups`, correcting any drift left by
+  incremental rollup updates that failed.
+- archive-terms: nightly, moves consultations and records from terms past
+  the archive cutoff into their per-term archives (`backend.services.archive`).
+
+Any one job can also be run by hand from the `clinic_ccsfp` directory:
+
+    python -m backend.services.maintenance expire-appointments
+"""
+import argparse
+import asyncio
+import os
+from datetime import date, timedelta
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from backend.database import connection
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import day_start
+from backend.database.versions import collection_versions
+from backend.services.appointments import EXPIRED, PENDING, appointment_table
+from backend.services.archive import archive_old_terms
+from backend.services.events import appointment_events
+from backend.services.occupancy import occupancy
+from backend.services.rollups import rebuild_rollups, update_rollups
+from backend.services.scheduler import Job, MaintenanceScheduler, scheduler
+from backend.services.schedules import precompute_schedule
+
+EXPIRE_INTERVAL_MINUTES = float(os.getenv("EXPIRE_INTERVAL_MINUTES", "60"))
+EXPIRE_BATCH_SIZE = 1000
+SCHEDULE_INTERVAL_MINUTES = float(os.getenv("SCHEDULE_INTERVAL_MINUTES", "30"))
+ROLLUP_REFRESH_HOUR = int(os.getenv("ROLLUP_REFRESH_HOUR", "2"))
+ARCHIVE_HOUR = int(os.getenv("ARCHIVE_HOUR", "3"))
+
+appointments = AsyncCollection("student_appointments")
+
+
+async def expire_pending_appointments() -> int:
+    """Mark `Pending` appointments dated before today `Expired`.
+
+    Only whole past days are expired: slot labels such as "02:00" mean the
+    afternoon, so comparing times within today would expire live bookings.
+    Each batch is one `update_many`; rollups, the occupancy index and SSE
+    subscribers are updated for exactly the documents it changed.
+    """
+    cutoff = day_start(date.today())
+    expired = 0
+    while True:
+        docs = await appointments.find({"status": PENDING, "dateTime": {"$lt": cutoff}}, limit=EXPIRE_BATCH_SIZE)
+        if not docs:
+            break
+        ids = [doc["_id"] for doc in docs]
+        result = await appointments.update_many(
+            {"_id": {"$in": ids}, "status": PENDING},
+            {"$set": {"status": EXPIRED}, "$unset": {"slotHeld": ""}},
+        )
+        if result.modified_count != len(ids):
+            # Some were accepted or deleted since the read; keep only the ones this batch expired.
+            changed = {doc["_id"] for doc in await appointments.find({"_id": {"$in": ids}, "status": EXPIRED}, {"_id": 1})}
+            docs = [doc for doc in docs if doc["_id"] in changed]
+        updated = [{**doc, "status": EXPIRED} for doc in docs]
+        await update_rollups("appointments", removed=docs, added=updated)
+        for doc in updated:
+            occupancy.release(doc.get("nurse"), doc.get("dateTime"))
+            appointment_events.publish_local("updated", appointment_table(doc))
+        expired += len(docs)
+        if len(ids) < EXPIRE_BATCH_SIZE:
+            break
+    if expired:
+        await collection_versions.bump(appointments.name)
+    return expired
+
+
+async def precompute_tomorrow() -> int:
+    schedule = await precompute_schedule(date.today() + timedelta(days=1))
+    return sum(len(nurse["appointments"]) for nurse in schedule["nurses"])
+
+
+async def refresh_rollups() -> int:
+    # A full rebuild can outlast DB_OPERATION_TIMEOUT, so it gets its own
+    # thread instead of the shared query pool.
+    _, rebuilt = await asyncio.to_thread(rebuild_rollups, connection.db)
+    return rebuilt
+
+
+JOBS = [
+    Job("expire-appointments", expire_pending_appointments,
+        IntervalTrigger(minutes=EXPIRE_INTERVAL_MINUTES), hold=EXPIRE_INTERVAL_MINUTES * 60 / 2, first_run_delay=30),
+    Job("precompute-schedule", precompute_tomorrow,
+        IntervalTrigger(minutes=SCHEDULE_INTERVAL_MINUTES), hold=SCHEDULE_INTERVAL_MINUTES * 60 / 2, first_run_delay=60),
+    Job("refresh-rollups", refresh_rollups, CronTrigger(hour=ROLLUP_REFRESH_HOUR), hold=3600),
+    Job("archive-terms", archive_old_terms, CronTrigger(hour=ARCHIVE_HOUR), hold=3600),
+]
+
+def register_jobs(target: MaintenanceScheduler = scheduler):
+    """Add the maintenance jobs to `target`; the app does this when it starts."""
+    for job in JOBS:
+        target.add(job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one maintenance job now.")
+    parser.add_argument("job", choices=[job.name for job in JOBS])
+    args = parser.parse_args()
+    job = next(job for job in JOBS if job.name == args.job)
+    print(f"{job.name}: {asyncio.run(job.func())} documents")
+
+
+if __name__ == "__main__":
+    main()
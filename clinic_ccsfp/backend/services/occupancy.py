@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import day_range, split_date_time
+
+# Bookable times shown on the student calendar (frontend/components/appointment.html).
+SLOT_TIMES = ["08:00", "08:30", "09:30", "10:00", "11:00", "11:30", "12:30", "02:00", "04:00", "06:00"]
+
+# How long a loaded day is trusted before it is re-read, so bookings made by
+# other workers show up without any cross-process messaging.
+OCCUPANCY_TTL_SECONDS = 30
+MAX_CACHED_DAYS = 5000
+
+appointments = AsyncCollection("student_appointments")
+
+
+class OccupancyIndex:
+    """Taken slots per (nurse, day), loaded lazily and kept current by the write routes."""
+
+    def __init__(self, ttl=OCCUPANCY_TTL_SECONDS, max_days=MAX_CACHED_DAYS):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._days = OrderedDict()  # (nurse, day) -> (loaded_at, {time: appointment_id})
+
+    def _fresh(self, key) -> bool:
+        entry = self._days.get(key)
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def _store(self, key, slots):
+        self._days[key] = (time.monotonic(), slots)
+        self._days.move_to_end(key)
+        while len(self._days) > self.max_days:
+            self._days.popitem(last=False)
+
+    async def _load(self, nurse: str, start: date, end: date):
+        docs = await appointments.find(
+            {
+                "nurse": nurse,
+                "dateTime": day_range(start, end),
+                # Only appointments holding their slot: not rejected or expired.
+                "slotHeld": True,
+            },
+            {"dateTime": 1},
+        )
+        loaded = {}
+        day = start
+        while day <= end:
+            loaded[day.isoformat()] = {}
+            day += timedelta(days=1)
+        for doc in docs:
+            day_key, slot = split_date_time(doc.get("dateTime"))
+            if day_key in loaded:
+                loaded[day_key][slot] = str(doc["_id"])
+        for day_key, slots in loaded.items():
+            self._store((nurse, day_key), slots)
+
+    async def taken(self, nurse: str, start: date, end: date) -> dict:
+        """Return {day: {time: appointment_id}} for every day in [start, end]."""
+        days = []
+        day = start
+        while day <= end:
+            days.append(day.isoformat())
+            day += timedelta(days=1)
+
+        stale = [d for d in days if not self._fresh((nurse, d))]
+        if stale:
+            await self._load(nurse, date.fromisoformat(stale[0]), date.fromisoformat(stale[-1]))
+        return {d: self._days[(nurse, d)][1] for d in days}
+
+    def book(self, nurse: str, date_time: str, appointment_id: str):
+        day, slot = split_date_time(date_time)
+        entry = self._days.get((nurse, day))
+        if entry is not None:
+            entry[1][slot] = appointment_id
+
+    def release(self, nurse: str, date_time: str):
+        day, slot = split_date_time(date_time)
+        entry = self._days.get((nurse, day))
+        if entry is not None:
+            entry[1].pop(slot, None)
+
+
+occupancy = OccupancyIndex()
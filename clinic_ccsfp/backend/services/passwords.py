@@ -0,0 +1,30 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt is deliberately slow (hundreds of ms per call). Running it on
+# FastAPI's shared threadpool let a burst of logins at shift change occupy
+# every worker thread, so unrelated `def` routes queued behind them. It gets
+# its own small pool instead: extra logins wait their turn here while the
+# rest of the API keeps its threads.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd_context.hash, password)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd_context.verify, plain, hashed)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=True)
@@ -0,0 +1,14 @@
+import orjson
+from starlette.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson: several times faster than `json.dumps` on list pages.
+
+    It is the app's default response class. List endpoints also return it
+    directly, with the page dict, so FastAPI skips `jsonable_encoder` and
+    orjson sees the rows as the serializers built them.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,146 @@
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import day_start, split_date_time
+from backend.database.indexes import INDEXES
+from backend.services.archive import archive_names
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "daily_rollups"
+ACTION_FLAGS = ["restedInClinic", "givenFirstAid", "administeredMedication", "sentHome", "referred", "others"]
+UNSPECIFIED = "unspecified"
+LABEL_LENGTH = 60
+
+# source name -> collection the rollup is derived from
+SOURCES = {
+    "consultations": "student_consultations",
+    "appointments": "student_appointments",
+}
+# Only these fields are needed to compute a document's contribution.
+ROLLUP_PROJECTION = {
+    "dateTime": 1, "nurse": 1, "concern": 1, "diagnosis": 1, "actionsTaken": 1, "status": 1,
+}
+
+rollups = AsyncCollection(ROLLUP_COLLECTION)
+
+
+def _label(value) -> str:
+    """Normalise free text into a counter key ("Head-ache. " -> "head-ache").
+
+    Keys become field names under $inc, so dots and leading `$` are dropped.
+    """
+    text = " ".join(str(value or "").lower().split()).replace(".", "").lstrip("$")
+    return text[:LABEL_LENGTH] or UNSPECIFIED
+
+
+def contribution(source: str, doc: dict):
+    """(rollup id, {"day", "nurse"}, counters to add) for one document, or None.
+
+    Documents without a usable dateTime are not counted.
+    """
+    date_time = doc.get("dateTime")
+    if not isinstance(date_time, datetime):
+        return None
+    day = split_date_time(date_time)[0]
+    nurse = str(doc.get("nurse") or UNSPECIFIED)
+    counts = {"visits": 1, f"concerns.{_label(doc.get('concern'))}": 1}
+    if source == "consultations":
+        counts[f"diagnoses.{_label(doc.get('diagnosis'))}"] = 1
+        actions = doc.get("actionsTaken")
+        if isinstance(actions, dict):
+            for flag in ACTION_FLAGS:
+                if actions.get(flag):
+                    counts[f"actions.{flag}"] = 1
+    else:
+        counts[f"statuses.{doc.get('status') or UNSPECIFIED}"] = 1
+    return f"{source}|{day}|{nurse}", {"day": day_start(date_time.date()), "nurse": nurse}, counts
+
+
+def rollup_operations(source: str, removed=(), added=()) -> list:
+    """$inc upserts moving the rollups from the `removed` documents to the `added` ones."""
+    merged = {}
+    for sign, docs in ((-1, removed), (1, added)):
+        for doc in docs:
+            part = contribution(source, doc)
+            if part is None:
+                continue
+            rollup_id, keys, counts = part
+            entry = merged.setdefault(rollup_id, (keys, {}))
+            for field, amount in counts.items():
+                entry[1][field] = entry[1].get(field, 0) + sign * amount
+    operations = []
+    for rollup_id, (keys, counts) in merged.items():
+        counts = {field: amount for field, amount in counts.items() if amount}
+        if counts:
+            operations.append(UpdateOne(
+                {"_id": rollup_id},
+                {"$inc": counts, "$setOnInsert": {"source": source, **keys}},
+                upsert=True,
+            ))
+    return operations
+
+
+async def update_rollups(source: str, removed=(), added=()):
+    """Apply a write's effect to the rollups.
+
+    A failure is logged rather than raised: the write itself has already
+    succeeded, and `python -m backend.database.migrate rollups` recomputes
+    the rollups from scratch.
+    """
+    operations = rollup_operations(source, removed, added)
+    if not operations:
+        return
+    try:
+        await rollups.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.warning(f"Could not update {source} rollups: {e}")
+
+
+def rebuild_rollups(database, batch_size=1000):
+    """Recompute every rollup from the source collections and their archived terms.
+
+    Builds into a scratch collection and renames it over `daily_rollups`, so
+    readers never see a half-built set. Writes made while it runs may be
+    missed; run it when the clinic is quiet. Returns the documents scanned
+    per collection and the number of rollups built.
+    """
+    totals, scanned_by_collection = {}, {}
+    for source, collection in SOURCES.items():
+        # Archived terms still count towards the analytics.
+        for name in [collection, *archive_names(database, collection)]:
+            scanned = 0
+            for doc in database[name].find({}, ROLLUP_PROJECTION).batch_size(batch_size):
+                scanned += 1
+                part = contribution(source, doc)
+                if part is None:
+                    continue
+                rollup_id, keys, counts = part
+                entry = totals.setdefault(rollup_id, {"_id": rollup_id, "source": source, **keys})
+                for field, amount in counts.items():
+                    group, _, key = field.partition(".")
+                    if key:
+                        bucket = entry.setdefault(group, {})
+                        bucket[key] = bucket.get(key, 0) + amount
+                    else:
+                        entry[field] = entry.get(field, 0) + amount
+            scanned_by_collection[name] = scanned
+            logger.info(f"{name}: {scanned} documents scanned")
+
+    scratch = database[f"{ROLLUP_COLLECTION}_rebuild"]
+    scratch.drop()
+    docs = list(totals.values())
+    for start in range(0, len(docs), batch_size):
+        scratch.insert_many(docs[start:start + batch_size])
+    for keys, options in INDEXES[ROLLUP_COLLECTION]:
+        scratch.create_index(keys, **options)
+    if docs:
+        scratch.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        scratch.drop()
+        database[ROLLUP_COLLECTION].delete_many({})
+    logger.info(f"{ROLLUP_COLLECTION}: rebuilt {len(docs)} day/nurse rollups")
+    return scanned_by_collection, len(docs)
@@ -0,0 +1,146 @@
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from backend.database.async_db import AsyncCollection
+from backend.services.metrics import Counter, Gauge, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") not in ("0", "false", "no")
+# How long a worker may hold a job before the others assume it died.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+job_runs = registry.register(Counter(
+    "scheduler_job_runs_total", "Scheduled job runs by job and outcome (ok, error, skipped).", ("job", "outcome")))
+job_duration = registry.register(Histogram(
+    "scheduler_job_duration_seconds", "Run time of scheduled jobs.", ("job",), buckets=JOB_DURATION_BUCKETS))
+job_items = registry.register(Counter(
+    "scheduler_job_items_total", "Documents processed by scheduled jobs.", ("job",)))
+job_last_success = registry.register(Gauge(
+    "scheduler_job_last_success_timestamp_seconds", "Unix time this worker last finished each job.", ("job",)))
+
+
+class JobLock:
+    """One document per job in `scheduler_locks`, so only one worker runs it.
+
+    Every uvicorn worker runs the same scheduler. A worker takes a job by
+    moving its `lockedUntil` (Unix seconds) forward, which only succeeds
+    once the previous holder's time has passed. After a successful run the
+    lock is held for the job's `hold` period, so the other workers' timers,
+    firing moments later, skip that round instead of repeating it. The
+    document also keeps the last run's outcome for whoever is debugging.
+    """
+
+    def __init__(self, collection: str = "scheduler_locks"):
+        self._locks = AsyncCollection(collection)
+
+    async def acquire(self, name: str, lease: float) -> bool:
+        now = time.time()
+        try:
+            await self._locks.find_one_and_update(
+                {"_id": name, "lockedUntil": {"$lte": now}},
+                {"$set": {"lockedUntil": now + lease, "owner": WORKER_ID, "startedAt": now}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The document exists but is still locked, so the upsert tried to insert.
+            return False
+        return True
+
+    async def release(self, name: str, hold_until: float, **outcome):
+        await self._locks.update_one(
+            {"_id": name, "owner": WORKER_ID},
+            {"$set": {"lockedUntil": hold_until, **outcome}},
+        )
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[int]]
+    trigger: object
+    # Seconds after a successful start during which no worker runs it again.
+    hold: float
+    # Seconds after startup before the first run; None waits for the trigger.
+    first_run_delay: float = None
+
+
+class MaintenanceScheduler:
+    """APScheduler jobs run in the app's event loop, behind a `JobLock`.
+
+    Jobs are coroutines returning how many documents they processed. Each
+    run records `scheduler_job_*` metrics; a failure is logged and the lock
+    released so the next round (on any worker) tries again.
+    """
+
+    def __init__(self, lock: JobLock = None, lease: float = JOB_LEASE_SECONDS):
+        self.lock = lock or JobLock()
+        self.lease = lease
+        self.jobs = {}
+        self._scheduler = None
+
+    def add(self, job: Job):
+        self.jobs[job.name] = job
+
+    async def run(self, name: str) -> int:
+        """Run job `name` now if no other worker holds it; returns documents processed, or None if skipped."""
+        job = self.jobs[name]
+        if not await self.lock.acquire(name, self.lease):
+            job_runs.inc(name, "skipped")
+            return None
+
+        started = time.time()
+        try:
+            items = await job.func() or 0
+        except Exception as e:
+            elapsed = time.time() - started
+            job_runs.inc(name, "error")
+            job_duration.observe(name, value=elapsed)
+            logger.exception(f"Scheduled job {name} failed after {elapsed:.1f}s")
+            await self.lock.release(name, time.time(), lastError=str(e), lastDuration=elapsed)
+            return None
+
+        elapsed = time.time() - started
+        job_runs.inc(name, "ok")
+        job_duration.observe(name, value=elapsed)
+        job_items.inc(name, amount=items)
+        job_last_success.set(name, value=time.time())
+        logger.info(f"Scheduled job {name}: {items} documents in {elapsed:.2f}s")
+        await self.lock.release(name, max(time.time(), started + job.hold),
+                                lastSuccess=started, lastDuration=elapsed, lastItems=items, lastError=None)
+        return items
+
+    def start(self):
+        if not SCHEDULER_ENABLED:
+            logger.info("SCHEDULER_ENABLED is off; maintenance jobs will not run in this worker")
+            return
+        self._scheduler = AsyncIOScheduler()
+        now = datetime.now(timezone.utc)
+        for job in self.jobs.values():
+            first_run = now + timedelta(seconds=job.first_run_delay) if job.first_run_delay is not None else None
+            options = {"next_run_time": first_run} if first_run else {}
+            self._scheduler.add_job(
+                self.run, job.trigger, args=[job.name], id=job.name, name=job.name,
+                coalesce=True, max_instances=1, misfire_grace_time=300, **options,
+            )
+        self._scheduler.start()
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+
+scheduler = MaintenanceScheduler()
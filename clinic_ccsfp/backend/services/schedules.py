@@ -0,0 +1,74 @@
+from datetime import date, datetime, timezone
+
+from backend.database.async_db import AsyncCollection
+from backend.database.datetimes import day_range, split_date_time
+from backend.database.versions import collection_versions
+from backend.services.appointments import ACCEPTED, PENDING
+from backend.services.occupancy import SLOT_TIMES
+
+SCHEDULE_COLLECTION = "daily_schedules"
+SCHEDULED_STATUSES = [PENDING, ACCEPTED]
+SCHEDULE_PROJECTION = {
+    "studentId": 1, "firstName": 1, "lastName": 1, "concern": 1, "nurse": 1, "dateTime": 1, "status": 1,
+}
+
+appointments = AsyncCollection("student_appointments")
+schedules = AsyncCollection(SCHEDULE_COLLECTION)
+
+
+def _slot_order(slot: str):
+    # Slot times are the booking page's labels, where "02:00" is the
+    # afternoon, so order by the slot list rather than the clock.
+    try:
+        return SLOT_TIMES.index(slot), slot
+    except ValueError:
+        return len(SLOT_TIMES), slot
+
+
+async def build_schedule(day: date) -> dict:
+    """Every nurse's pending and accepted appointments on `day`, in slot order."""
+    version = await collection_versions.current(appointments.name)
+    docs = await appointments.find(
+        {"dateTime": day_range(day, day), "status": {"$in": SCHEDULED_STATUSES}}, SCHEDULE_PROJECTION,
+    )
+    nurses = {}
+    for doc in docs:
+        _, slot = split_date_time(doc.get("dateTime"))
+        nurses.setdefault(str(doc.get("nurse") or ""), []).append({
+            "id": str(doc["_id"]),
+            "time": slot,
+            "studentId": str(doc.get("studentId", "")),
+            "firstName": doc.get("firstName", ""),
+            "lastName": doc.get("lastName", ""),
+            "concern": doc.get("concern", ""),
+            "status": doc.get("status", ""),
+        })
+    return {
+        "_id": day.isoformat(),
+        "date": day.isoformat(),
+        "version": version,
+        "computedAt": datetime.now(timezone.utc),
+        "nurses": [
+            {"nurse": nurse, "appointments": sorted(items, key=lambda a: _slot_order(a["time"]))}
+            for nurse, items in sorted(nurses.items())
+        ],
+    }
+
+
+async def precompute_schedule(day: date) -> dict:
+    """Build and store `day`'s schedule unless the stored one is still current."""
+    stored = await schedules.find_one({"_id": day.isoformat()})
+    if stored and stored.get("version") == await collection_versions.current(appointments.name):
+        return stored
+    schedule = await build_schedule(day)
+    fields = {key: value for key, value in schedule.items() if key != "_id"}
+    await schedules.update_one({"_id": schedule["_id"]}, {"$set": fields}, upsert=True)
+    return schedule
+
+
+def schedule_table(schedule: dict) -> dict:
+    return {
+        "date": schedule["date"],
+        "computedAt": schedule["computedAt"].strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "nurses": schedule["nurses"],
+    }
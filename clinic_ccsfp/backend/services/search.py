@@ -0,0 +1,321 @@
+import asyncio
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from pymongo.errors import OperationFailure
+
+from backend.database.async_db import run_db
+from backend.database.versions import collection_versions
+
+logger = logging.getLogger(__name__)
+
+# Field weights, shared by the Mongo text index and the in-process index so
+# both paths rank the same way: a hit on the student's name counts most.
+SEARCH_WEIGHTS = {
+    "firstName": 10,
+    "lastName": 10,
+    "diagnosis": 5,
+    "concern": 4,
+    "assessment": 2,
+    "recommendations": 1,
+}
+NAME_FIELDS = ("firstName", "lastName")
+# Bonus for every query word that is a prefix of one of the student's names.
+NAME_PREFIX_BOOST = 8
+MIN_PREFIX_LENGTH = 2
+# Most ranked hits a search pages through.
+SEARCH_WINDOW = 1000
+# Documents read per database call while loading the in-process index.
+LOAD_BATCH_SIZE = 2000
+# How long to wait before trying the text index again after it was missing.
+TEXT_RECHECK_SECONDS = 300
+
+_WORD = re.compile(r"[0-9a-zñ]+")
+
+
+def tokenize(text) -> list:
+    return _WORD.findall(str(text or "").lower())
+
+
+def query_terms(q: str) -> list:
+    return list(dict.fromkeys(tokenize(q)))
+
+
+class InvertedIndex:
+    """Token -> postings index over consultations, for servers without a text index.
+
+    Postings are compact arrays of document slots with the summed field
+    weight of the token in that document. Updated and deleted documents
+    leave a dead slot behind; the arrays are compacted once dead slots pass
+    a quarter of the total. Name tokens are also kept sorted so a query
+    word can match names by prefix ("mar" -> "maria").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._ids = []
+        self._dates = []
+        self._alive = bytearray()
+        self._slot_of = {}
+        self._postings = {}
+        self._weights = {}
+        self._name_slots = {}
+        self._sorted_names = []
+        self._names_dirty = False
+        self._dead = 0
+        self.version = None
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    # Writes ----------------------------------------------------------------
+
+    def _add(self, doc):
+        slot = len(self._ids)
+        self._ids.append(doc["_id"])
+        date_time = doc.get("dateTime")
+        self._dates.append(date_time if isinstance(date_time, datetime) else None)
+        self._alive.append(1)
+        self._slot_of[doc["_id"]] = slot
+
+        scores = {}
+        for field, weight in SEARCH_WEIGHTS.items():
+            for token in tokenize(doc.get(field)):
+                scores[token] = scores.get(token, 0) + weight
+        for token, score in scores.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("I")
+                self._weights[token] = array("H")
+            postings.append(slot)
+            self._weights[token].append(min(score, 65535))
+
+        for field in NAME_FIELDS:
+            for token in tokenize(doc.get(field)):
+                slots = self._name_slots.get(token)
+                if slots is None:
+                    slots = self._name_slots[token] = array("I")
+                    self._names_dirty = True
+                slots.append(slot)
+
+    def _remove(self, doc_id):
+        slot = self._slot_of.pop(doc_id, None)
+        if slot is not None:
+            self._alive[slot] = 0
+            self._dead += 1
+
+    def add_many(self, docs):
+        with self._lock:
+            for doc in docs:
+                self._add(doc)
+
+    def upsert(self, doc):
+        with self._lock:
+            self._remove(doc["_id"])
+            self._add(doc)
+            self._maybe_compact()
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._dead * 4 <= len(self._ids):
+            return
+        keep = [slot for slot in range(len(self._ids)) if self._alive[slot]]
+        new_slot = {old: new for new, old in enumerate(keep)}
+        self._ids = [self._ids[slot] for slot in keep]
+        self._dates = [self._dates[slot] for slot in keep]
+        self._alive = bytearray([1]) * len(keep)
+        self._slot_of = {doc_id: new_slot[slot] for doc_id, slot in self._slot_of.items()}
+        for token in list(self._postings):
+            pairs = [(new_slot[s], w) for s, w in zip(self._postings[token], self._weights[token]) if s in new_slot]
+            if pairs:
+                self._postings[token] = array("I", [s for s, _ in pairs])
+                self._weights[token] = array("H", [w for _, w in pairs])
+            else:
+                del self._postings[token]
+                del self._weights[token]
+        for token in list(self._name_slots):
+            slots = array("I", [new_slot[s] for s in self._name_slots[token] if s in new_slot])
+            if slots:
+                self._name_slots[token] = slots
+            else:
+                del self._name_slots[token]
+                self._names_dirty = True
+        self._dead = 0
+
+    # Reads -----------------------------------------------------------------
+
+    def _names_with_prefix(self, prefix):
+        if self._names_dirty:
+            self._sorted_names = sorted(self._name_slots)
+            self._names_dirty = False
+        names = self._sorted_names
+        start = bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def search(self, terms, limit):
+        """Return up to `limit` (score, date, _id) tuples, best first."""
+        with self._lock:
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    for slot, weight in zip(postings, self._weights[term]):
+                        if self._alive[slot]:
+                            scores[slot] = scores.get(slot, 0) + weight
+                if len(term) >= MIN_PREFIX_LENGTH:
+                    boosted = set()
+                    for name in self._names_with_prefix(term):
+                        boosted.update(self._name_slots[name])
+                    for slot in boosted:
+                        if self._alive[slot]:
+                            scores[slot] = scores.get(slot, 0) + NAME_PREFIX_BOOST
+            ranked = heapq.nlargest(
+                limit, scores.items(), key=lambda item: (item[1], self._dates[item[0]] or datetime.min),
+            )
+            return [(score, self._dates[slot], self._ids[slot]) for slot, score in ranked]
+
+
+class ConsultationSearch:
+    """Ranked consultation search: Mongo's text index when the server has one,
+    otherwise an `InvertedIndex` kept in this process.
+
+    Both paths add NAME_PREFIX_BOOST per query word that starts one of the
+    student's names, and break score ties by newest dateTime. The in-process
+    index is loaded on first use and follows this worker's writes; when the
+    collection version shows another worker wrote, it is reloaded.
+    """
+
+    def __init__(self, collection, window: int = SEARCH_WINDOW):
+        self.collection = collection
+        self.window = window
+        self.index = InvertedIndex()
+        self._text_available = None
+        self._checked_at = 0.0
+        self._refresh = asyncio.Lock()
+
+    # Mongo text index ------------------------------------------------------
+
+    @staticmethod
+    def _text_works(coll):
+        if not any("text" in dict(info["key"]).values() for info in coll.index_information().values()):
+            return False
+        # Run the query the search runs: stand-ins such as mongomock accept
+        # the index but fail the query, and not always with OperationFailure.
+        try:
+            list(coll.find({"$text": {"$search": "probe"}}, {"score": {"$meta": "textScore"}})
+                 .sort([("score", {"$meta": "textScore"})]).limit(1))
+        except Exception as e:
+            logger.debug(f"Text search unsupported on {coll.name} ({e})")
+            return False
+        return True
+
+    async def probe(self):
+        """Decide whether searches use the text index; rechecked every TEXT_RECHECK_SECONDS.
+
+        Called at startup, so the first search does not pay for it.
+        """
+        available = await self.collection.run(self._text_works)
+        if not available and self._text_available is not False:
+            logger.info(f"No usable text index on {self.collection.name}; using the in-process search index")
+        self._text_available = available
+        self._checked_at = time.monotonic()
+        return available
+
+    def _text_hits(self, coll, q, terms):
+        found = coll.find(
+            {"$text": {"$search": q}},
+            {"score": {"$meta": "textScore"}, "dateTime": 1, "nameTokens": 1},
+        ).sort([("score", {"$meta": "textScore"})]).limit(self.window)
+        prefixes = [re.compile("^" + re.escape(t)) for t in terms if len(t) >= MIN_PREFIX_LENGTH]
+        by_name = coll.find({"nameTokens": {"$in": prefixes}}, {"dateTime": 1, "nameTokens": 1}).limit(self.window) \
+            if prefixes else []
+
+        scores, dates = {}, {}
+        for doc in list(found) + list(by_name):
+            if doc["_id"] not in scores:
+                names = doc.get("nameTokens") or []
+                boost = sum(NAME_PREFIX_BOOST for t in terms if any(n.startswith(t) for n in names))
+                scores[doc["_id"]] = boost
+                dates[doc["_id"]] = doc.get("dateTime")
+            scores[doc["_id"]] += doc.get("score", 0)
+        return [(score, dates[doc_id] if isinstance(dates[doc_id], datetime) else None, doc_id)
+                for doc_id, score in scores.items()]
+
+    async def _search_text(self, q, terms):
+        if self._text_available is None or time.monotonic() - self._checked_at >= TEXT_RECHECK_SECONDS:
+            await self.probe()
+        if not self._text_available:
+            return None
+        try:
+            hits = await self.collection.run(self._text_hits, q, terms)
+        except OperationFailure as e:
+            # The index was dropped since the last probe.
+            logger.warning(f"Text search on {self.collection.name} failed ({e}); using the in-process search index")
+            self._text_available = False
+            return None
+        return sorted(hits, key=lambda hit: (hit[0], hit[1] or datetime.min), reverse=True)[:self.window]
+
+    # In-process index ------------------------------------------------------
+
+    async def _load(self, version):
+        # Built aside in batches and swapped in, so searches keep using the
+        # old index meanwhile and no single database call runs for long.
+        index = InvertedIndex()
+        projection = dict.fromkeys(list(SEARCH_WEIGHTS) + ["dateTime"], 1)
+        async for batch in self.collection.iter_batches({}, projection, batch_size=LOAD_BATCH_SIZE):
+            await run_db(index.add_many, batch)
+        index.version = version
+        self.index = index
+        logger.info(f"Search index loaded: {len(index)} consultations")
+
+    async def _fresh_index(self):
+        version = await collection_versions.current(self.collection.name)
+        if self.index.version != version:
+            async with self._refresh:
+                if self.index.version != version:
+                    await self._load(version)
+        return self.index
+
+    async def on_write(self, version: int, doc: dict = None, removed_id=None):
+        """Apply this worker's write to the in-process index.
+
+        `version` is what the write's `collection_versions.bump` returned. If
+        the index was not at the version just before it, someone else wrote
+        in between, and the index is left stale so the next search reloads.
+        """
+        if self.index.version is None or self.index.version != version - 1:
+            return
+        if doc is not None:
+            self.index.upsert(doc)
+        if removed_id is not None:
+            self.index.remove(removed_id)
+        self.index.version = version
+
+    # ----------------------------------------------------------------------
+
+    async def search(self, q: str):
+        """All ranked hits (score, dateTime, _id) for `q`, best first, at most `window`."""
+        terms = query_terms(q)
+        if not terms:
+            return []
+        hits = await self._search_text(q, terms)
+        if hits is None:
+            index = await self._fresh_index()
+            hits = await run_db(index.search, terms, self.window)
+        return hits
@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+from fastapi import Depends, Header, HTTPException
+
+from backend.database.async_db import AsyncCollection, run_db
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(12 * 3600)))
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+if not SESSION_SECRET:
+    SESSION_SECRET = secrets.token_hex(32)
+    logger.warning("SESSION_SECRET is not set; sessions will not survive a restart "
+                   "or be accepted by other workers")
+
+revoked_sessions = AsyncCollection("revoked_sessions")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def issue_token(username: str, role: str, ttl: int = SESSION_TTL_SECONDS) -> dict:
+    """Return a signed session token for `username` and when it expires."""
+    expires = int(time.time()) + ttl
+    claims = {"sub": username, "role": role, "exp": expires, "jti": secrets.token_urlsafe(12)}
+    payload = _b64encode(orjson.dumps(claims))
+    return {"token": f"{payload}.{_sign(payload)}", "expiresAt": expires}
+
+
+def read_token(token: str) -> Optional[dict]:
+    """Claims of a well-formed, correctly signed, unexpired token, else None.
+
+    This is an HMAC and a JSON decode, so it is cheap enough to run on every
+    request; revocation is checked separately against `revocations`.
+    """
+    try:
+        payload, signature = token.split(".")
+    except (AttributeError, ValueError):
+        return None
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        claims = orjson.loads(_b64decode(payload))
+    except (ValueError, orjson.JSONDecodeError):
+        return None
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+
+class RevocationList:
+    """Token ids revoked before they expired, shared through `revoked_sessions`.
+
+    Each worker keeps the (small) set in memory and reloads it at most every
+    REVOCATION_REFRESH_SECONDS, so a logout on one worker is honoured by the
+    others within that window and by its own worker immediately. A TTL index
+    drops entries once the token would have expired anyway.
+    """
+
+    def __init__(self, refresh_seconds: float = REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._revoked = set()
+        self._loaded_at = 0.0
+
+    def _load(self):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        docs = revoked_sessions.sync.find({"expiresAt": {"$gt": now}}, {"_id": 1})
+        return {doc["_id"] for doc in docs}
+
+    async def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self._revoked = await run_db(self._load)
+            self._loaded_at = time.monotonic()
+        return jti in self._revoked
+
+    async def revoke(self, claims: dict):
+        self._revoked.add(claims["jti"])
+        expires = datetime.fromtimestamp(claims["exp"], timezone.utc).replace(tzinfo=None)
+        await revoked_sessions.update_one(
+            {"_id": claims["jti"]},
+            {"$set": {"expiresAt": expires, "username": claims["sub"]}},
+            upsert=True,
+        )
+
+
+revocations = RevocationList()
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    return token if scheme.lower() == "bearer" else None
+
+
+async def _session(token: Optional[str]) -> dict:
+    claims = read_token(token) if token else None
+    if claims is None or await revocations.is_revoked(claims["jti"]):
+        raise HTTPException(status_code=401, detail="Not logged in or session expired",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+async def current_session(authorization: Optional[str] = Header(None)) -> dict:
+    """Dependency: the caller's session claims, or 401."""
+    return await _session(bearer_token(authorization))
+
+
+async def stream_session(authorization: Optional[str] = Header(None), access_token: Optional[str] = None) -> dict:
+    """Dependency for Server-Sent Event streams: like `current_session`, but
+    also takes the token as `?access_token=`, since EventSource cannot set
+    headers.
+    """
+    return await _session(bearer_token(authorization) or access_token)
+
+
+async def require_admin(session: dict = Depends(current_session)) -> dict:
+    """Dependency: like `current_session`, but only for the admin account."""
+    if session.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return session
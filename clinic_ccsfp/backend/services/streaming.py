@@ -0,0 +1,101 @@
+import csv
+import io
+import zlib
+
+import orjson
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+async def json_array(batches, serialize):
+    """Encode batches of documents as one JSON array, a batch per chunk."""
+    yield b"["
+    first = True
+    async for batch in batches:
+        chunk = b",".join([orjson.dumps(serialize(doc)) for doc in batch])
+        if not chunk:
+            continue
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+async def ndjson_lines(batches, serialize):
+    """Encode batches of documents as newline-delimited JSON, a batch per chunk."""
+    async for batch in batches:
+        if batch:
+            yield b"".join([orjson.dumps(serialize(doc), option=orjson.OPT_APPEND_NEWLINE) for doc in batch])
+
+
+def _compact(row: dict) -> dict:
+    out = {}
+    for key, value in row.items():
+        if value is None or value is False or value == "":
+            continue
+        if value.__class__ is dict:
+            value = _compact(value)
+            if not value:
+                continue
+        out[key] = value
+    return out
+
+
+def compact(serialize):
+    """Wrap a row serializer to leave out empty fields: None, "", False and objects left empty.
+
+    Used by the list endpoints' `compact=true` mode. Clients fill the
+    defaults back in; zero stays, since `age: 0` and `version: 0` mean
+    something.
+    """
+    return lambda doc: _compact(serialize(doc))
+
+
+def flatten(row: dict, prefix: str = "") -> dict:
+    """Flatten nested dicts into dotted column names (actionsTaken.sentHome)."""
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+async def csv_rows(batches, serialize, columns):
+    """Encode batches of documents as CSV with a fixed header, a batch per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    async for batch in batches:
+        for doc in batch:
+            writer.writerow(flatten(serialize(doc)))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzipped(chunks, level: int = 6):
+    """Gzip a byte stream incrementally without buffering the whole body."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(batches, serialize, fmt: str, columns, compress: bool):
+    """Return (body iterator, media type, filename extension) for an export request."""
+    media_type, extension = EXPORT_FORMATS[fmt]
+    if fmt == "csv":
+        body = csv_rows(batches, serialize, columns)
+    else:
+        body = ndjson_lines(batches, serialize)
+    if compress:
+        return gzipped(body), "application/gzip", f"{extension}.gz"
+    return body, media_type, extension
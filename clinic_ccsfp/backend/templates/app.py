@@ -1,28 +1,81 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from backend.routes.auth_routes import router as auth_router
-from backend.routes.appointment_routes import router as appointment_router
+from backend.routes.appointment_routes import router as appointment_router, appointment_change_event
 from backend.routes.users_routes import router as users_router
-from backend.routes.consultation_routes import router as consultation_router
+from backend.routes.consultation_routes import router as consultation_router, consultation_search
+from backend.routes.record_routes import router as record_router
+from backend.routes.analytics_routes import router as analytics_router
+from backend.routes.student_routes import router as student_router
+from backend.routes.import_routes import router as import_router
 from fastapi.middleware.cors import CORSMiddleware
+from backend.database import connection
+from backend.database.async_db import run_db, shutdown_executor
+from backend.database.indexes import ensure_indexes
+from backend.services.events import appointment_events
+from backend.services import passwords
+from backend.services.admission import AdmissionMiddleware
+from backend.services.maintenance import register_jobs
+from backend.services.scheduler import scheduler
+from backend.services.responses import FastJSONResponse
+from backend.services.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, registry
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_db(connection.mongo.connect)
+    # Not run_db: building an index on a large collection can outlast
+    # DB_OPERATION_TIMEOUT, and requests should not start before it is done.
+    await asyncio.to_thread(ensure_indexes)
+    await consultation_search.probe()
+    appointment_events.start("student_appointments", appointment_change_event)
+    register_jobs()
+    scheduler.start()
+    yield
+    scheduler.shutdown()
+    appointment_events.stop()
+    shutdown_executor()
+    passwords.shutdown_executor()
+    connection.mongo.close()
 
+# Responses smaller than this go out uncompressed; below about a kilobyte
+# gzip saves less than the CPU it costs.
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+# 1-9; list JSON compresses almost as well at 5 as at 9, for half the CPU.
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Innermost, so its 429s still get CORS headers and are counted by MetricsMiddleware.
+app.add_middleware(AdmissionMiddleware, routes=[*auth_router.routes, *appointment_router.routes])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
+# Inside MetricsMiddleware, so http_response_size_bytes counts compressed bytes.
+# Server-Sent Events and gzip exports are left alone.
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL)
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail if exc.detail else "An error occurred."},
+        headers=exc.headers,
     )
 
 @app.exception_handler(RequestValidationError)
@@ -43,6 +96,10 @@ app.include_router(auth_router)
 app.include_router(appointment_router)
 app.include_router(users_router)
 app.include_router(consultation_router)
+app.include_router(record_router)
+app.include_router(analytics_router)
+app.include_router(student_router)
+app.include_router(import_router)
 
 if __name__ == "__main__":
     import uvicorn
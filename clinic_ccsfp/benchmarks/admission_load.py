@@ -0,0 +1,220 @@
+"""Load test: staff latency stays flat while students saturate booking.
+
+Every database call on `student_appointments` takes `--delay` seconds, and
+the query pool has `--db-threads` threads, so bookings can saturate it.
+A staff client polls `GET /appointments` throughout three phases:
+
+- idle: staff only;
+- burst without admission control: `--students` clients book and check
+  availability as fast as they can;
+- the same burst with admission control, the public lane capped at half
+  the pool.
+
+Students start over `--ramp` seconds and wait for `Retry-After` (at most
+`--backoff-cap` seconds) when turned away, as the booking page tells them. The script exits non-zero
+if staff p95 with admission control is more than double the idle p95
+(plus a few milliseconds of slack), or if a 429 was slow.
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from backend.database import async_db
+from backend.services.admission import admission
+from backend.services.occupancy import SLOT_TIMES
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, percentile, summarize, use_database
+from benchmarks.seed import seed
+
+SLACK_SECONDS = 0.01
+
+
+class LockedCursor:
+    """A cursor run under the database lock in one go, then read from memory."""
+
+    def __init__(self, database, open_cursor):
+        self._database = database
+        self._open = open_cursor
+        self._calls = []
+        self._items = None
+
+    def _chain(self, name, *args, **kwargs):
+        self._calls.append((name, args, kwargs))
+        return self
+
+    def sort(self, *args, **kwargs):
+        return self._chain("sort", *args, **kwargs)
+
+    def limit(self, *args, **kwargs):
+        return self._chain("limit", *args, **kwargs)
+
+    def batch_size(self, *args, **kwargs):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._items is None:
+            with self._database.lock:
+                cursor = self._open()
+                for name, args, kwargs in self._calls:
+                    cursor = getattr(cursor, name)(*args, **kwargs)
+                self._items = iter(list(cursor))
+        return next(self._items)
+
+
+class SlowCollection:
+    def __init__(self, database, collection, delay):
+        self._database = database
+        self._collection = collection
+        self._delay = delay
+
+    def with_options(self, **kwargs):
+        return SlowCollection(self._database, self._collection.with_options(**kwargs), self._delay)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            # The delay stands in for server time, so calls overlap in it;
+            # the in-memory stand-in itself is not thread-safe.
+            if self._delay:
+                time.sleep(self._delay)
+            if name == "find":
+                return LockedCursor(self._database, lambda: attribute(*args, **kwargs))
+            with self._database.lock:
+                return attribute(*args, **kwargs)
+        return call
+
+
+class SlowDatabase:
+    """Serializes access to the in-memory database and slows one collection down."""
+
+    def __init__(self, database, slow_collection, delay):
+        self._database = database
+        self._slow = slow_collection
+        self._delay = delay
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        return SlowCollection(self, self._database[name], self._delay if name == self._slow else 0)
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+
+def booking(n: int) -> dict:
+    day = date.today() + timedelta(days=1 + n // (len(SLOT_TIMES) * 20) % 365)
+    return {
+        "studentId": f"burst-{n}", "lastName": "Cruz", "firstName": "Ana", "email": "a@b.c",
+        "concern": "Checkup", "nurse": f"RN {n % 20}",
+        "dateTime": f"{day.isoformat()}T{SLOT_TIMES[n % len(SLOT_TIMES)]}", "status": "Pending",
+    }
+
+
+async def student(client, index, numbers, stop, outcomes, rejections, backoff_cap, ramp):
+    rng = random.Random(index)
+    headers = {"X-Forwarded-For": f"10.{index // 250}.{index % 250}.1"}
+    # The clients share the server's event loop here, so starting them all
+    # in the same instant would stall it on client-side work alone.
+    await asyncio.sleep(rng.uniform(0, ramp))
+    while not stop.is_set():
+        n = next(numbers)
+        if n % 2:
+            request = client.post("/appointments", json=booking(n), headers=headers)
+        else:
+            request = client.get("/availability", params={"nurse": f"RN {n % 20}", "from": date.today().isoformat()},
+                                 headers=headers)
+        start = time.perf_counter()
+        response = await request
+        elapsed = time.perf_counter() - start
+        outcomes[response.status_code] += 1
+        if response.status_code == 429:
+            rejections.append(elapsed)
+            wait = min(float(response.headers.get("Retry-After", "1")), backoff_cap)
+            await asyncio.sleep(wait * rng.uniform(0.5, 1.0))
+
+
+async def staff(client, stop, latencies, pause):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/appointments", params={"limit": 20})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(pause)
+
+
+async def phase(students: int, seconds: float, pause: float, backoff_cap: float, ramp: float):
+    stop = asyncio.Event()
+    latencies, rejections, outcomes = [], [], Counter()
+    numbers = itertools.count(random.randrange(10 ** 6) * 1000)
+    async with make_client(app) as staff_client, make_client(app, role=None) as student_client:
+        tasks = [asyncio.create_task(staff(staff_client, stop, latencies, pause))]
+        tasks += [asyncio.create_task(student(student_client, i, numbers, stop, outcomes, rejections, backoff_cap, ramp))
+                  for i in range(students)]
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return latencies, rejections, outcomes
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--delay", type=float, default=0.02, help="Seconds per student_appointments call.")
+    parser.add_argument("--db-threads", type=int, default=8)
+    parser.add_argument("--staff-pause", type=float, default=0.05)
+    parser.add_argument("--backoff-cap", type=float, default=1.0)
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds over which students start.")
+    args = parser.parse_args()
+
+    async_db._executor = ThreadPoolExecutor(max_workers=args.db_threads, thread_name_prefix="mongo")
+    admission.trust_proxy = True
+    admission.lanes["public"].limit = max(1, args.db_threads // 2)
+    admission.lanes["staff"].limit = args.db_threads
+
+    results = {}
+    for index, (name, students, enabled) in enumerate((
+        ("idle", 0, True), ("burst, no admission", args.students, False), ("burst, admission", args.students, True),
+    )):
+        # A fresh database per phase, so bookings made by one phase do not
+        # slow the stand-in down for the next.
+        database = use_database(args.mongo_uri, f"{args.db_name}_{index}")
+        seed(database, 300)
+        async_db.connection.mongo.use(SlowDatabase(database, "student_appointments", args.delay))
+        admission.enabled = enabled
+        admission.reset()
+        results[name] = asyncio.run(phase(students, args.seconds, args.staff_pause, args.backoff_cap, args.ramp))
+
+    for name, (latencies, rejections, outcomes) in results.items():
+        print(summarize(f"staff GET /appointments ({name})", latencies))
+        if outcomes:
+            total = sum(outcomes.values())
+            print(f"{'':<4}students: {total / args.seconds:.0f} req/s, statuses {dict(sorted(outcomes.items()))}")
+        if rejections:
+            print(f"{'':<4}429 responses: p50={percentile(rejections, 50) * 1000:.1f}ms "
+                  f"p95={percentile(rejections, 95) * 1000:.1f}ms")
+
+    idle = percentile(results["idle"][0], 95)
+    admitted = percentile(results["burst, admission"][0], 95)
+    if admitted > 2 * idle + SLACK_SECONDS:
+        raise SystemExit(f"staff p95 rose from {idle * 1000:.1f}ms to {admitted * 1000:.1f}ms under load")
+    rejections = results["burst, admission"][1]
+    if rejections and percentile(rejections, 95) > args.delay:
+        raise SystemExit("429 responses are slower than one database call")
+
+
+if __name__ == "__main__":
+    main()
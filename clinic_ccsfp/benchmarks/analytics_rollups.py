@@ -0,0 +1,76 @@
+"""Benchmark: analytics endpoints read rollups, so history size does not matter.
+
+For each `--sizes` value, seeds that many consultations spread over two
+years and 8 nurses, rebuilds `daily_rollups`, then times each
+/analytics endpoint over the last 30 days and over a full year. The
+endpoint times should stay flat as the consultation count grows.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from backend.services.rollups import rebuild_rollups
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, percentile, use_database
+
+DIAGNOSES = ["Headache", "Fever", "Colds", "Stomach ache", "Sprain", "Asthma", "Allergy", "Toothache"]
+NURSES = [f"RN {name}" for name in ("Rica", "Ana", "Lea", "Joy", "Mae", "Kim", "Liz", "Rose")]
+END = datetime(2025, 12, 31, 8, 0)
+
+
+def seed(database, total):
+    rng = random.Random(total)
+    database["student_consultations"].delete_many({})
+    batch = []
+    for i in range(total):
+        diagnosis = rng.choice(DIAGNOSES)
+        batch.append({
+            "studentId": f"2024-{i:06d}", "nurse": rng.choice(NURSES), "concern": diagnosis,
+            "diagnosis": diagnosis, "dateTime": END - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+            "actionsTaken": {"sentHome": rng.random() < 0.1, "referred": rng.random() < 0.05,
+                             "restedInClinic": rng.random() < 0.5},
+        })
+        if len(batch) == 5000:
+            database["student_consultations"].insert_many(batch)
+            batch = []
+    if batch:
+        database["student_consultations"].insert_many(batch)
+
+
+async def time_endpoints(repeat):
+    ranges = {"30d": "date_from=2025-12-02&date_to=2025-12-31", "1y": "date_from=2025-01-01&date_to=2025-12-31"}
+    results = {}
+    async with make_client(app) as client:
+        for endpoint in ("visits", "diagnoses", "concerns", "actions"):
+            for label, query in ranges.items():
+                latencies = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    response = await client.get(f"/analytics/{endpoint}?{query}")
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                results[f"{endpoint} {label}"] = percentile(latencies, 50)
+    return results
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    table = {}
+    for size in args.sizes:
+        seed(database, size)
+        rebuild_rollups(database)
+        table[size] = asyncio.run(time_endpoints(args.repeat))
+
+    print(f"\n{'p50 (ms)':<18}" + "".join(f"{size:>12}" for size in args.sizes))
+    for name in table[args.sizes[0]]:
+        print(f"{name:<18}" + "".join(f"{table[size][name] * 1000:>12.2f}" for size in args.sizes))
+
+
+if __name__ == "__main__":
+    main()
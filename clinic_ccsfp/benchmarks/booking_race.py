@@ -0,0 +1,61 @@
+"""Concurrency test: many simultaneous bookings for one slot, exactly one wins.
+
+Fires `--requests` concurrent `POST /appointments` for the same nurse and
+time (each from a different student), plus the same number of bookings by a
+single student for different slots on one day. Exits non-zero unless
+exactly one booking succeeds in each case and every loser gets the
+matching 400 message.
+"""
+import asyncio
+from collections import Counter
+
+from backend.database.indexes import ensure_indexes
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, use_database
+
+
+def booking(student_id, date_time, nurse="RN Rica"):
+    return {
+        "studentId": student_id, "lastName": "Cruz", "firstName": "Ana", "email": "a@b.c",
+        "concern": "Checkup", "nurse": nurse, "dateTime": date_time, "status": "Pending",
+    }
+
+
+async def fire(client, payloads):
+    responses = await asyncio.gather(*[client.post("/appointments", json=p) for p in payloads])
+    return Counter((r.status_code, r.json().get("detail", "created")) for r in responses)
+
+
+def check(label, outcome, expected_detail, total):
+    print(f"{label}: {dict(outcome)}")
+    ok = outcome[(200, "created")] == 1 and outcome[(400, expected_detail)] == total - 1
+    if not ok:
+        raise SystemExit(f"{label}: expected exactly one successful booking")
+
+
+async def run(requests):
+    async with make_client(app) as client:
+        same_slot = [booking(f"student-{i}", "2025-06-02_08:00") for i in range(requests)]
+        check("same nurse slot", await fire(client, same_slot),
+              "Time slot already booked for this nurse.", requests)
+
+        nurses = ["RN Rica", "RN Miko", "RN Anna"]
+        same_day = [booking("student-x", f"2025-06-03T{8 + i // 60:02d}:{i % 60:02d}", nurses[i % 3])
+                    for i in range(requests)]
+        check("same student day", await fire(client, same_day),
+              "Student already has an appointment on this date.", requests)
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    database["student_appointments"].drop()
+    ensure_indexes(database)
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark: bulk import vs one POST per row.
+
+Writes `--rows` synthetic consultations (or appointments with `--kind`)
+to a temporary NDJSON file, then times the bulk importer over the whole
+file. For comparison it times the old way, one `POST` per row, over the
+first `--sample` rows and extrapolates. A few rows are deliberately
+invalid so per-row error reporting is part of the measurement.
+
+mongomock checks unique indexes by scanning the collection, so on the
+in-memory stand-in appointments (which have booking indexes) scale
+quadratically; measure them with `--mongo-uri`.
+"""
+import asyncio
+import json
+import random
+import tempfile
+import time
+
+from backend.database.indexes import ensure_indexes
+from backend.services.imports import Importer, read_rows
+from backend.services.occupancy import SLOT_TIMES
+from backend.templates.app import app
+from benchmarks.harness import base_parser, in_memory, make_client, use_database
+from benchmarks.seed import CONCERNS, DIAGNOSES, FIRST_NAMES, LAST_NAMES, START, slot
+
+
+def synthetic_rows(kind, total, nurses=("RN Rica", "RN Miko")):
+    rng = random.Random(total)
+    for i in range(total):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        if kind == "appointments":
+            nurse, date_time = slot(i, list(nurses))
+            row = {"studentId": f"2024-{i % max(100, total // 4):05d}", "lastName": last, "firstName": first,
+                   "concern": rng.choice(CONCERNS), "nurse": nurse,
+                   "dateTime": date_time.strftime("%Y-%m-%d_%H:%M"), "status": "Accepted"}
+        else:
+            row = {"studentId": f"2024-{rng.randrange(total):06d}", "firstName": first, "lastName": last,
+                   "concern": rng.choice(CONCERNS), "diagnosis": rng.choice(DIAGNOSES),
+                   "nurse": rng.choice(nurses), "age": rng.randint(11, 18),
+                   "dateTime": f"{START:%Y-%m-%d}T{rng.choice(SLOT_TIMES)}",
+                   "actionsTaken": {"restedInClinic": rng.random() < 0.5}}
+        if i % 10_000 == 9_999:
+            row["dateTime"] = "not a date"
+        yield row
+
+
+def write_ndjson(kind, total):
+    spool = tempfile.NamedTemporaryFile("w+", suffix=".ndjson", encoding="utf-8")
+    for row in synthetic_rows(kind, total):
+        spool.write(json.dumps(row) + "\n")
+    spool.flush()
+    spool.seek(0)
+    return spool
+
+
+async def per_row(kind, rows):
+    async with make_client(app) as client:
+        start = time.perf_counter()
+        for row in rows:
+            await client.post(f"/{kind}", json=row)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--kind", choices=["consultations", "appointments"], default="consultations")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    collection = {"consultations": "student_consultations", "appointments": "student_appointments"}[args.kind]
+    database[collection].drop()
+    ensure_indexes(database)
+    if in_memory(database):
+        database["student_consultations"].drop_index("consultation_text")
+
+    with write_ndjson(args.kind, args.rows) as spool:
+        start = time.perf_counter()
+        importer = Importer(database, args.kind, batch_size=args.batch_size)
+        importer.start()
+        for batch in importer.batches(read_rows(spool, "ndjson")):
+            importer.write(batch)
+        job = importer.finish()
+        bulk = time.perf_counter() - start
+    print(f"bulk import: {job['inserted']} inserted, {job['failed']} rejected in {bulk:.1f}s "
+          f"({args.rows / bulk:,.0f} rows/s)")
+
+    database[collection].drop()
+    ensure_indexes(database)
+    if in_memory(database):
+        database["student_consultations"].drop_index("consultation_text")
+    sample = list(synthetic_rows(args.kind, args.sample))
+    elapsed = asyncio.run(per_row(args.kind, sample))
+    print(f"one POST per row: {args.sample} rows in {elapsed:.1f}s, "
+          f"~{elapsed / args.sample * args.rows:.0f}s for {args.rows} rows")
+
+
+if __name__ == "__main__":
+    main()
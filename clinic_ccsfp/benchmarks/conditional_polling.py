@@ -0,0 +1,116 @@
+"""Check: an unchanged dashboard poll is answered with 304 and no collection reads.
+
+Seeds appointments, consultations, records and admin users, fetches each
+list once to get its ETag, then polls `--polls` times with If-None-Match.
+Reads on the listed collections are counted by wrapping the collection
+class, so the check works the same on mongomock and a real server. Exits
+non-zero unless every conditional poll is a 304 with zero reads, and a
+write makes the next poll return 200 with a new ETag.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, use_database
+
+LISTS = {
+    "/appointments": "student_appointments",
+    "/consultations": "student_consultations",
+    "/records": "student_records",
+    "/admin-users": "admin_users",
+}
+READ_METHODS = ("find", "find_one", "count_documents", "aggregate", "estimated_document_count")
+
+
+class ReadCounter:
+    """Counts read calls per collection name on the driver's Collection class."""
+
+    def __init__(self, collection_class):
+        self.collection_class = collection_class
+        self.counts = {}
+        self._originals = {}
+
+    def __enter__(self):
+        for method in READ_METHODS:
+            original = getattr(self.collection_class, method)
+            self._originals[method] = original
+
+            def counted(coll, *args, _original=original, **kwargs):
+                self.counts[coll.name] = self.counts.get(coll.name, 0) + 1
+                return _original(coll, *args, **kwargs)
+
+            setattr(self.collection_class, method, counted)
+        return self
+
+    def __exit__(self, *exc):
+        for method, original in self._originals.items():
+            setattr(self.collection_class, method, original)
+
+    def reads(self, name):
+        return self.counts.get(name, 0)
+
+
+def seed(database, rows):
+    start = datetime(2025, 6, 2, 8, 0)
+    people = [{"studentId": f"2024-{i:06d}", "firstName": "Ana", "lastName": "Cruz",
+               "nameTokens": ["ana", "cruz"], "nurse": "RN Rica",
+               "dateTime": start + timedelta(minutes=30 * i)} for i in range(rows)]
+    database["student_appointments"].insert_many(
+        [dict(p, email="a@b.c", concern="Checkup", status="Pending") for p in people])
+    database["student_consultations"].insert_many([dict(p, concern="Headache", age=14) for p in people])
+    database["student_records"].insert_many([dict(p, concern="Checkup", email="a@b.c") for p in people])
+    database["admin_users"].insert_many([
+        {"full_name": f"Nurse {i}", "username": f"nurse{i}", "email": f"nurse{i}@clinic.ph",
+         "password_hash": "x", "status": "Active"} for i in range(20)])
+
+
+async def run(database, polls):
+    failures = []
+    async with make_client(app, role="admin") as client:
+        for path, collection in LISTS.items():
+            first = await client.get(path)
+            etag = first.headers.get("etag")
+            if first.status_code != 200 or not etag:
+                failures.append(f"{path}: first fetch returned {first.status_code} without an ETag")
+                continue
+
+            with ReadCounter(type(database[collection])) as counter:
+                start = time.perf_counter()
+                statuses = [(await client.get(path, headers={"If-None-Match": etag})).status_code
+                            for _ in range(polls)]
+                elapsed = time.perf_counter() - start
+            reads = counter.reads(collection)
+            print(f"{path:<16} body={len(first.content):>8}B  {polls} polls: "
+                  f"304s={statuses.count(304)} reads={reads} avg={elapsed / polls * 1000:.2f}ms")
+            if statuses.count(304) != polls or reads:
+                failures.append(f"{path}: expected {polls} x 304 with no reads on {collection}")
+
+        # A write must invalidate the appointments ETag.
+        etag = (await client.get("/appointments")).headers["etag"]
+        await client.post("/appointments", json={
+            "studentId": "new", "lastName": "Reyes", "firstName": "Jo", "email": "j@r.c",
+            "concern": "Checkup", "nurse": "RN Rica", "dateTime": "2031-01-06T08:00", "status": "Pending",
+        })
+        after = await client.get("/appointments", headers={"If-None-Match": etag})
+        print(f"after a booking: {after.status_code}, ETag changed: {after.headers.get('etag') != etag}")
+        if after.status_code != 200 or after.headers.get("etag") == etag:
+            failures.append("/appointments: a booking did not change the ETag")
+    return failures
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=50)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    seed(database, args.rows)
+    failures = asyncio.run(run(database, args.polls))
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
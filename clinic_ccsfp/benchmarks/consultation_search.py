@@ -0,0 +1,129 @@
+"""Benchmark: GET /consultations/search vs downloading everything and filtering.
+
+Seeds `--total` consultations (100k by default), then times a set of
+queries through the search endpoint: name prefixes, diagnosis words and a
+mixed query. The old approach, where the admin page fetched
+GET /consultations and matched substrings locally, is timed for comparison.
+
+Against mongomock (the default) the search runs on the in-process inverted
+index, so the first query also reports the index build time and its
+tracemalloc footprint. With `--mongo-uri` the collection indexes are
+created first and the search uses the server's text index.
+"""
+import asyncio
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import orjson
+
+from backend.database.indexes import ensure_indexes
+from backend.database.pagination import name_tokens
+from backend.routes.consultation_routes import consultation_search
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, percentile, summarize, use_database
+
+FIRST = ["Maria", "Mario", "Mark", "Ana", "Andrea", "Juan", "Jose", "Kristine", "Paolo", "Liza", "Ramon", "Bea"]
+LAST = ["Santos", "Reyes", "Cruz", "Bautista", "Ocampo", "Garcia", "Mendoza", "Torres", "Marquez", "Villanueva"]
+DIAGNOSES = ["Migraine", "Tension headache", "Influenza", "Common colds", "Gastritis", "Ankle sprain",
+             "Asthma attack", "Allergic rhinitis", "Dysmenorrhea", "Toothache"]
+CONCERNS = ["Headache since morning", "Fever and chills", "Cough and colds", "Stomach ache after lunch",
+            "Twisted ankle in PE class", "Difficulty breathing", "Itchy eyes", "Dizziness"]
+QUERIES = ["mar", "santos", "gastritis", "fever", "maria migraine", "ankle sprain", "kris"]
+
+
+def seed(database, total):
+    rng = random.Random(total)
+    collection = database["student_consultations"]
+    collection.delete_many({})
+    start = datetime(2025, 12, 31, 8, 0)
+    batch = []
+    for i in range(total):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        batch.append({
+            "studentId": f"2024-{i:06d}", "firstName": first, "lastName": last,
+            "nameTokens": name_tokens(first, last),
+            "concern": rng.choice(CONCERNS), "diagnosis": rng.choice(DIAGNOSES),
+            "assessment": "Vital signs within normal range, patient alert",
+            "recommendations": "Rest and hydrate, return if symptoms persist",
+            "dateTime": start - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+        })
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def client_side_filter(rows, query):
+    needle = query.lower()
+    return [row for row in rows if needle in " ".join(
+        str(row.get(field) or "") for field in ("firstName", "lastName", "concern", "diagnosis", "assessment")
+    ).lower()]
+
+
+async def run(args):
+    async with make_client(app) as client:
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = await client.get("/consultations/search", params={"q": QUERIES[0]})
+        response.raise_for_status()
+        first = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        path = "text index" if consultation_search._text_available else "in-process index"
+        print(f"search path: {path}")
+        print(f"first query (includes any index build): {first * 1000:.0f}ms, "
+              f"peak traced memory {peak / 2**20:.1f} MiB, {len(consultation_search.index)} docs indexed")
+
+        for query in QUERIES:
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = await client.get("/consultations/search", params={"q": query, "limit": 50})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            total = response.json()["total"]
+            print(summarize(f"search {query!r} ({total} hits)", latencies))
+
+        # Ranking alone, without the HTTP round trip and the `_id $in` fetch of
+        # the page (which mongomock answers with a collection scan).
+        for query in QUERIES:
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await consultation_search.search(query)
+                latencies.append(time.perf_counter() - start)
+            print(summarize(f"rank {query!r}", latencies))
+
+        latencies = []
+        for _ in range(args.baseline_repeat):
+            start = time.perf_counter()
+            response = await client.get("/consultations")
+            rows = orjson.loads(response.content)
+            client_side_filter(rows, QUERIES[0])
+            latencies.append(time.perf_counter() - start)
+        print(summarize("download all + filter", latencies))
+        return latencies
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--total", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--baseline-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    if args.mongo_uri:
+        ensure_indexes(database)
+    start = time.perf_counter()
+    seed(database, args.total)
+    print(f"seeded {args.total} consultations in {time.perf_counter() - start:.1f}s")
+    baseline = asyncio.run(run(args))
+    print(f"\nold approach p50 {percentile(baseline, 50) * 1000:.0f}ms per keystroke")
+
+
+if __name__ == "__main__":
+    main()
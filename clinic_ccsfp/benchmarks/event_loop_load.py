@@ -0,0 +1,88 @@
+"""Load test: slow consultation scans must not stall unrelated requests.
+
+Every `find()` on `student_consultations` is made artificially slow. While a
+burst of `GET /consultations` is in flight we time `GET /appointments`,
+first with database calls run inline on the event loop (the old behaviour)
+and then through the async data layer's executor. The script exits non-zero
+if fast requests still queue behind the slow ones.
+"""
+import asyncio
+import time
+
+from backend.database import async_db
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, percentile, summarize, use_database
+
+
+class SlowCollection:
+    def __init__(self, collection, delay):
+        self._collection = collection
+        self._delay = delay
+
+    def find(self, *args, **kwargs):
+        time.sleep(self._delay)
+        return self._collection.find(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class SlowDatabase:
+    def __init__(self, database, slow_collection, delay):
+        self._database = database
+        self._slow = slow_collection
+        self._delay = delay
+
+    def __getitem__(self, name):
+        collection = self._database[name]
+        if name == self._slow:
+            return SlowCollection(collection, self._delay)
+        return collection
+
+
+async def _inline_run_db(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def scenario(slow_requests: int, fast_requests: int):
+    async with make_client(app) as client:
+        issued = time.perf_counter()
+        slow = [asyncio.create_task(client.get("/consultations")) for _ in range(slow_requests)]
+        fast = [asyncio.create_task(client.get("/appointments")) for _ in range(fast_requests)]
+        latencies = []
+        for task in asyncio.as_completed(fast):
+            await task
+            latencies.append(time.perf_counter() - issued)
+        await asyncio.gather(*slow)
+    return latencies
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds per slow find().")
+    parser.add_argument("--slow", type=int, default=20)
+    parser.add_argument("--fast", type=int, default=50)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    database["student_appointments"].insert_one({
+        "studentId": "s1", "lastName": "Cruz", "firstName": "Ana", "email": "a@b.c",
+        "concern": "Checkup", "nurse": "RN Rica", "dateTime": "2025-06-02T08:00", "status": "Pending",
+    })
+    async_db.connection.mongo.use(SlowDatabase(database, "student_consultations", args.delay))
+
+    original = async_db.run_db
+    async_db.run_db = _inline_run_db
+    blocking = asyncio.run(scenario(args.slow, args.fast))
+    async_db.run_db = original
+    offloaded = asyncio.run(scenario(args.slow, args.fast))
+
+    print(summarize("GET /appointments (inline)", blocking))
+    print(summarize("GET /appointments (executor)", offloaded))
+
+    if percentile(offloaded, 95) >= args.delay:
+        raise SystemExit("fast requests are still queueing behind slow scans")
+
+
+if __name__ == "__main__":
+    main()
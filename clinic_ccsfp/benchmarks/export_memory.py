@@ -0,0 +1,69 @@
+"""Memory test: exporting 500k consultations must run in constant memory.
+
+The consultations list handle is replaced by a generator that fabricates
+documents batch by batch, so the only thing that could grow with row count
+is the export pipeline itself. Each format (NDJSON, CSV, gzipped NDJSON)
+is drained chunk by chunk and the tracemalloc peak is compared against
+`--ceiling-mb`.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from backend.routes import consultation_routes
+from benchmarks.consultation_serialization import synthetic_consultations
+
+
+class SyntheticConsultations:
+    def __init__(self, total):
+        self.total = total
+        self.template = synthetic_consultations(1)[0]
+
+    async def iter_batches(self, *args, batch_size=1000, **kwargs):
+        produced = 0
+        while produced < self.total:
+            size = min(batch_size, self.total - produced)
+            yield [dict(self.template, studentId=f"2024-{produced + i:06d}") for i in range(size)]
+            produced += size
+
+
+async def drain(fmt, gzip):
+    response = await consultation_routes.export_consultations(
+        format=fmt, gzip=gzip, name=None, nurse=None, date_from=None, date_to=None,
+    )
+    total_bytes = 0
+    async for chunk in response.body_iterator:
+        total_bytes += len(chunk)
+    return total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--ceiling-mb", type=float, default=32.0)
+    args = parser.parse_args()
+
+    # The export reads through the listing handle (see list_collections).
+    consultation_routes.consultation_lists = SyntheticConsultations(args.rows)
+    failed = False
+    for fmt, gzip in [("ndjson", False), ("csv", False), ("ndjson", True)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        total_bytes = asyncio.run(drain(fmt, gzip))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        peak_mb = peak / 1024 / 1024
+        label = f"{fmt}{' + gzip' if gzip else ''}"
+        print(f"{label:<14} rows={args.rows} out={total_bytes / 1024 / 1024:8.1f}MB "
+              f"peak={peak_mb:6.1f}MB time={elapsed:6.1f}s")
+        failed = failed or peak_mb > args.ceiling_mb
+
+    if failed:
+        raise SystemExit(f"export peak memory exceeded {args.ceiling_mb}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Shared helpers for the benchmark and load scripts.
+
+Scripts are run from the `clinic_ccsfp` directory, e.g.
+
+    python -m benchmarks.event_loop_load
+
+By default they use an in-memory mongomock database so they can run without
+a mongod; pass `--mongo-uri` to run against a real server instead.
+"""
+import argparse
+import logging
+import time
+
+import httpx
+
+from backend.database import connection
+from backend.services.admission import admission
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Benchmarks measure the endpoints, not the rate limits in front of them.
+# benchmarks.admission_load turns admission control back on.
+admission.enabled = False
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--mongo-uri", default=None,
+                        help="Run against this MongoDB instead of an in-memory stand-in.")
+    parser.add_argument("--db-name", default="clinic_bench")
+    return parser
+
+
+def use_database(mongo_uri=None, db_name="clinic_bench"):
+    """Point the app's database handle at a benchmark database and return it."""
+    if mongo_uri:
+        from pymongo import MongoClient
+        database = MongoClient(mongo_uri)[db_name]
+    else:
+        import mongomock
+        database = mongomock.MongoClient()[db_name]
+    connection.mongo.use(database)
+    return database
+
+
+def in_memory(database) -> bool:
+    """True for the mongomock stand-in `use_database` returns without a URI."""
+    return type(database).__module__.startswith("mongomock")
+
+
+def make_client(app, role="staff", base_url=None) -> httpx.AsyncClient:
+    """An in-process client for `app`, logged in as `role` unless role is None.
+
+    With `base_url` the client talks to a running server instead; it must
+    share this process's SESSION_SECRET for the token to be accepted.
+    """
+    headers = {}
+    if role:
+        from backend.services.sessions import issue_token
+        headers["Authorization"] = f"Bearer {issue_token('bench', role)['token']}"
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers)
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    response = await coro
+    return response, time.perf_counter() - start
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, latencies) -> str:
+    return (f"{name:<32} n={len(latencies):<6} "
+            f"p50={percentile(latencies, 50) * 1000:8.1f}ms "
+            f"p95={percentile(latencies, 95) * 1000:8.1f}ms "
+            f"p99={percentile(latencies, 99) * 1000:8.1f}ms")
@@ -0,0 +1,123 @@
+"""Benchmark: staff logins at shift change, password every time vs session tokens.
+
+`--nurses` staff each open the dashboard `--visits` times at once. Before,
+every visit posted the password to /login and paid a bcrypt verification on
+FastAPI's shared threadpool. Now the first visit logs in (bcrypt on its own
+bounded pool) and later visits only check the session token with GET
+/session.
+
+While the logins run, `--probes` requests hit a cheap synchronous `def`
+route to show how much the login burst delays unrelated traffic.
+"""
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+from backend.database import connection
+from backend.services.passwords import pwd_context
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, summarize, use_database
+
+PASSWORD = "correct horse battery"
+
+
+def legacy_login(user: dict):
+    """The /login route as it was: a `def` route verifying bcrypt inline."""
+    db_user = connection.db["admin_users"].find_one({"username": user["username"]})
+    if not db_user or not pwd_context.verify(user["password"], db_user["password_hash"]):
+        raise HTTPException(400, "Invalid username or password")
+    return {"message": "Login successful", "role": "staff"}
+
+
+def sync_probe():
+    """Stands in for any `def` route sharing FastAPI's threadpool."""
+    return {"ok": True}
+
+
+app.add_api_route("/bench/legacy-login", legacy_login, methods=["POST"])
+app.add_api_route("/bench/sync-probe", sync_probe, methods=["GET"])
+
+
+def seed(database, nurses, rounds):
+    password_hash = pwd_context.handler("bcrypt").using(rounds=rounds).hash(PASSWORD)
+    database["admin_users"].delete_many({})
+    database["admin_users"].insert_many([
+        {"full_name": f"Nurse {i}", "username": f"nurse{i}", "email": f"nurse{i}@clinic.ph",
+         "password_hash": password_hash, "status": "Active"}
+        for i in range(nurses)
+    ])
+
+
+async def timed_request(call):
+    start = time.perf_counter()
+    response = await call
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def nurse_with_password(client, i, visits):
+    body = {"username": f"nurse{i}", "password": PASSWORD}
+    return [await timed_request(client.post("/bench/legacy-login", json=body)) for _ in range(visits)]
+
+
+async def nurse_with_session(client, i, visits):
+    body = {"username": f"nurse{i}", "password": PASSWORD}
+    start = time.perf_counter()
+    response = await client.post("/login", json=body)
+    response.raise_for_status()
+    latencies = [time.perf_counter() - start]
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    for _ in range(visits - 1):
+        latencies.append(await timed_request(client.get("/session", headers=headers)))
+    return latencies
+
+
+async def probe(client, count, stop):
+    latencies = []
+    for _ in range(count):
+        if stop.is_set():
+            break
+        latencies.append(await timed_request(client.get("/bench/sync-probe")))
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def scenario(label, nurse, nurses, visits, probes):
+    async with make_client(app, role=None) as client:
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, probes, stop))
+        start = time.perf_counter()
+        per_nurse = await asyncio.gather(*[nurse(client, i, visits) for i in range(nurses)])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        probe_latencies = await probe_task
+
+    latencies = [value for values in per_nurse for value in values]
+    print(f"{label}: {len(latencies)} dashboard opens in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.1f}/s)")
+    print("  " + summarize("dashboard open", latencies))
+    print("  " + summarize("other requests meanwhile", probe_latencies))
+    return elapsed
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--nurses", type=int, default=30)
+    parser.add_argument("--visits", type=int, default=3)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor for the seeded users.")
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    seed(database, args.nurses, args.rounds)
+
+    before = asyncio.run(scenario("password on every visit", nurse_with_password,
+                                  args.nurses, args.visits, args.probes))
+    after = asyncio.run(scenario("login once, then session", nurse_with_session,
+                                 args.nurses, args.visits, args.probes))
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
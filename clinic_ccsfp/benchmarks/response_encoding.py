@@ -0,0 +1,99 @@
+"""Benchmark: bytes on the wire and encoding CPU for the large list endpoints.
+
+Seeds `--records` appointments and consultations (`benchmarks.seed`) and,
+for each list endpoint's serializer, compares over all rows:
+
+- encode time with FastAPI's default path (`jsonable_encoder` + `json.dumps`,
+  as `JSONResponse` did) against orjson, plain and with `compact=true`;
+- body size plain, compact, gzipped (GZIP_LEVEL) and both.
+
+Finally `GET /consultations` is fetched through the app with and without
+`Accept-Encoding: gzip` and `compact=true` to confirm what the middleware
+actually sends.
+"""
+import asyncio
+import gzip
+import json
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from backend.routes.appointment_routes import appointment_table
+from backend.routes.consultation_routes import CONSULTATION_PROJECTION, consultation_table
+from backend.routes.record_routes import record_table
+from backend.services.streaming import compact
+from backend.templates.app import GZIP_LEVEL, app
+from benchmarks.harness import base_parser, make_client, use_database
+from benchmarks.seed import seed
+
+ENDPOINTS = [
+    ("GET /consultations", "student_consultations", consultation_table, CONSULTATION_PROJECTION),
+    ("GET /appointments", "student_appointments", appointment_table, None),
+    ("GET /records", "student_records", record_table, None),
+]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def encode_default(docs, serialize):
+    return json.dumps(jsonable_encoder([serialize(d) for d in docs])).encode()
+
+
+def encode_orjson(docs, serialize):
+    return orjson.dumps([serialize(d) for d in docs])
+
+
+async def over_http(records):
+    results = []
+    async with make_client(app) as client:
+        for compact_mode in (False, True):
+            for encoding in ("identity", "gzip"):
+                url = "/consultations" + ("?compact=true" if compact_mode else "")
+                start = time.perf_counter()
+                response = await client.get(url, headers={"Accept-Encoding": encoding})
+                elapsed = time.perf_counter() - start
+                rows = len(response.json())
+                results.append((compact_mode, encoding, response.num_bytes_downloaded,
+                                response.headers.get("content-encoding", "-"), rows, elapsed))
+    return results
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    seed(database, args.records)
+
+    print(f"{'endpoint':<20}{'rows':>7}{'default ms':>12}{'orjson ms':>11}{'compact ms':>12}"
+          f"{'plain KB':>10}{'compact KB':>12}{'gzip KB':>9}{'both KB':>9}")
+    for name, collection, serialize, projection in ENDPOINTS:
+        docs = list(database[collection].find({}, projection))
+        default_time, default_body = best_of(lambda: encode_default(docs, serialize), args.repeat)
+        orjson_time, plain = best_of(lambda: encode_orjson(docs, serialize), args.repeat)
+        compact_time, small = best_of(lambda: encode_orjson(docs, compact(serialize)), args.repeat)
+        if orjson.loads(default_body) != orjson.loads(plain):
+            raise SystemExit(f"{name}: default and orjson bodies differ")
+        print(f"{name:<20}{len(docs):>7}{default_time * 1000:>12.1f}{orjson_time * 1000:>11.1f}"
+              f"{compact_time * 1000:>12.1f}{len(plain) / 1024:>10.0f}{len(small) / 1024:>12.0f}"
+              f"{len(gzip.compress(plain, GZIP_LEVEL)) / 1024:>9.0f}"
+              f"{len(gzip.compress(small, GZIP_LEVEL)) / 1024:>9.0f}")
+
+    print(f"\nGET /consultations through the app ({args.records} rows)")
+    print(f"{'compact':<9}{'accept':<10}{'wire KB':>9}{'encoding':>10}{'rows':>7}{'ms':>9}")
+    for compact_mode, encoding, size, sent, rows, elapsed in asyncio.run(over_http(args.records)):
+        print(f"{str(compact_mode):<9}{encoding:<10}{size / 1024:>9.0f}{sent:>10}{rows:>7}{elapsed * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Synthetic clinic data for the benchmark suite.
+
+Appointments take their fields and nurses from `appointments.json` and are
+stored the way `POST /appointments` stores them: parsed `dateTime`,
+`nameTokens` and the booking keys, with no two holding the same nurse slot
+or the same student day. Records are the copies accepted appointments
+get, consultations carry the full edit form, and admin users share one
+pre-computed password hash.
+
+    python -m benchmarks.seed --scale 10000 --mongo-uri mongodb://localhost:27017
+"""
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from backend.database.indexes import ensure_indexes
+from backend.database.pagination import name_tokens
+from backend.routes.record_routes import record_from_appointment
+from backend.services.appointments import booking_keys
+from backend.services.occupancy import SLOT_TIMES
+from backend.services.passwords import pwd_context
+from backend.services.rollups import rebuild_rollups
+from benchmarks.harness import base_parser, in_memory, use_database
+
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "appointments.json"
+START = datetime(2025, 1, 6)
+BATCH_SIZE = 5000
+PASSWORD = "bench-password"
+
+FIRST_NAMES = ["Maria", "Mario", "Mark", "Ana", "Andrea", "Juan", "Jose", "Kristine", "Paolo", "Liza",
+               "Ramon", "Bea", "Carlo", "Jasmine", "Miguel", "Patricia", "Renz", "Sofia"]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Ocampo", "Garcia", "Mendoza", "Torres",
+              "Marquez", "Villanueva", "Sarmiento", "Dela Cruz", "Aquino", "Ramos"]
+CONCERNS = ["Headache", "Fever", "Cough and colds", "Stomach ache", "Sprained ankle", "Difficulty breathing",
+            "Toothache", "Dizziness", "Checkup", "Allergy"]
+DIAGNOSES = ["Migraine", "Tension headache", "Influenza", "Common colds", "Gastritis", "Ankle sprain",
+             "Asthma attack", "Allergic rhinitis", "Dysmenorrhea", "Toothache"]
+STATUSES = ["Pending"] * 6 + ["Accepted"] * 3 + ["Rejected"]
+SEEDED_COLLECTIONS = ("student_appointments", "student_consultations", "student_records", "admin_users")
+
+
+@dataclass
+class Dataset:
+    """What was seeded, for building requests that hit real data."""
+    scale: int
+    nurses: list
+    student_ids: list = field(default_factory=list)
+    first_day: str = ""
+    last_day: str = ""
+    admin_usernames: list = field(default_factory=list)
+    counts: dict = field(default_factory=dict)
+
+
+def load_template(path=TEMPLATE_PATH):
+    """Field names and nurses of the appointment requests in `appointments.json`."""
+    with open(path, encoding="utf-8") as f:
+        rows = json.load(f)
+    fields = [name for name in rows[0] if name != "id"]
+    nurses = sorted({row["nurse"] for row in rows if row.get("nurse")})
+    return fields, nurses
+
+
+def slot(index, nurses):
+    """The index-th (nurse, dateTime) slot, filling each day before the next."""
+    per_day = len(nurses) * len(SLOT_TIMES)
+    day = START + timedelta(days=index // per_day)
+    nurse = nurses[index % len(nurses)]
+    hour, minute = SLOT_TIMES[(index // len(nurses)) % len(SLOT_TIMES)].split(":")
+    return nurse, day.replace(hour=int(hour), minute=int(minute))
+
+
+def _insert(collection, docs):
+    for start in range(0, len(docs), BATCH_SIZE):
+        collection.insert_many(docs[start:start + BATCH_SIZE], ordered=False)
+
+
+def make_appointments(rng, fields, nurses, students, total):
+    docs = []
+    for i in range(total):
+        nurse, date_time = slot(i, nurses)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        status = rng.choice(STATUSES)
+        values = {
+            # A student is booked at most once per day: a day has fewer
+            # slots than there are students.
+            "studentId": students[i % len(students)], "lastName": last, "firstName": first,
+            "concern": rng.choice(CONCERNS), "nurse": nurse, "dateTime": date_time, "status": status,
+        }
+        doc = {name: values[name] for name in fields}
+        doc["email"] = f"{first}.{last}@clinic.ph".lower().replace(" ", "")
+        doc["nameTokens"] = name_tokens(first, last)
+        doc.update(booking_keys(status, date_time))
+        docs.append(doc)
+    return docs
+
+
+def make_consultations(rng, nurses, students, total, span_days):
+    docs = []
+    for _ in range(total):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        diagnosis = rng.choice(DIAGNOSES)
+        nurse = rng.choice(nurses)
+        docs.append({
+            "studentId": rng.choice(students), "firstName": first, "middleInitial": rng.choice("ABCDEFG"),
+            "lastName": last, "age": rng.randint(11, 18), "gender": rng.choice(["Male", "Female"]),
+            "gradeSection": f"Grade {rng.randint(7, 12)} - {rng.choice(['Rizal', 'Mabini', 'Luna'])}",
+            "dateOfBirth": "2010-05-14", "address": "Quezon City", "parentGuardian": "Parent",
+            "contactNumber": "09170000000", "concern": rng.choice(CONCERNS), "nurse": nurse,
+            "dateTime": START + timedelta(minutes=rng.randrange(span_days * 24 * 60)),
+            "temperature": f"{rng.uniform(36.0, 39.0):.1f}", "pulseRate": str(rng.randint(60, 110)),
+            "bloodPressure": f"{rng.randint(100, 130)}/{rng.randint(60, 85)}",
+            "respiratoryRate": str(rng.randint(12, 24)), "assessment": "Alert and oriented",
+            "diagnosis": diagnosis,
+            "actionsTaken": {
+                "restedInClinic": rng.random() < 0.5, "givenFirstAid": rng.random() < 0.2,
+                "administeredMedication": rng.random() < 0.3, "medicationDetails": "",
+                "sentHome": rng.random() < 0.1, "referred": rng.random() < 0.05, "referredTo": "",
+                "others": False, "othersDetails": "",
+            },
+            "recommendations": "Rest and hydrate", "nurseName": nurse, "nurseSignature": "",
+            "nurseDate": "", "nameTokens": name_tokens(first, last), "version": 1,
+        })
+    return docs
+
+
+def make_admin_users(total):
+    password_hash = pwd_context.hash(PASSWORD)
+    return [{
+        "full_name": f"Staff {i}", "username": f"staff{i:04d}", "email": f"staff{i:04d}@clinic.ph",
+        "password_hash": password_hash, "status": "Approved" if i % 10 else "Pending",
+    } for i in range(total)]
+
+
+def seed(database, scale: int, template_path=TEMPLATE_PATH, seed_value: int = 0) -> Dataset:
+    """Replace the four collections with `scale` appointments and consultations,
+    a record per accepted appointment and `scale / 500` admin users (at least 20).
+    """
+    rng = random.Random(seed_value or scale)
+    fields, nurses = load_template(template_path)
+    students = [f"2024-{i:05d}" for i in range(max(100, scale // 4))]
+
+    for name in SEEDED_COLLECTIONS:
+        database[name].drop()
+
+    appointments = make_appointments(rng, fields, nurses, students, scale)
+    _insert(database["student_appointments"], appointments)
+    records = [record_from_appointment(a) for a in appointments if a["status"] == "Accepted"]
+    _insert(database["student_records"], records)
+    last_day = slot(max(scale - 1, 0), nurses)[1]
+    span_days = max(1, (last_day - START).days + 1)
+    _insert(database["student_consultations"], make_consultations(rng, nurses, students, scale, span_days))
+    users = make_admin_users(max(20, scale // 500))
+    _insert(database["admin_users"], users)
+    # Indexes are built once over the loaded data, which is much faster
+    # than maintaining them insert by insert.
+    ensure_indexes(database)
+    if in_memory(database):
+        # mongomock cannot answer $text queries; without the index, search
+        # uses its in-process fallback as it would on such a server.
+        database["student_consultations"].drop_index("consultation_text")
+    rebuild_rollups(database)
+    # Let caches, ETags and the search index see the new data.
+    for name in SEEDED_COLLECTIONS:
+        database["collection_versions"].update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+    return Dataset(
+        scale=scale, nurses=nurses, student_ids=students,
+        first_day=START.strftime("%Y-%m-%d"), last_day=last_day.strftime("%Y-%m-%d"),
+        admin_usernames=[u["username"] for u in users],
+        counts={"appointments": len(appointments), "consultations": scale, "records": len(records),
+                "admin_users": len(users)},
+    )
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--scale", type=int, default=10_000)
+    args = parser.parse_args()
+    dataset = seed(use_database(args.mongo_uri, args.db_name), args.scale)
+    print(f"seeded {dataset.counts} from {dataset.first_day} to {dataset.last_day}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Performance suite: latency and throughput per endpoint at several data sizes.
+
+For each `--scales` value the four main collections are reseeded
+(`benchmarks.seed`) and every scenario below is driven with `--requests`
+requests from `--concurrency` concurrent clients (one against the
+in-memory stand-in), in-process by default or against a running server
+with `--base-url`. Each scenario reports p50, p95, p99 and requests per
+second.
+
+`--save-baseline results.json` keeps the numbers. A later run with
+`--baseline results.json` exits non-zero when a scenario's p95 grows, or its
+throughput shrinks, by more than `--max-regression` (25% by default), or
+when any request fails. Compare runs from the same machine only.
+
+    python -m benchmarks.suite --scales 1000 10000 --save-baseline baseline.json
+    python -m benchmarks.suite --scales 1000 10000 --baseline baseline.json
+"""
+import asyncio
+import itertools
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from backend.templates.app import app
+from benchmarks.harness import base_parser, in_memory, make_client, percentile, use_database
+from benchmarks.seed import FIRST_NAMES, seed, slot
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # (dataset, request number) -> URL, so requests can vary their target.
+    url: Callable
+    role: Optional[str] = "staff"
+    body: Optional[Callable] = None
+    # Share of --requests to send; full-collection reads are much slower.
+    weight: float = 1.0
+
+
+def _day(dataset, offset):
+    return (datetime.strptime(dataset.first_day, "%Y-%m-%d") + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+def _booking(dataset, n):
+    # Slots after the seeded ones, so every booking succeeds.
+    nurse, date_time = slot(dataset.counts["appointments"] + n, dataset.nurses)
+    return {
+        "studentId": dataset.student_ids[n % len(dataset.student_ids)], "lastName": "Cruz",
+        "firstName": FIRST_NAMES[n % len(FIRST_NAMES)], "email": "bench@clinic.ph", "concern": "Checkup",
+        "nurse": nurse, "dateTime": date_time.strftime("%Y-%m-%dT%H:%M"), "status": "Pending",
+    }
+
+
+SCENARIOS = [
+    Scenario("GET /appointments", "GET", lambda d, n: "/appointments?status=Pending&limit=50"),
+    Scenario("GET /appointments?name", "GET",
+             lambda d, n: f"/appointments?name={FIRST_NAMES[n % len(FIRST_NAMES)][:3]}&limit=50"),
+    Scenario("GET /records", "GET", lambda d, n: "/records?limit=50"),
+    Scenario("GET /availability", "GET",
+             lambda d, n: f"/availability?nurse={d.nurses[n % len(d.nurses)]}&from={_day(d, n % 30)}"
+                          f"&to={_day(d, n % 30 + 6)}"),
+    Scenario("GET /students/history", "GET",
+             lambda d, n: f"/students/{d.student_ids[n % len(d.student_ids)]}/history"),
+    Scenario("GET /consultations/search", "GET",
+             lambda d, n: f"/consultations/search?q={FIRST_NAMES[n % len(FIRST_NAMES)].lower()}&limit=50"),
+    Scenario("GET /analytics/visits", "GET",
+             lambda d, n: f"/analytics/visits?date_from={_day(d, 0)}&date_to={_day(d, 29)}"),
+    Scenario("GET /admin-users", "GET", lambda d, n: "/admin-users", role="admin"),
+    Scenario("POST /appointments", "POST", lambda d, n: "/appointments", body=_booking),
+    Scenario("GET /consultations", "GET", lambda d, n: "/consultations", weight=0.05),
+]
+
+
+def summarize(latencies, errors, elapsed) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+async def drive(client, scenario, dataset, requests, concurrency, numbers) -> dict:
+    latencies, errors = [], 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            n = next(numbers)
+            kwargs = {"json": scenario.body(dataset, n)} if scenario.body else {}
+            start = time.perf_counter()
+            response = await client.request(scenario.method, scenario.url(dataset, n), **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_scale(dataset, args) -> dict:
+    results = {}
+    clients = {}
+    numbers = itertools.count()
+    try:
+        for scenario in SCENARIOS:
+            if scenario.role not in clients:
+                clients[scenario.role] = make_client(app, role=scenario.role, base_url=args.base_url)
+            client = clients[scenario.role]
+            # One untimed request so first-use work (index loads, caches) is not counted.
+            await client.request(scenario.method, scenario.url(dataset, next(numbers)),
+                                 **({"json": scenario.body(dataset, next(numbers))} if scenario.body else {}))
+            requests = max(args.concurrency, int(args.requests * scenario.weight))
+            results[scenario.name] = await drive(client, scenario, dataset, requests, args.concurrency, numbers)
+    finally:
+        for client in clients.values():
+            await client.aclose()
+    return results
+
+
+def print_table(scale, results):
+    print(f"\n{scale} documents per collection")
+    print(f"{'scenario':<28}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, r in results.items():
+        print(f"{name:<28}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['p99_ms']:>10.1f}{r['rps']:>10.1f}")
+
+
+def regressions(results, baseline, max_regression, min_delta_ms) -> list:
+    """Human-readable failures of `results` against `baseline`."""
+    failures = []
+    for scale, scenarios in results.items():
+        for name, r in scenarios.items():
+            if r["errors"]:
+                failures.append(f"{scale} {name}: {r['errors']} failed requests")
+            before = baseline.get(scale, {}).get(name)
+            if not before:
+                continue
+            p95_limit = max(before["p95_ms"] * (1 + max_regression), before["p95_ms"] + min_delta_ms)
+            if r["p95_ms"] > p95_limit:
+                failures.append(f"{scale} {name}: p95 {r['p95_ms']:.1f}ms, baseline {before['p95_ms']:.1f}ms")
+            if r["rps"] < before["rps"] / (1 + max_regression):
+                failures.append(f"{scale} {name}: {r['rps']:.1f} req/s, baseline {before['rps']:.1f} req/s")
+    return failures
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", default=None,
+                        help="Drive a running server (sharing --mongo-uri and SESSION_SECRET) instead of the app in-process.")
+    parser.add_argument("--baseline", default=None, help="Fail on regressions against this results file.")
+    parser.add_argument("--save-baseline", default=None, help="Write this run's results here.")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Ignore p95 growth smaller than this, which is timer noise.")
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    if in_memory(database) and not args.base_url and args.concurrency > 1:
+        # mongomock is not thread-safe (it edits projection dicts in place),
+        # and the routes call it from several executor threads at once.
+        print("in-memory database: running with --concurrency 1; use --mongo-uri for concurrent load")
+        args.concurrency = 1
+    results = {}
+    for scale in args.scales:
+        start = time.perf_counter()
+        dataset = seed(database, scale)
+        print(f"seeded {dataset.counts} in {time.perf_counter() - start:.1f}s")
+        results[str(scale)] = asyncio.run(run_scale(dataset, args))
+        print_table(scale, results[str(scale)])
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.save_baseline}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = regressions(results, baseline, args.max_regression, args.min_delta_ms)
+    if failures:
+        raise SystemExit("Performance regressions:\n  " + "\n  ".join(failures))
+    print("\nno regressions" if args.baseline else "\nno baseline given; nothing compared")
+
+
+if __name__ == "__main__":
+    main()
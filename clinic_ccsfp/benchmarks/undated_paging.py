@@ -0,0 +1,107 @@
+"""Paging check: lists with undated rows return every row exactly once.
+
+Seeds appointments and records where some rows have a null `dateTime`, some
+have none at all and the rest share a handful of dates, plus an archived
+term of records. Then pages `GET /appointments` and `GET /records` (with and
+without `include_archived`) in both sort orders, `--limit` rows at a time.
+Exits non-zero unless each listing returns every matching row once, in
+order, with nulls first ascending and last descending.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from bson import ObjectId
+
+from backend.templates.app import app
+from benchmarks.harness import base_parser, make_client, use_database
+
+ARCHIVE = "student_records_archive_2024_06"
+
+
+def rows(count, offset=0):
+    """`count` rows: a third with dateTime null, a third without one, the rest on five dates."""
+    docs = []
+    for i in range(offset, offset + count):
+        doc = {"_id": ObjectId(), "studentId": f"s{i}", "lastName": "Cruz", "firstName": "Ana",
+               "email": "a@b.c", "concern": "Checkup", "nurse": "RN Rica", "status": "Pending"}
+        if i % 3 == 0:
+            doc["dateTime"] = None
+        elif i % 3 == 1:
+            doc["dateTime"] = datetime(2025, 6, 2, 8) + timedelta(days=i % 5)
+        docs.append(doc)
+    return docs
+
+
+def seed(database, count):
+    for name in ("student_appointments", "student_records", ARCHIVE, "archive_terms"):
+        database[name].drop()
+    appointments = rows(count)
+    records = rows(count)
+    archived = [{**doc, "_id": ObjectId(), "dateTime": datetime(2024, 7, 1) + timedelta(days=i % 3)}
+                for i, doc in enumerate(rows(count // 2, offset=count))]
+    database["student_appointments"].insert_many(appointments)
+    database["student_records"].insert_many(records)
+    database[ARCHIVE].insert_many(archived)
+    database["archive_terms"].insert_one({
+        "_id": "records:2024-06", "collection": "student_records", "archive": ARCHIVE,
+        "term": "2024-06", "start": datetime(2024, 6, 1), "end": datetime(2025, 6, 1), "state": "archived",
+    })
+    return appointments, records, archived
+
+
+def expected_order(docs, descending):
+    # MongoDB sorts missing and null dates before every date.
+    key = lambda doc: (doc.get("dateTime") is not None, doc.get("dateTime") or datetime.min, doc["_id"])
+    return [str(doc["_id"]) for doc in sorted(docs, key=key, reverse=descending)]
+
+
+async def page_all(client, path, params, limit):
+    ids, cursor = [], None
+    while True:
+        response = await client.get(path, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        response.raise_for_status()
+        page = response.json()
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["nextCursor"]
+        if not cursor:
+            return ids, page["total"]
+
+
+async def run(database, count, limit):
+    appointments, records, archived = seed(database, count)
+    cases = [
+        ("/appointments", {}, appointments),
+        ("/records", {}, records),
+        ("/records", {"include_archived": "true"}, records + archived),
+    ]
+    failures = []
+    async with make_client(app) as client:
+        for path, params, docs in cases:
+            for sort in ("asc", "desc"):
+                query = {**params, "sort": sort}
+                ids, total = await page_all(client, path, query, limit)
+                label = f"{path}?{urlencode(query)}"
+                expected = expected_order(docs, sort == "desc")
+                duplicates = len(ids) - len(set(ids))
+                missing = len(set(expected) - set(ids))
+                print(f"{label}: {len(ids)} rows of {len(expected)} (total {total}), "
+                      f"{duplicates} repeated, {missing} missing")
+                if ids != expected or total != len(expected):
+                    failures.append(label)
+    if failures:
+        raise SystemExit(f"rows skipped, repeated or out of order: {', '.join(failures)}")
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=120)
+    parser.add_argument("--limit", type=int, default=7)
+    args = parser.parse_args()
+
+    database = use_database(args.mongo_uri, args.db_name)
+    asyncio.run(run(database, args.rows, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,20 @@ let dashboardChart = null;
 let dashboardInitialized = false;
 let resizeTimeout;
 
+// Staff API calls carry the session token issued by /login. A 401 means the
+// session expired or was revoked, so send the user back to log in.
+async function apiFetch(url, options = {}) {
+  const token = sessionStorage.getItem("sessionToken");
+  const headers = { ...(options.headers || {}) };
+  if (token) headers.Authorization = `Bearer ${token}`;
+  const response = await fetch(url, { ...options, headers });
+  if (response.status === 401) {
+    sessionStorage.removeItem("sessionToken");
+    window.location.href = "../components/login.html";
+  }
+  return response;
+}
+
 function setActiveSection(section) {
   console.log("setActiveSection called with section:", section);
   activeSection = section;
@@ -250,7 +264,7 @@ window.onload = () => {
       tbody.innerHTML = "";
 
       try {
-        const response = await fetch("http://localhost:8000/admin-users");
+        const response = await apiFetch("http://localhost:8000/admin-users");
         if (!response.ok) throw new Error("Failed to fetch users");
         const users = await response.json();
 
@@ -297,7 +311,7 @@ window.onload = () => {
 
     async function approveUser(username) {
       try {
-        const response = await fetch("http://localhost:8000/approve-user", {
+        const response = await apiFetch("http://localhost:8000/approve-user", {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
@@ -321,7 +335,7 @@ window.onload = () => {
       if (!confirm(`Are you sure you want to delete "${username}"?`)) return;
 
       try {
-        const response = await fetch(`http://localhost:8000/delete-user/${username}`, {
+        const response = await apiFetch(`http://localhost:8000/delete-user/${username}`, {
           method: "DELETE",
         });
 
@@ -349,7 +363,7 @@ window.onload = () => {
       }
     
       try {
-        const response = await fetch("http://localhost:8000/register", {
+        const response = await apiFetch("http://localhost:8000/register", {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
@@ -382,11 +396,45 @@ window.onload = () => {
     
 
 // Function to fetch consultation data
+// GET /consultations?compact=true leaves out empty fields; put them back.
+const CONSULTATION_DEFAULTS = Object.fromEntries(
+  ["studentId", "firstName", "middleInitial", "lastName", "gender", "gradeSection", "dateOfBirth",
+   "address", "parentGuardian", "contactNumber", "concern", "nurse", "dateTime", "temperature",
+   "pulseRate", "bloodPressure", "respiratoryRate", "assessment", "diagnosis", "recommendations",
+   "nurseName", "nurseSignature", "nurseDate"].map((field) => [field, ""])
+);
+const ACTIONS_TAKEN_DEFAULTS = {
+  restedInClinic: false, givenFirstAid: false, administeredMedication: false, medicationDetails: "",
+  sentHome: false, referred: false, referredTo: "", others: false, othersDetails: "",
+};
+
+function toConsultationRecord(compactRecord) {
+  const record = {
+    ...CONSULTATION_DEFAULTS,
+    age: null,
+    ...compactRecord,
+    actionsTaken: { ...ACTIONS_TAKEN_DEFAULTS, ...(compactRecord.actionsTaken || {}) },
+  };
+  let dateOfVisit = "";
+  let timeOfVisit = "";
+  if (record.dateTime) {
+    const parts = record.dateTime.split("T");
+    dateOfVisit = parts[0] || "";
+    timeOfVisit = parts[1] || "";
+  }
+  return {
+    ...record,
+    dateOfVisit,
+    timeOfVisit,
+    reasonForVisit: record.concern
+  };
+}
+
 async function fetchConsultationData() {
   console.log('Fetching consultation data...');
 
   try {
-    const response = await fetch("http://localhost:8000/consultations");
+    const response = await apiFetch("http://localhost:8000/consultations?compact=true");
     if (!response.ok) {
       throw new Error(`HTTP ${response.status}`);
     }
@@ -398,21 +446,7 @@ async function fetchConsultationData() {
       countEl.textContent = data.length.toString();
     }
 
-    consultationRecords = data.map(record => {
-      let dateOfVisit = "";
-      let timeOfVisit = "";
-      if (record.dateTime) {
-        const parts = record.dateTime.split("T");
-        dateOfVisit = parts[0] || "";
-        timeOfVisit = parts[1] || "";
-      }
-      return {
-        ...record,
-        dateOfVisit,
-        timeOfVisit,
-        reasonForVisit: record.concern
-      };
-    });
+    consultationRecords = data.map(toConsultationRecord);
 
     renderConsultationList();
 
@@ -550,7 +584,7 @@ async function deleteConsultationRecord() {
   }
 
   try {
-    const response = await fetch(`http://localhost:8000/consultations/${recordId}`, {
+    const response = await apiFetch(`http://localhost:8000/consultations/${recordId}`, {
       method: "DELETE",
     });
 
@@ -684,6 +718,10 @@ window.adminDashboard = {
 };
 
 // Add Consultation Record 
+// Sent with each new consultation so a double-clicked or retried save
+// stores it once; renewed after a successful save.
+let consultationKey = crypto.randomUUID();
+
 async function addConsultationRecord() {
   const studentId = document.getElementById("studentId").value;
   const firstName = document.getElementById("firstName").value;
@@ -751,10 +789,11 @@ async function addConsultationRecord() {
   };
 
   try {
-    const response = await fetch("http://localhost:8000/consultations", {
+    const response = await apiFetch("http://localhost:8000/consultations", {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        "Idempotency-Key": consultationKey,
       },
       body: JSON.stringify(consultationData),
     });
@@ -770,6 +809,7 @@ async function addConsultationRecord() {
     }
 
     console.log("Consultation record saved successfully."); 
+    consultationKey = crypto.randomUUID();
     clearConsultationForm();
     toggleModal("add-form-modal");
     loadConsultationRecords();
@@ -837,21 +877,32 @@ document.getElementById("preview-close-btn")?.addEventListener("click", function
 });
 
 //filter consultation records
-function filterConsultations() {
-  const searchInput = document
-    .getElementById("search-input")
-    .value.toLowerCase();
-  const patientList = document.getElementById("patient-list");
-  const patients = patientList.getElementsByClassName("patient-item");
-
-  Array.from(patients).forEach((patient) => {
-    const patientName = patient.textContent.toLowerCase();
-    if (patientName.includes(searchInput)) {
-      patient.style.display = "";
-    } else {
-      patient.style.display = "none";
+// Ranked server-side search over names, concern, assessment, diagnosis and
+// recommendations; an empty box brings back the full list.
+async function searchConsultations() {
+  const query = document.getElementById("search-input").value.trim();
+  if (!query) {
+    await fetchConsultationData();
+    return;
+  }
+
+  try {
+    const params = new URLSearchParams({ q: query, limit: "100" });
+    const response = await apiFetch(`http://localhost:8000/consultations/search?${params}`);
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}`);
     }
-  });
+    const data = await response.json();
+    consultationRecords = data.items.map(toConsultationRecord);
+  } catch (error) {
+    console.error('Error searching consultations:', error);
+    consultationRecords = [];
+  }
+  renderConsultationList();
+}
+
+function filterConsultations() {
+  debounceFilter(searchConsultations);
 }
 
 //Search Input
@@ -1130,10 +1181,60 @@ function showEditView() {
 }
 
 //update consultation record from edit form 
+// The fields the edit form writes, shaped like the backend's Consultation.
+function consultationPayload(record) {
+  return {
+    studentId: record.studentId,
+    firstName: record.firstName,
+    middleInitial: record.middleInitial,
+    lastName: record.lastName,
+    age: record.age,
+    gender: record.gender,
+    gradeSection: record.gradeSection,
+    dateOfBirth: record.dateOfBirth,
+    address: record.address,
+    parentGuardian: record.parentGuardian,
+    contactNumber: record.contactNumber,
+    concern: record.reasonForVisit,
+    nurse: record.nurseName + " " + record.nurseDate,
+    dateTime: record.dateOfVisit + "T" + record.timeOfVisit,
+    temperature: record.temperature,
+    pulseRate: record.pulseRate,
+    bloodPressure: record.bloodPressure,
+    respiratoryRate: record.respiratoryRate,
+    assessment: record.assessment,
+    diagnosis: record.diagnosis,
+    actionsTaken: { ...record.actionsTaken },
+    recommendations: record.recommendations,
+    nurseName: record.nurseName,
+    nurseSignature: record.nurseSignature,
+    nurseDate: record.nurseDate,
+  };
+}
+
+// Only what the nurse changed, with the version the form was loaded at so
+// a concurrent edit is reported instead of overwritten.
+function consultationChanges(before, after, version) {
+  const changes = { version: version || 0 };
+  for (const [field, value] of Object.entries(after)) {
+    if (field === "actionsTaken") {
+      const actions = {};
+      for (const [flag, flagValue] of Object.entries(value)) {
+        if (!Object.is(before.actionsTaken[flag], flagValue)) actions[flag] = flagValue;
+      }
+      if (Object.keys(actions).length) changes.actionsTaken = actions;
+    } else if (!Object.is(before[field], value)) {
+      changes[field] = value;
+    }
+  }
+  return changes;
+}
+
 async function updateConsultationRecord() {
   if (currentRecordIndex === null) return;
 
   const record = consultationRecords[currentRecordIndex];
+  const before = consultationPayload(record);
 
   // Update record with values from edit form
   record.studentId = document.getElementById("edit-studentId").value;
@@ -1185,46 +1286,25 @@ async function updateConsultationRecord() {
   record.nurseSignature = document.getElementById("edit-nurseSignature").value;
   record.nurseDate = document.getElementById("edit-nurseDate").value;
 
-  // Prepare data to send to backend
-  const updatedData = {
-    studentId: record.studentId,
-    firstName: record.firstName,
-    middleInitial: record.middleInitial,
-    lastName: record.lastName,
-    age: record.age,
-    gender: record.gender,
-    gradeSection: record.gradeSection,
-    dateOfBirth: record.dateOfBirth,
-    address: record.address,
-    parentGuardian: record.parentGuardian,
-    contactNumber: record.contactNumber,
-    concern: record.reasonForVisit,
-    nurse: record.nurseName + " " + record.nurseDate,
-    dateTime: record.dateOfVisit + "T" + record.timeOfVisit,
-    status: record.status || "Pending",
-    temperature: record.temperature,
-    pulseRate: record.pulseRate,
-    bloodPressure: record.bloodPressure,
-    respiratoryRate: record.respiratoryRate,
-    assessment: record.assessment,
-    diagnosis: record.diagnosis,
-    actionsTaken: record.actionsTaken,
-    recommendations: record.recommendations,
-    nurseName: record.nurseName,
-    nurseSignature: record.nurseSignature,
-    nurseDate: record.nurseDate,
-  };
+  const changes = consultationChanges(before, consultationPayload(record), record.version);
 
   try {
     const recordId = record._id || record.id;
-    const response = await fetch(`http://localhost:8000/consultations/${recordId}`, {
-      method: "PUT",
+    const response = await apiFetch(`http://localhost:8000/consultations/${recordId}`, {
+      method: "PATCH",
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify(updatedData),
+      body: JSON.stringify(changes),
     });
 
+    if (response.status === 409) {
+      alert("This consultation was changed by someone else. The latest version has been loaded.");
+      await loadConsultationRecords();
+      showListView();
+      return;
+    }
+
     if (!response.ok) {
       const errorData = await response.json();
       let errorMessage = errorData.detail;
@@ -1236,7 +1316,8 @@ async function updateConsultationRecord() {
     }
 
     console.log("Consultation record updated successfully."); 
-    await loadConsultationRecords();
+    consultationRecords[currentRecordIndex] = toConsultationRecord(await response.json());
+    renderConsultationList();
     showConsultationDetails(currentRecordIndex);
   } catch (error) {
     console.error("Error updating consultation record: " + error.message);
@@ -1578,47 +1659,50 @@ loadConsultationRecords();
 // Appointment
 let appointments = [];
 let acceptedRecords = [];
+let appointmentTotal = 0;
+let appointmentCursor = null;
+let recordTotal = 0;
+let recordCursor = null;
+let filterTimeout;
+
+function debounceFilter(fn) {
+  clearTimeout(filterTimeout);
+  filterTimeout = setTimeout(fn, 250);
+}
 
-function filterAppointments() {
-  const nameInput = document.getElementById("searchName").value.toLowerCase();
+function appointmentQuery() {
+  const params = new URLSearchParams({ limit: "100" });
+  const name = document.getElementById("searchName").value.trim();
   const selectedStatus = document.getElementById("filterStatus").value;
   const selectedNurse = document.getElementById("filterNurse").value;
 
-  const filtered = appointments.filter((apt) => {
-    const fullName = (apt.firstName + " " + apt.lastName).toLowerCase();
-    const matchesName = fullName.includes(nameInput);
-    const matchesStatus = selectedStatus ? apt.status === selectedStatus : true;
-    const matchesNurse = selectedNurse ? apt.nurse === selectedNurse : true;
-
-    return matchesName && matchesStatus && matchesNurse;
-  });
-
-  renderFilteredTable(filtered);
+  if (name) params.set("name", name);
+  params.set("status", selectedStatus || "Pending");
+  if (selectedNurse) params.set("nurse", selectedNurse);
+  return params;
 }
 
-function filterRecords() {
-  const searchText = document.getElementById("searchRecord").value.toLowerCase();
-  const sortOption = document.getElementById("sortRecordDate").value;
-
-  let filtered = acceptedRecords.filter((rec) => {
-    const fullName = (rec.firstName + " " + rec.lastName).toLowerCase();
-    return fullName.includes(searchText);
-  });
-  renderRecordTable(filtered);
+function filterAppointments() {
+  debounceFilter(() => loadAppointments());
 }
 
-
-
-async function loadAppointments() {
+async function loadAppointments(append = false) {
   try {
-    const response = await fetch("http://localhost:8000/appointments");
-    const allAppointments = await response.json();
+    const params = appointmentQuery();
+    if (append && appointmentCursor) params.set("cursor", appointmentCursor);
 
-    appointments = allAppointments.filter(a => a.status !== "Accepted");
+    const response = await apiFetch(`http://localhost:8000/appointments?${params}`);
+    const page = await response.json();
+
+    appointments = append ? appointments.concat(page.items) : page.items;
+    appointmentTotal = page.total;
+    appointmentCursor = page.nextCursor;
     renderTable();
   } catch (error) {
     console.error("Error loading appointments:", error);
     appointments = [];
+    appointmentTotal = 0;
+    appointmentCursor = null;
     renderTable();
   }
 }
@@ -1630,7 +1714,7 @@ function renderTable() {
 function renderFilteredTable(appointmentList) {
   const tbody = document.getElementById("appointmentTable");
   const countEl = document.getElementById("appointmentCount");
-  countEl.textContent = `${appointmentList.length}`;
+  countEl.textContent = `${appointmentTotal}`;
 
   if (appointmentList.length === 0) {
     tbody.innerHTML = `<tr><td colspan="6" style="text-align: center; color: #999;">No appointments found</td></tr>`;
@@ -1654,27 +1738,75 @@ function renderFilteredTable(appointmentList) {
     `
     )
     .join("");
+
+  if (appointmentCursor) {
+    tbody.innerHTML += `<tr><td colspan="6" style="text-align: center;"><button onclick="loadAppointments(true)">Load more</button></td></tr>`;
+  }
 }
 
-async function acceptAppointment(id) {
-  try {
-    const acceptedAppointment = appointments.find((apt) => apt.id === id);
-    if (!acceptedAppointment) return;
+function matchesAppointmentFilter(apt) {
+  const params = appointmentQuery();
+  const name = (params.get("name") || "").toLowerCase();
+  const fullName = `${apt.firstName} ${apt.lastName}`.toLowerCase();
 
-    // Save to records
-    await fetch("http://localhost:8000/records", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(acceptedAppointment),
-    });
+  return apt.status === params.get("status") &&
+    (!params.get("nurse") || apt.nurse === params.get("nurse")) &&
+    (!name || fullName.split(/\s+/).some((word) => word.startsWith(name)));
+}
 
-    // Mark as accepted in MongoDB (do not delete)
-    await fetch(`http://localhost:8000/appointments/${id}/accept`, {
-      method: "PATCH",
-    });
+function applyAppointmentEvent(kind, apt) {
+  const index = appointments.findIndex((a) => a.id === apt.id);
+  const wasListed = index !== -1;
+  const belongs = kind !== "deleted" && matchesAppointmentFilter(apt);
+
+  if (wasListed && belongs) {
+    appointments[index] = apt;
+  } else if (wasListed) {
+    appointments.splice(index, 1);
+    appointmentTotal = Math.max(0, appointmentTotal - 1);
+  } else if (belongs) {
+    appointments.push(apt);
+    appointmentTotal += 1;
+  }
+  renderTable();
+}
+
+function subscribeToAppointmentEvents() {
+  // EventSource cannot send the Authorization header, so the session
+  // token goes in the query string.
+  const token = encodeURIComponent(sessionStorage.getItem("sessionToken") || "");
+  const source = new EventSource(`http://localhost:8000/appointments/events?access_token=${token}`);
+
+  ["created", "accepted", "updated", "deleted"].forEach((kind) => {
+    source.addEventListener(kind, (event) => applyAppointmentEvent(kind, JSON.parse(event.data)));
+  });
+  source.addEventListener("reset", () => loadAppointments());
+}
+
+async function batchAppointments(action, ids) {
+  const response = await apiFetch("http://localhost:8000/appointments/batch", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ action, ids }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    throw new Error(errorData.detail);
+  }
+  return response.json();
+}
+
+async function acceptAppointment(id) {
+  try {
+    // Marks the appointment accepted and copies it to records in one request;
+    // the appointment list is updated by the "accepted" event
+    const result = await batchAppointments("accept", [id]);
+    if (result.failed) {
+      alert("Accept failed: " + result.results[0].detail);
+      return;
+    }
 
-    // Reload appointments
-    await loadAppointments();
     await loadRecords();
 
     alert("Appointment accepted and saved to records.");
@@ -1687,51 +1819,45 @@ async function deleteAppointment(id) {
   if (!confirm("Delete appointment?")) return;
 
   try {
-    const response = await fetch(`http://localhost:8000/appointments/${id}`, {
-      method: "DELETE",
-    });
-
-    if (!response.ok) {
-      const errorData = await response.json();
-      alert("Delete failed: " + errorData.detail);
+    const result = await batchAppointments("delete", [id]);
+    if (result.failed) {
+      alert("Delete failed: " + result.results[0].detail);
       return;
     }
 
-    appointments = appointments.filter((apt) => apt.id !== id);
-    renderTable();
+    applyAppointmentEvent("deleted", { id });
   } catch (error) {
     alert("Error: " + error.message);
   }
 }
 
-async function loadRecords() {
+async function loadRecords(append = false) {
   try {
-    const response = await fetch("http://localhost:8000/records");
-    acceptedRecords = await response.json();
-    filterRecords();
+    const params = new URLSearchParams({ limit: "100" });
+    const searchText = document.getElementById("searchRecord").value.trim();
+    const sortOption = document.getElementById("sortRecordDate").value;
+
+    if (searchText) params.set("name", searchText);
+    params.set("sort", sortOption === "oldest" ? "asc" : "desc");
+    if (append && recordCursor) params.set("cursor", recordCursor);
+
+    const response = await apiFetch(`http://localhost:8000/records?${params}`);
+    const page = await response.json();
+
+    acceptedRecords = append ? acceptedRecords.concat(page.items) : page.items;
+    recordTotal = page.total;
+    recordCursor = page.nextCursor;
   } catch (error) {
     console.error("Error loading records:", error);
     acceptedRecords = [];
-    filterRecords();
+    recordTotal = 0;
+    recordCursor = null;
   }
+  renderRecordTable(acceptedRecords);
 }
 
 function filterRecords() {
-  const searchText = document.getElementById("searchRecord").value.toLowerCase();
-  const sortOption = document.getElementById("sortRecordDate").value;
-
-  let filtered = acceptedRecords.filter((rec) => {
-    const fullName = (rec.firstName + " " + rec.lastName).toLowerCase();
-    return fullName.includes(searchText);
-  });
-
-  if (sortOption === "latest") {
-    filtered.sort((a, b) => new Date(b.dateTime) - new Date(a.dateTime));
-  } else {
-    filtered.sort((a, b) => new Date(a.dateTime) - new Date(b.dateTime));
-  }
-
-  renderRecordTable(filtered);
+  debounceFilter(() => loadRecords());
 }
 
 function renderRecordTable(records) {
@@ -1739,7 +1865,7 @@ function renderRecordTable(records) {
   tbody.innerHTML = "";
 
   const countEl = document.getElementById("recordsCount");
-  countEl.textContent = records.length;
+  countEl.textContent = recordTotal;
 
   if (records.length === 0) {
     const row = document.createElement("tr");
@@ -1759,16 +1885,29 @@ function renderRecordTable(records) {
     `;
     tbody.appendChild(row);
   });
+
+  if (recordCursor) {
+    const row = document.createElement("tr");
+    row.innerHTML = `<td colspan="5" style="text-align:center;"><button onclick="loadRecords(true)">Load more</button></td>`;
+    tbody.appendChild(row);
+  }
 }
 
 document.addEventListener("DOMContentLoaded", () => {
   loadAppointments();
   loadRecords();
+  subscribeToAppointmentEvents();
 });
 
 
-function handleLogout() {
+async function handleLogout() {
   console.log("Logging out...");
+  try {
+    await apiFetch("http://localhost:8000/logout", { method: "POST" });
+  } catch (error) {
+    console.error("Logout request failed:", error);
+  }
+  sessionStorage.removeItem("sessionToken");
   window.location.href = "../components/login.html";
 }
 
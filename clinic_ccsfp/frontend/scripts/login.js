@@ -50,6 +50,37 @@ async function register() {
   }
 }
 
+function openDashboard(role) {
+  if (role === "admin") {
+    window.location.href = "../pages/admin.html";
+  } else if (role === "staff") {
+    window.location.href = "../pages/staff.html";
+  } else {
+    alert("Login successful but unknown role.");
+  }
+}
+
+// Reuse a still-valid session instead of asking for the password again.
+async function resumeSession() {
+  const token = sessionStorage.getItem("sessionToken");
+  if (!token) return;
+  try {
+    const response = await fetch("http://localhost:8000/session", {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    if (response.ok) {
+      const data = await response.json();
+      openDashboard(data.role);
+    } else {
+      sessionStorage.removeItem("sessionToken");
+    }
+  } catch (error) {
+    console.error("Could not check session:", error);
+  }
+}
+
+document.addEventListener("DOMContentLoaded", resumeSession);
+
 async function login() {
   const username = document.getElementById("loginUsername").value.trim();
   const password = document.getElementById("loginPassword").value;
@@ -65,13 +96,8 @@ async function login() {
 
     if (response.ok) {
       const data = await response.json();
-      if (data.role === "admin") {
-        window.location.href = "../pages/admin.html";
-      } else if (data.role === "staff") {
-        window.location.href = "../pages/staff.html";
-      } else {
-        alert("Login successful but unknown role.");
-      }
+      sessionStorage.setItem("sessionToken", data.token);
+      openDashboard(data.role);
     } else {
       let data;
       try {
@@ -1,23 +1,20 @@
 let currentDate = new Date();
 let selectedDate = null;
 let selectedTime = null;
-let appointments = [];
+// Sent with the booking so a retry after a dropped connection returns the
+// first booking instead of creating a second one; renewed once it succeeds.
+let bookingKey = crypto.randomUUID();
 
-function saveAppointments() {
-  localStorage.setItem("appointments", JSON.stringify(appointments));
-  console.log("Appointments saved to localStorage:", appointments);
-}
+async function fetchTakenSlots(nurse, dateStr) {
+  const params = new URLSearchParams({ nurse, from: dateStr, to: dateStr });
+  const response = await fetch(`http://localhost:8000/availability?${params}`);
+  if (!response.ok) return new Set();
 
-function checkAppointmentConflict(nurse, dateTime) {
-  return appointments.some(
-    (apt) =>
-      apt.nurse === nurse &&
-      apt.dateTime === dateTime &&
-      apt.status !== "Rejected"
-  );
+  const availability = await response.json();
+  return new Set(availability.days.flatMap((day) => day.taken));
 }
 
-function updateAvailableTimeSlots() {
+async function updateAvailableTimeSlots() {
   const selectedNurse = document.getElementById("nurse").value;
   const timeSlots = document.querySelectorAll(".time-slot");
 
@@ -31,12 +28,17 @@ function updateAvailableTimeSlots() {
   }
 
   const selectedDateStr = selectedDate.toISOString().split("T")[0];
+  let taken = new Set();
+  try {
+    taken = await fetchTakenSlots(selectedNurse, selectedDateStr);
+  } catch (error) {
+    console.error("Error loading availability:", error);
+  }
 
   timeSlots.forEach((slot) => {
     const time = slot.dataset.time;
-    const dateTimeStr = `${selectedDateStr}_${time}`;
 
-    if (checkAppointmentConflict(selectedNurse, dateTimeStr)) {
+    if (taken.has(time)) {
       slot.classList.add("unavailable");
       slot.style.pointerEvents = "none";
       slot.style.opacity = "0.5";
@@ -221,23 +223,25 @@ async function handleSubmit(e) {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        "Idempotency-Key": bookingKey,
       },
       body: JSON.stringify(formData),
     });
 
+    if (response.status === 429) {
+      // Keep bookingKey: retrying the same booking must not create two.
+      const wait = response.headers.get("Retry-After") || "a few";
+      alert(`The clinic is busy right now. Please try again in ${wait} seconds.`);
+      return;
+    }
+
     if (!response.ok) {
       const errorData = await response.json();
       alert("Failed to create appointment: " + errorData.detail);
       return;
     }
 
-    // ✅ Fetch updated appointments from backend
-    const fetchRes = await fetch("http://localhost:8000/appointments");
-    if (fetchRes.ok) {
-      appointments = await fetchRes.json();
-      saveAppointments();
-    }
-
+    bookingKey = crypto.randomUUID();
     document.getElementById("successMessage").style.display = "block";
 
     setTimeout(() => {
@@ -270,20 +274,25 @@ function resetForm() {
   });
 }
 
-async function fetchAppointments() {
-  try {
-    const response = await fetch("http://localhost:8000/appointments");
-    if (response.ok) {
-      appointments = await response.json();
-      saveAppointments();
-    }
-  } catch (error) {
-    console.error("Error loading appointments:", error);
-  }
+function subscribeToSlotEvents() {
+  const source = new EventSource("http://localhost:8000/availability/events");
+
+  ["taken", "freed"].forEach((kind) => {
+    source.addEventListener(kind, (event) => {
+      const slot = JSON.parse(event.data);
+      const selectedNurse = document.getElementById("nurse").value;
+      const selectedDateStr = selectedDate ? selectedDate.toISOString().split("T")[0] : null;
+      // Events without a slot may concern any nurse or day.
+      if (!slot.nurse || (slot.nurse === selectedNurse && slot.date === selectedDateStr)) {
+        updateAvailableTimeSlots();
+      }
+    });
+  });
+  source.addEventListener("reset", () => updateAvailableTimeSlots());
 }
 
-document.addEventListener("DOMContentLoaded", async () => {
+document.addEventListener("DOMContentLoaded", () => {
   console.log("Page loaded");
-  await fetchAppointments();
   initCalendar();
+  subscribeToSlotEvents();
 });